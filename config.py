@@ -165,11 +165,61 @@ COLORS = {
 }
 
 # File extensions hỗ trợ
-SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet', '.feather', '.arrow')
+ARROW_EXTENSIONS = ('.parquet', '.feather', '.arrow')  # Đọc/ghi bằng pyarrow (pip install pyarrow)
 
 # Processing configuration - Windows optimized
 CHUNK_SIZE = 500  # Smaller chunks for Windows
 MAX_WORKERS = min(4, os.cpu_count() or 1)  # Limit workers on Windows
+MATCH_CACHE_SIZE = 100000  # Số kết quả match tối đa giữ trong LRU cache (dùng chung giữa các sheet/file)
+COMPONENT_CACHE_SIZE = 20000  # Số chuỗi tỉnh/huyện đầu vào (mỗi loại) giữ điểm đã chấm với các tên chuẩn trong LRU cache
+CHUAN_HOA_CACHE_SIZE = 200000  # Số chuỗi gốc giữ kết quả chuan_hoa trong LRU cache (địa chỉ lặp lại không phải chuẩn hóa lại)
+TOKEN_SORT_CACHE_SIZE = 50000  # Số chuỗi dạng token_sort (full_process + sắp xếp token) giữ trong LRU cache khi chấm điểm tuần tự
+TYPO_MAX_DISTANCE = 2  # Số ký tự gõ sai tối đa tra bằng từ điển biến thể xóa trước khi quét fuzzy (0 = tắt)
+PAUSE_CHECK_STRIDE = 256  # Số dòng match giữa hai lần kiểm tra pause/stop trong một chunk
+STREAM_CHUNK_SIZE = 50000  # Số dòng mỗi chunk khi đọc/ghi file theo kiểu streaming (file rất lớn)
+
+# Backend ghi file kết quả .xlsx theo từng chunk (bộ nhớ không tăng theo số dòng):
+# 'openpyxl' (mặc định) - write-only, chuỗi lặp lại (xã/tỉnh sau sáp nhập, lý do) lưu một lần trong shared strings
+# 'xlsxwriter' - constant_memory, nhanh hơn nhưng ghi chuỗi inline (file lớn hơn); cần pip install xlsxwriter
+EXCEL_WRITER_ENGINE = 'openpyxl'
+
+# Bộ đọc CSV theo chunk: 'auto' (pyarrow nếu đã cài, không thì pandas), 'pyarrow' hoặc 'pandas'
+CSV_READER = 'auto'
+CSV_BLOCK_SIZE = 4 << 20  # Số byte mỗi block pyarrow parse (các block được parse đa luồng)
+
+# Engine match: 'thread' (mặc định) hoặc 'process' (multiprocessing fork - chỉ Linux/macOS, tận dụng nhiều core)
+MATCH_ENGINE = 'thread'
+PROCESS_WORKERS = None  # None = os.cpu_count()
+
+# Cache kết quả match lưu trên đĩa (SQLite, cạnh mapping.xlsx) - dùng lại giữa các lần chạy
+PERSISTENT_CACHE = {
+    'enabled': False,        # Mặc định tắt - bật khi xử lý lặp lại nhiều file trên cùng mapping
+    'file_name': 'mapping_cache.sqlite',
+    'max_entries': 500000,   # Vượt quá thì compact (xóa namespace cũ, mục ít dùng nhất)
+    'flush_every': 1000,     # Số kết quả mới gom lại trước khi ghi xuống đĩa
+}
+
+# Snapshot mapping đã biên dịch (JSON, cạnh mapping.xlsx) - khởi động không cần đọc Excel/chuan_hoa
+MAPPING_SNAPSHOT = {
+    'enabled': True,
+    'file_name': 'mapping.snapshot.json',
+}
+
+# Benchmark (python -m pihcm benchmark): dữ liệu giả lập sinh từ mapping.xlsx
+BENCHMARK = {
+    'sizes': (1000, 10000, 100000, 1000000),
+    'seed': 20240701,
+    'duplicate_rate': 0.3,     # Tỉ lệ dòng lặp lại địa chỉ của một dòng trước đó
+    'match_row_limit': 20000,  # Số dòng tối đa đo qua FuzzyMatcher.match_row (đo từng dòng rất chậm với 1M)
+    'file_format': 'xlsx',     # Định dạng file đầu vào cho phép đo pipeline: xlsx, csv, parquet
+}
+
+# Đo thời gian từng bước xử lý (utils/profiling.py) - in ra log và ghi báo cáo JSON cạnh file kết quả
+PROFILING = {
+    'enabled': False,
+    'report_suffix': '.run_report.json',
+}
 
 # Thresholds cho fuzzy matching
 FUZZY_THRESHOLDS = {
@@ -0,0 +1,265 @@
+"""
+Module pipeline chuẩn hóa địa chỉ cho một DataFrame (không phụ thuộc GUI/tkinter)
+Gom địa chỉ unique trên toàn sheet -> match theo chunk -> trả kết quả về từng dòng gốc.
+Dùng chung cho FileProcessor (GUI) và CLI headless.
+"""
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from config import CHUNK_SIZE, PAUSE_CHECK_STRIDE
+from core.text_processor import chuan_hoa_series, find_ap_column, find_address_column
+from core.file_handler import check_required_columns
+from core.fuzzy_matcher import fuzzy_match_batch, get_match_key
+from utils.profiling import profiler
+
+# Các cột kết quả thêm vào sheet
+RESULT_COLUMNS = ('Lý do không match', 'Xã sau sáp nhập', 'Tỉnh sau sáp nhập')
+
+
+def get_address_columns(column_names):
+    """
+    Chọn các cột cần cho việc chuẩn hóa (xã, huyện, tỉnh, ấp, địa chỉ) từ danh sách tên cột
+    
+    Dùng để chỉ đọc đúng các cột này từ file (column projection với Parquet/Feather).
+    
+    Args:
+        column_names: Danh sách tên cột của file
+    
+    Returns:
+        list: Tên các cột cần đọc, theo thứ tự trong file
+    
+    Raises:
+        ValueError: Nếu thiếu cột xã/huyện/tỉnh
+    """
+    header = pd.DataFrame(columns=list(column_names))
+    column_check = check_required_columns(header)
+    if not column_check['valid']:
+        raise ValueError(f"Thiếu các cột: {', '.join(column_check['missing'])}")
+    selected = {column_check['xa_col'], column_check['huyen_col'], column_check['tinh_col'],
+                find_ap_column(header), find_address_column(header)}
+    return [name for name in header.columns if name in selected]
+
+
+def deduplicate_addresses(df, xa_col, huyen_col, tinh_col, ap_col=None, address_col=None):
+    """
+    Gom các dòng có cùng khóa địa chỉ chuẩn hóa (xã, huyện, tỉnh, ấp) trên toàn sheet
+    
+    Args:
+        df: DataFrame gốc
+        xa_col, huyen_col, tinh_col: Tên cột xã/huyện/tỉnh
+        ap_col, address_col: Tên cột ấp/địa chỉ chi tiết (optional)
+    
+    Returns:
+        tuple: (DataFrame các dòng đại diện unique kèm cột chuẩn hóa và '_so_dong',
+                mảng vị trí unique cho từng dòng gốc)
+    """
+    with profiler.stage('chuan_hoa'):
+        xa_chuan = chuan_hoa_series(df[xa_col]).tolist()
+        huyen_chuan = chuan_hoa_series(df[huyen_col]).tolist()
+        tinh_chuan = chuan_hoa_series(df[tinh_col]).tolist()
+    ap_values = df[ap_col].tolist() if ap_col and ap_col in df.columns else [None] * len(df)
+    address_values = df[address_col].tolist() if address_col and address_col in df.columns else [None] * len(df)
+    
+    with profiler.stage('deduplicate'):
+        key_codes = {}
+        first_positions = []
+        counts = []
+        row_codes = np.empty(len(df), dtype=np.intp)
+        for position, row_key in enumerate(zip(xa_chuan, huyen_chuan, tinh_chuan, ap_values, address_values)):
+            key = get_match_key(*row_key)
+            code = key_codes.get(key)
+            if code is None:
+                code = key_codes[key] = len(first_positions)
+                first_positions.append(position)
+                counts.append(0)
+            counts[code] += 1
+            row_codes[position] = code
+        
+        unique_df = df.iloc[first_positions].copy()
+        unique_df['_xa_chuan'] = [xa_chuan[i] for i in first_positions]
+        unique_df['_huyen_chuan'] = [huyen_chuan[i] for i in first_positions]
+        unique_df['_tinh_chuan'] = [tinh_chuan[i] for i in first_positions]
+        unique_df['_so_dong'] = counts  # Số dòng gốc dùng chung kết quả - để tính tiến độ
+    profiler.count('rows', len(df))
+    profiler.count('unique_addresses', len(first_positions))
+    return unique_df, row_codes
+
+
+def match_chunk(chunk, ap_col=None, address_col=None, match_batch=None, checkpoint=None):
+    """
+    Match một chunk đã có các cột '_xa_chuan', '_huyen_chuan', '_tinh_chuan'
+    
+    Args:
+        chunk: DataFrame chunk
+        ap_col, address_col: Tên cột ấp/địa chỉ chi tiết (optional)
+        match_batch: Hàm match theo lô (mặc định fuzzy_match_batch)
+        checkpoint: Hàm gọi mỗi PAUSE_CHECK_STRIDE dòng, trả về False để dừng (optional)
+    
+    Returns:
+        dict: {tên cột kết quả: list} theo thứ tự dòng của chunk, hoặc None nếu bị dừng
+    """
+    match_batch = match_batch or fuzzy_match_batch
+    
+    # Lấy các cột cần dùng ra list một lần - không duyệt từng dòng bằng iterrows
+    xa_values = chunk['_xa_chuan'].tolist()
+    huyen_values = chunk['_huyen_chuan'].tolist()
+    tinh_values = chunk['_tinh_chuan'].tolist()
+    ap_values = chunk[ap_col].tolist() if ap_col and ap_col in chunk.columns else [None] * len(chunk)
+    address_values = chunk[address_col].tolist() if address_col and address_col in chunk.columns else [None] * len(chunk)
+    
+    reasons = ['Thiếu xã/tỉnh' if not xa.strip() or not tinh.strip() else '' for xa, tinh in zip(xa_values, tinh_values)]
+    results = [(None, None, None, None, None, reason) for reason in reasons]
+    pending_positions = [position for position, reason in enumerate(reasons) if not reason]
+    
+    # Match theo từng đoạn PAUSE_CHECK_STRIDE dòng, kiểm tra pause/stop giữa các đoạn
+    for start in range(0, len(pending_positions), PAUSE_CHECK_STRIDE):
+        if checkpoint is not None and not checkpoint():
+            return None
+        
+        positions = pending_positions[start:start + PAUSE_CHECK_STRIDE]
+        with profiler.stage('match'):
+            matched = match_batch(
+                [xa_values[p] for p in positions],
+                [huyen_values[p] for p in positions],
+                [tinh_values[p] for p in positions],
+                [ap_values[p] for p in positions],
+                [address_values[p] for p in positions]
+            )
+        for position, result in zip(positions, matched):
+            results[position] = result
+    
+    return {
+        'Lý do không match': [result[5] for result in results],
+        'Xã sau sáp nhập': [result[3] for result in results],
+        'Tỉnh sau sáp nhập': [result[4] for result in results],
+    }
+
+
+def expand_results(df, unique_result, row_codes):
+    """
+    Trả kết quả của các địa chỉ unique về từng dòng gốc (giữ thứ tự gốc)
+    
+    Args:
+        df: DataFrame gốc
+        unique_result: DataFrame kết quả theo dòng unique (có RESULT_COLUMNS)
+        row_codes: Mảng vị trí unique cho từng dòng gốc (từ deduplicate_addresses)
+    
+    Returns:
+        pd.DataFrame: df (index reset) kèm RESULT_COLUMNS
+    """
+    with profiler.stage('expand_results'):
+        result_df = df.reset_index(drop=True)
+        for col in RESULT_COLUMNS:
+            result_df[col] = unique_result[col].to_numpy()[row_codes]
+    return result_df
+
+
+def normalize_dataframe(df, xa_col, huyen_col, tinh_col, ap_col=None, address_col=None,
+                        match_batch=None, workers=1, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Chuẩn hóa cả một sheet - dùng cho chế độ không có GUI
+    
+    Args:
+        df: DataFrame gốc
+        xa_col, huyen_col, tinh_col: Tên cột xã/huyện/tỉnh
+        ap_col, address_col: Tên cột ấp/địa chỉ chi tiết (optional)
+        match_batch: Hàm match theo lô (mặc định fuzzy_match_batch, hoặc ProcessMatchEngine.match_batch)
+        workers: Số luồng gửi chunk đi match (1 = tuần tự)
+        chunk_size: Số địa chỉ unique mỗi chunk
+        progress: Callback progress(done_rows, total_rows) (optional)
+    
+    Returns:
+        tuple: (DataFrame kết quả, số địa chỉ unique)
+    """
+    unique_df, row_codes = deduplicate_addresses(df, xa_col, huyen_col, tinh_col, ap_col, address_col)
+    unique_rows = len(unique_df)
+    bounds = [(start, min(start + chunk_size, unique_rows)) for start in range(0, unique_rows, chunk_size)]
+    done = [0]
+    lock = threading.Lock()
+    
+    def run_chunk(bound):
+        chunk = unique_df.iloc[bound[0]:bound[1]]
+        columns = match_chunk(chunk, ap_col, address_col, match_batch)
+        if progress is not None:
+            with lock:
+                done[0] += int(chunk['_so_dong'].sum())
+                progress(done[0], len(df))
+        return columns
+    
+    if workers > 1 and len(bounds) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(run_chunk, bounds))
+    else:
+        chunk_results = [run_chunk(bound) for bound in bounds]
+    
+    with profiler.stage('concat'):
+        unique_result = pd.DataFrame({
+            col: [value for columns in chunk_results for value in columns[col]]
+            for col in RESULT_COLUMNS
+        }, columns=list(RESULT_COLUMNS))
+    return expand_results(df, unique_result, row_codes), unique_rows
+
+
+def normalize_chunks(chunks, match_batch=None, workers=1, progress=None, prefetch=2):
+    """
+    Chuẩn hóa dữ liệu đến theo từng chunk (streaming) - mỗi chunk kết quả được yield ngay
+    
+    Cột xã/huyện/tỉnh/ấp/địa chỉ được xác định từ chunk đầu tiên. Các địa chỉ trùng giữa
+    các chunk được lấy từ result cache của fuzzy matcher thay vì gom trên toàn sheet.
+    Chunk kế tiếp được đọc trước ở luồng nền để việc đọc file chạy song song với match.
+    
+    Args:
+        chunks: Iterable các DataFrame (vd. core.file_handler.iter_file_chunks)
+        match_batch, workers: Như normalize_dataframe
+        progress: Callback progress(done_rows) (optional)
+        prefetch: Số chunk đọc trước tối đa (0 = không đọc trước)
+        
+    Yields:
+        pd.DataFrame: Chunk kết quả (cột gốc + RESULT_COLUMNS)
+        
+    Raises:
+        ValueError: Nếu thiếu cột xã/huyện/tỉnh
+    """
+    columns = None
+    done_rows = 0
+    for chunk in (_prefetch_chunks(chunks, prefetch) if prefetch else chunks):
+        if columns is None:
+            column_check = check_required_columns(chunk)
+            if not column_check['valid']:
+                raise ValueError(f"Thiếu các cột: {', '.join(column_check['missing'])}")
+            columns = (column_check['xa_col'], column_check['huyen_col'], column_check['tinh_col'],
+                       find_ap_column(chunk), find_address_column(chunk))
+        
+        result_chunk, _ = normalize_dataframe(chunk, *columns, match_batch=match_batch, workers=workers)
+        result_chunk.index = chunk.index
+        done_rows += len(result_chunk)
+        if progress is not None:
+            progress(done_rows)
+        yield result_chunk
+
+
+def _prefetch_chunks(chunks, depth):
+    """Đọc trước tối đa depth chunk ở luồng nền (lỗi khi đọc được ném lại ở luồng gọi)"""
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    
+    def producer():
+        try:
+            for chunk in chunks:
+                buffer.put((chunk, None))
+        except Exception as e:
+            buffer.put((None, e))
+        finally:
+            buffer.put((done, None))
+    
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        chunk, error = buffer.get()
+        if error is not None:
+            raise error
+        if chunk is done:
+            return
+        yield chunk
+
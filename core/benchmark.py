@@ -0,0 +1,433 @@
+"""
+Module benchmark: sinh danh sách bệnh nhân giả lập từ mapping.xlsx và đo tốc độ xử lý
+Dữ liệu có nhiễu như file thực tế (viết tắt "TP.", "P.", "Q.", bỏ dấu, gõ sai, thiếu huyện,
+ấp/khu phố nằm trong cột địa chỉ, dòng trùng lặp). Kết quả xuất dạng JSON để so sánh
+giữa các phiên bản trên cùng một máy.
+
+Ví dụ:
+    python -m pihcm benchmark --sizes 1000,10000 -o benchmark.json
+    python -m pihcm generate 100000 -o du_lieu_mau.xlsx
+"""
+import os
+import re
+import sys
+import time
+import random
+import platform
+import tempfile
+import subprocess
+import unicodedata
+import pandas as pd
+from config import BENCHMARK, VIETTAT_MAP, MATCH_ENGINE
+from core.text_processor import chuan_hoa, chuan_hoa_series
+from core.file_handler import (read_file, save_file, iter_file_chunks, check_required_columns,
+                               create_streaming_writer, PYARROW_AVAILABLE, XLSXWRITER_AVAILABLE)
+from core.address_pipeline import RESULT_COLUMNS, normalize_dataframe, normalize_chunks
+from core.fuzzy_matcher import fuzzy_matcher, SCORE_CUTOFF_AVAILABLE
+from core.process_engine import create_match_batch
+from data.mapping_loader import load_mapping
+
+# Tăng khi đổi cấu trúc file JSON kết quả
+BENCHMARK_VERSION = 1
+
+# Xác suất từng loại nhiễu
+DEFAULT_NOISE = {
+    'sheet2': 0.25,          # Dòng lấy từ Sheet2 (có ấp)
+    'abbreviation': 0.5,     # Thêm tiền tố/viết tắt hành chính (P., Q., TP., Xã, Huyện...)
+    'province_alias': 0.15,  # Tỉnh viết tắt theo VIETTAT_MAP (HCM, SG, BD...)
+    'no_diacritics': 0.2,    # Bỏ dấu tiếng Việt
+    'case': 0.1,             # Viết hoa/thường toàn bộ
+    'typo': 0.15,            # Gõ sai 1-2 ký tự
+    'missing_huyen': 0.08,   # Bỏ trống huyện
+    'missing_xa': 0.01,      # Bỏ trống xã
+    'ap_sheet1': 0.6,        # Dòng Sheet1 có ghi ấp/khu phố/tổ
+    'ap_column': 0.4,        # Ấp ghi ở cột Ấp (còn lại ghi cuối cột địa chỉ)
+}
+
+COLUMNS = ('STT', 'Họ tên', 'Năm sinh', 'Địa chỉ', 'Ấp', 'Xã', 'Huyện', 'Tỉnh')
+
+XA_PREFIXES = ('Xã ', 'X. ', 'Phường ', 'P. ', 'P.', 'Thị trấn ', 'TT. ')
+XA_NUMBER_PREFIXES = ('Phường ', 'P. ', 'P.', 'P')
+HUYEN_PREFIXES = ('Huyện ', 'H. ', 'Quận ', 'Q. ', 'Q.', 'Thị xã ', 'TX. ', 'Thành phố ', 'TP. ')
+HUYEN_NUMBER_PREFIXES = ('Quận ', 'Q. ', 'Q.', 'Q')
+TINH_PREFIXES = ('Tỉnh ', 'T. ', 'TP. ', 'Thành phố ')
+AP_FORMATS = ('Ấp {}', 'ấp {}', 'KP. {}', 'Khu phố {}', 'Tổ {}', 'Khóm {}')
+AP_KEYWORDS = ('ấp', 'khóm', 'khu phố', 'kp', 'tổ', 'thôn')
+STREETS = ('Nguyễn Trãi', 'Lê Lợi', 'Trần Hưng Đạo', 'Hùng Vương', 'Quốc lộ 1A', 'Tỉnh lộ 10',
+           'Nguyễn Văn Cừ', 'Lý Thường Kiệt', 'Đường 30/4', 'Hẻm 12')
+HO = ('Nguyễn', 'Trần', 'Lê', 'Phạm', 'Huỳnh', 'Hoàng', 'Võ', 'Phan', 'Trương', 'Bùi', 'Đặng', 'Đỗ', 'Ngô', 'Hồ')
+TEN_DEM = ('Văn', 'Thị', 'Hữu', 'Minh', 'Ngọc', 'Thanh', 'Quốc', 'Hoàng', 'Kim', 'Đức')
+TEN = ('An', 'Bình', 'Cường', 'Dũng', 'Hà', 'Hải', 'Hạnh', 'Hoa', 'Hùng', 'Lan', 'Linh', 'Long',
+       'Mai', 'Nam', 'Phúc', 'Phương', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn', 'Vy', 'Yến')
+TYPO_CHARS = 'abcdeghiklmnopqrstuvxy'
+
+
+def _strip_diacritics(text):
+    """Bỏ dấu tiếng Việt (giữ nguyên hoa/thường)"""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def _province_aliases():
+    """
+    Lấy các viết tắt tỉnh đơn giản từ VIETTAT_MAP (vd. r'\\bhcm\\b' -> 'HCM')
+    
+    Returns:
+        dict: {tên tỉnh đã chuẩn hóa: [viết tắt]}
+    """
+    aliases = {}
+    for pattern, replacement in VIETTAT_MAP.items():
+        match = re.fullmatch(r'\\b([a-z]+)\\b', pattern)
+        if match:
+            aliases.setdefault(replacement.replace('thanh pho ', ''), []).append(match.group(1).upper())
+    return aliases
+
+
+class CorpusGenerator:
+    """Sinh danh sách bệnh nhân giả lập có nhiễu từ dữ liệu mapping gốc (tái lập được theo seed)"""
+    
+    def __init__(self, mapping_sheet1, mapping_sheet2, seed=None, duplicate_rate=None, noise=None):
+        """
+        Args:
+            mapping_sheet1: Danh sách tuple gốc Sheet1 (xacu, huyencu, tinhcu, ...)
+            mapping_sheet2: Danh sách tuple gốc Sheet2 (apcu, xacu, huyencu, tinhcu, ...)
+            seed: Seed cho random (mặc định BENCHMARK['seed'])
+            duplicate_rate: Tỉ lệ dòng lặp lại địa chỉ đã sinh (mặc định BENCHMARK['duplicate_rate'])
+            noise: Dict ghi đè các xác suất trong DEFAULT_NOISE (optional)
+        """
+        if not mapping_sheet1:
+            raise ValueError("Mapping Sheet1 trống - không sinh được dữ liệu")
+        self.sheet1 = [row[:3] for row in mapping_sheet1]
+        self.sheet2 = [row[:4] for row in mapping_sheet2]
+        self.seed = BENCHMARK['seed'] if seed is None else seed
+        self.duplicate_rate = BENCHMARK['duplicate_rate'] if duplicate_rate is None else duplicate_rate
+        self.noise = {**DEFAULT_NOISE, **(noise or {})}
+        self.province_aliases = _province_aliases()
+    
+    def generate(self, n):
+        """
+        Sinh n dòng - cùng seed và n cho cùng kết quả
+        
+        Args:
+            n: Số dòng
+        
+        Returns:
+            pd.DataFrame: Các cột COLUMNS (ô trống là NaN)
+        """
+        rng = random.Random(f"{self.seed}:{n}")
+        nan = float('nan')
+        addresses = []
+        rows = []
+        for stt in range(1, n + 1):
+            if addresses and rng.random() < self.duplicate_rate:
+                address = rng.choice(addresses)
+            else:
+                address = self._make_address(rng, nan)
+                addresses.append(address)
+            name = f"{rng.choice(HO)} {rng.choice(TEN_DEM)} {rng.choice(TEN)}"
+            rows.append((stt, name, rng.randint(1930, 2024)) + address)
+        return pd.DataFrame(rows, columns=list(COLUMNS))
+    
+    def _make_address(self, rng, nan):
+        """Sinh (địa chỉ, ấp, xã, huyện, tỉnh) có nhiễu"""
+        noise = self.noise
+        ap_name = None
+        if self.sheet2 and rng.random() < noise['sheet2']:
+            ap_name, xa, huyen, tinh = rng.choice(self.sheet2)
+            if not ap_name.lower().startswith(AP_KEYWORDS):
+                ap_name = f"Ấp {ap_name}"
+        else:
+            xa, huyen, tinh = rng.choice(self.sheet1)
+            if rng.random() < noise['ap_sheet1']:
+                ap_name = rng.choice(AP_FORMATS).format(rng.randint(1, 12))
+        
+        address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}"
+        ap_value = nan
+        if ap_name:
+            if rng.random() < noise['ap_column']:
+                ap_value = self._text_noise(rng, ap_name)
+            else:
+                address = f"{address}, {self._text_noise(rng, ap_name)}"
+        
+        xa_value = nan if rng.random() < noise['missing_xa'] else self._unit_noise(rng, xa, XA_PREFIXES, XA_NUMBER_PREFIXES)
+        huyen_value = nan if rng.random() < noise['missing_huyen'] else self._unit_noise(rng, huyen, HUYEN_PREFIXES, HUYEN_NUMBER_PREFIXES)
+        
+        aliases = self.province_aliases.get(chuan_hoa(tinh))
+        if aliases and rng.random() < noise['province_alias']:
+            tinh_value = rng.choice(aliases)
+        else:
+            tinh_value = self._unit_noise(rng, tinh, TINH_PREFIXES, TINH_PREFIXES)
+        return address, ap_value, xa_value, huyen_value, tinh_value
+    
+    def _unit_noise(self, rng, name, prefixes, number_prefixes):
+        """Thêm tiền tố hành chính (số có thể thêm số 0 ở đầu) rồi thêm nhiễu chữ"""
+        text = str(name)
+        if rng.random() < self.noise['abbreviation']:
+            if text.isdigit():
+                if len(text) == 1 and rng.random() < 0.3:
+                    text = '0' + text
+                text = rng.choice(number_prefixes) + text
+            else:
+                text = rng.choice(prefixes) + text
+        return self._text_noise(rng, text)
+    
+    def _text_noise(self, rng, text):
+        """Bỏ dấu, đổi hoa/thường, gõ sai (không gõ sai chuỗi ngắn/số)"""
+        noise = self.noise
+        if rng.random() < noise['no_diacritics']:
+            text = _strip_diacritics(text)
+        if rng.random() < noise['case']:
+            text = text.upper() if rng.random() < 0.5 else text.lower()
+        if len(text) > 4 and not text[-1].isdigit() and rng.random() < noise['typo']:
+            text = self._typo(rng, text, 1 if rng.random() < 0.7 else 2)
+        return text
+    
+    @staticmethod
+    def _typo(rng, text, count):
+        """Thêm/xóa/thay/đảo ký tự tại vị trí ngẫu nhiên"""
+        chars = list(text)
+        for _ in range(count):
+            position = rng.randrange(1, len(chars) - 1)
+            operation = rng.randrange(4)
+            if operation == 0:
+                chars.insert(position, rng.choice(TYPO_CHARS))
+            elif operation == 1:
+                del chars[position]
+            elif operation == 2:
+                chars[position] = rng.choice(TYPO_CHARS)
+            else:
+                chars[position], chars[position + 1] = chars[position + 1], chars[position]
+        return ''.join(chars)
+
+
+def generate_corpus(n, seed=None, duplicate_rate=None, noise=None):
+    """
+    Sinh n dòng dữ liệu bệnh nhân giả lập từ mapping hiện tại (load mapping nếu chưa load)
+    
+    Args:
+        n: Số dòng
+        seed, duplicate_rate, noise: Như CorpusGenerator
+    
+    Returns:
+        pd.DataFrame: Dữ liệu giả lập
+    """
+    if not fuzzy_matcher.mapping_sheet1_original:
+        load_mapping()
+    generator = CorpusGenerator(fuzzy_matcher.mapping_sheet1_original, fuzzy_matcher.mapping_sheet2_original,
+                                seed, duplicate_rate, noise)
+    return generator.generate(n)
+
+
+def _rate(rows, seconds):
+    """Số dòng/giây (làm tròn)"""
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def _bench_match_row(df, limit):
+    """
+    Đo FuzzyMatcher.match_row từng dòng (cache kết quả trống lúc bắt đầu)
+    
+    Returns:
+        dict: Số dòng đo, thời gian chuẩn hóa/match, tốc độ, tỉ lệ cache hit và thống kê đường match
+    """
+    sample = df.iloc[:limit]
+    fuzzy_matcher.result_cache.clear()
+    fuzzy_matcher.reset_match_stats()
+    
+    start = time.perf_counter()
+    xa_values = chuan_hoa_series(sample['Xã']).tolist()
+    huyen_values = chuan_hoa_series(sample['Huyện']).tolist()
+    tinh_values = chuan_hoa_series(sample['Tỉnh']).tolist()
+    normalize_seconds = time.perf_counter() - start
+    
+    match_row = fuzzy_matcher.match_row
+    start = time.perf_counter()
+    for row in zip(xa_values, huyen_values, tinh_values, sample['Ấp'].tolist(), sample['Địa chỉ'].tolist()):
+        match_row(*row)
+    match_seconds = time.perf_counter() - start
+    
+    stats = fuzzy_matcher.get_cache_stats()
+    return {
+        'rows': len(sample),
+        'normalize_seconds': round(normalize_seconds, 4),
+        'match_seconds': round(match_seconds, 4),
+        'rows_per_second': _rate(len(sample), match_seconds),
+        'cache_hit_rate': round(stats['hit_rate'], 4),
+        'match_paths': fuzzy_matcher.get_match_stats(),
+    }
+
+
+def _bench_pipeline(df, input_path, output_path, match_batch, workers, stream):
+    """
+    Đo pipeline đầy đủ: đọc file -> chuẩn hóa + match -> ghi file kết quả
+    
+    Returns:
+        dict: Thời gian từng bước, tổng, tốc độ và số dòng không match
+    """
+    start = time.perf_counter()
+    save_file(df, input_path)
+    input_write_seconds = time.perf_counter() - start
+    fuzzy_matcher.result_cache.clear()
+    
+    timings = {}
+    unmatched = 0
+    start = time.perf_counter()
+    if stream:
+        with create_streaming_writer(output_path, RESULT_COLUMNS) as writer:
+            writer.add_sheet('Sheet1')
+            for result_chunk in normalize_chunks(iter_file_chunks(input_path), match_batch=match_batch, workers=workers):
+                writer.write_chunk(result_chunk)
+                unmatched += int((result_chunk['Lý do không match'].fillna('') != '').sum())
+        unique_rows = None
+    else:
+        step = time.perf_counter()
+        source = read_file(input_path)
+        timings['read_seconds'] = round(time.perf_counter() - step, 4)
+        
+        step = time.perf_counter()
+        column_check = check_required_columns(source)
+        result_df, unique_rows = normalize_dataframe(
+            source, column_check['xa_col'], column_check['huyen_col'], column_check['tinh_col'], 'Ấp', 'Địa chỉ',
+            match_batch=match_batch, workers=workers
+        )
+        timings['match_seconds'] = round(time.perf_counter() - step, 4)
+        unmatched = int((result_df['Lý do không match'].fillna('') != '').sum())
+        
+        step = time.perf_counter()
+        save_file(result_df, output_path, RESULT_COLUMNS)
+        timings['write_seconds'] = round(time.perf_counter() - step, 4)
+    total_seconds = time.perf_counter() - start
+    
+    return {
+        'input_write_seconds': round(input_write_seconds, 4),
+        **timings,
+        'seconds': round(total_seconds, 4),
+        'rows_per_second': _rate(len(df), total_seconds),
+        'unique_addresses': unique_rows,
+        'unmatched': unmatched,
+    }
+
+
+def _git_commit():
+    """Commit hiện tại (None nếu không chạy trong git repo)"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def get_environment_info():
+    """
+    Thông tin máy/thư viện để so sánh kết quả benchmark
+    
+    Returns:
+        dict: Phiên bản Python/pandas, hệ điều hành, số CPU, thư viện tùy chọn, commit
+    """
+    return {
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'rapidfuzz': SCORE_CUTOFF_AVAILABLE,
+        'pyarrow': PYARROW_AVAILABLE,
+        'xlsxwriter': XLSXWRITER_AVAILABLE,
+        'git_commit': _git_commit(),
+    }
+
+
+def run_benchmark(sizes=None, seed=None, duplicate_rate=None, file_format=None, match_row_limit=None,
+                  engine=None, workers=1, stream=False, work_dir=None, progress=print):
+    """
+    Chạy benchmark cho từng kích thước dữ liệu
+    
+    Mỗi kích thước: sinh dữ liệu -> đo match_row (tối đa match_row_limit dòng) -> ghi file
+    đầu vào rồi đo pipeline đầy đủ. Cache kết quả được xóa trước mỗi phép đo; persistent
+    cache trên đĩa không được dùng.
+    
+    Args:
+        sizes: Danh sách số dòng (mặc định BENCHMARK['sizes'])
+        seed, duplicate_rate: Như CorpusGenerator
+        file_format: 'xlsx', 'csv' hoặc 'parquet' (mặc định BENCHMARK['file_format'])
+        match_row_limit: Số dòng tối đa đo qua match_row
+        engine: 'serial', 'thread' hoặc 'process' (mặc định MATCH_ENGINE)
+        workers: Số worker
+        stream: True = đo pipeline streaming (đọc/ghi theo chunk)
+        work_dir: Thư mục chứa file tạm (mặc định thư mục tạm, xóa sau khi chạy)
+        progress: Hàm in tiến độ (None = không in)
+    
+    Returns:
+        dict: Báo cáo benchmark (ghi ra JSON được)
+    """
+    sizes = list(sizes or BENCHMARK['sizes'])
+    file_format = (file_format or BENCHMARK['file_format']).lstrip('.')
+    match_row_limit = BENCHMARK['match_row_limit'] if match_row_limit is None else match_row_limit
+    engine = engine or MATCH_ENGINE
+    log = progress or (lambda message: None)
+    
+    start = time.perf_counter()
+    load_mapping()
+    mapping_seconds = time.perf_counter() - start
+    # Đo trên cache trống - không đọc/ghi persistent cache của người dùng
+    fuzzy_matcher.detach_persistent_cache()
+    
+    generator = CorpusGenerator(fuzzy_matcher.mapping_sheet1_original, fuzzy_matcher.mapping_sheet2_original,
+                                seed, duplicate_rate)
+    match_batch, process_engine, threads = create_match_batch(engine, workers)
+    
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='pihcm_benchmark_', dir=work_dir) as temp_dir:
+            for n in sizes:
+                log(f"📦 {n:,} dòng: sinh dữ liệu...")
+                step = time.perf_counter()
+                df = generator.generate(n)
+                generate_seconds = time.perf_counter() - step
+                
+                log(f"   match_row ({min(n, match_row_limit):,} dòng)...")
+                match_row_result = _bench_match_row(df, match_row_limit)
+                
+                log(f"   pipeline .{file_format}{' (stream)' if stream else ''}...")
+                input_path = os.path.join(temp_dir, f"benchmark_{n}.{file_format}")
+                output_path = os.path.join(temp_dir, f"benchmark_{n}_ket_qua.{file_format}")
+                pipeline_result = _bench_pipeline(df, input_path, output_path, match_batch, threads, stream)
+                for path in (input_path, output_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                
+                results.append({
+                    'rows': n,
+                    'generate_seconds': round(generate_seconds, 4),
+                    'match_row': match_row_result,
+                    'pipeline': pipeline_result,
+                })
+                log(f"   ✅ match_row {match_row_result['rows_per_second'] or 0:,.0f} dòng/giây, "
+                    f"pipeline {pipeline_result['rows_per_second'] or 0:,.0f} dòng/giây")
+    finally:
+        if process_engine is not None:
+            process_engine.close()
+    
+    return {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': get_environment_info(),
+        'settings': {
+            'sizes': sizes,
+            'seed': generator.seed,
+            'duplicate_rate': generator.duplicate_rate,
+            'noise': generator.noise,
+            'file_format': file_format,
+            'match_row_limit': match_row_limit,
+            'engine': engine,
+            'workers': threads,
+            'stream': stream,
+        },
+        'mapping': {
+            'load_seconds': round(mapping_seconds, 4),
+            'sheet1_rows': len(fuzzy_matcher.mapping_sheet1),
+            'sheet2_rows': len(fuzzy_matcher.mapping_sheet2),
+        },
+        'results': results,
+    }
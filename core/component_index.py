@@ -0,0 +1,83 @@
+"""
+Module chỉ mục thành phần địa chỉ (tỉnh/huyện)
+Mỗi tên tỉnh/huyện chuẩn (canonical) trong mapping có một id số nguyên; mỗi chuỗi tỉnh/huyện
+đầu vào được ánh xạ tới một hàng điểm {id chuẩn: điểm} (trùng khớp chính xác = 100, còn lại
+chấm fuzzy khi cần lần đầu) giữ trong LRU cache, nên cùng một chuỗi lặp lại ở nhiều dòng chỉ
+được chấm điểm với mỗi tên chuẩn đúng một lần.
+"""
+from core.match_cache import MatchResultCache
+
+
+class _ScoreRow(dict):
+    """Điểm của một query theo id tên chuẩn - id chưa có được chấm điểm khi truy cập lần đầu"""
+    __slots__ = ('query', 'component')
+    
+    def __init__(self, query, component):
+        super().__init__()
+        self.query = query
+        self.component = component
+    
+    def __missing__(self, name_id):
+        score = self.component.scorer(self.query, self.component.names[name_id], self.component.threshold)
+        self[name_id] = score
+        return score
+
+
+class ComponentIndex:
+    """Danh sách tên chuẩn của một thành phần và cache điểm theo chuỗi đầu vào"""
+    
+    def __init__(self, names, scorer, threshold, max_size=20000):
+        """
+        Args:
+            names: Các tên chuẩn (trùng lặp được bỏ qua, giữ thứ tự xuất hiện đầu tiên)
+            scorer: Hàm scorer(query, name, cutoff) - điểm chính xác nếu >= cutoff
+            threshold: Ngưỡng điểm của thành phần (điểm dưới ngưỡng chỉ cần biết là dưới ngưỡng)
+            max_size: Số chuỗi đầu vào tối đa giữ trong cache
+        """
+        self.names = list(dict.fromkeys(names))
+        self.ids = {name: k for k, name in enumerate(self.names)}
+        self.scorer = scorer
+        self.threshold = threshold
+        self.cache = MatchResultCache(max_size)
+    
+    def encode(self, values):
+        """
+        Chuyển cột tên thành cột id
+        
+        Args:
+            values: Danh sách tên (phải có trong names)
+        
+        Returns:
+            list: Id tương ứng
+        """
+        ids = self.ids
+        return [ids[value] for value in values]
+    
+    def scores(self, query):
+        """
+        Hàng điểm của query theo id tên chuẩn (dùng lại giữa các dòng cùng chuỗi)
+        
+        Args:
+            query: Chuỗi tỉnh/huyện đầu vào (đã chuẩn hóa như names)
+        
+        Returns:
+            _ScoreRow: row[id] = điểm của query với names[id] (chính xác nếu >= threshold)
+        """
+        row = self.cache.get(query)
+        if row is None:
+            row = _ScoreRow(query, self)
+            # Trùng khớp chính xác với một tên chuẩn: điểm tối đa, không cần chấm
+            name_id = self.ids.get(query)
+            if name_id is not None:
+                row[name_id] = 100
+            self.cache.put(query, row)
+        return row
+    
+    def get_stats(self):
+        """Thống kê cache (xem MatchResultCache.get_stats) kèm số tên chuẩn"""
+        stats = self.cache.get_stats()
+        stats['names'] = len(self.names)
+        return stats
+    
+    def __len__(self):
+        return len(self.names)
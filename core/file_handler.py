@@ -2,19 +2,50 @@
 Module xử lý các thao tác file I/O
 UPDATED: Enhanced .xls support with proper engine handling
 """
+import csv
 import pandas as pd
 import os
 from thefuzz import fuzz
-from config import SUPPORTED_EXTENSIONS
+from config import (SUPPORTED_EXTENSIONS, ARROW_EXTENSIONS, STREAM_CHUNK_SIZE, EXCEL_WRITER_ENGINE,
+                    CSV_READER, CSV_BLOCK_SIZE)
 
+# xlsxwriter là tùy chọn - backend ghi nhanh hơn (constant_memory)
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    xlsxwriter = None
+    XLSXWRITER_AVAILABLE = False
 
-def read_file(file_path, sheet_name=None):
+# pyarrow là tùy chọn - parse CSV đa luồng theo block, đọc/ghi Parquet và Arrow IPC (Feather)
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pa_csv = None
+    pa_ipc = None
+    pa_parquet = None
+    PYARROW_AVAILABLE = False
+
+# Chuỗi được pd.read_excel coi là ô trống (NaN) - streaming reader dùng cùng quy tắc
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+def read_file(file_path, sheet_name=None, columns=None):
     """
-    Đọc file Excel hoặc CSV - UPDATED with enhanced .xls support
+    Đọc file Excel, CSV, Parquet hoặc Arrow IPC/Feather - UPDATED with enhanced .xls support
     
     Args:
         file_path: Đường dẫn file
         sheet_name: Tên sheet cần đọc (None để đọc sheet đầu tiên)
+        columns: Chỉ đọc các cột này (None = tất cả). Với Parquet/Feather chỉ các cột này được đọc từ đĩa
         
     Returns:
         pd.DataFrame: Dữ liệu đã đọc
@@ -34,21 +65,28 @@ def read_file(file_path, sheet_name=None):
         if file_ext == '.xlsx':
             # Use openpyxl for .xlsx files
             if sheet_name is not None:
-                return pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+                return pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl', usecols=columns)
             else:
-                return pd.read_excel(file_path, engine='openpyxl')
+                return pd.read_excel(file_path, engine='openpyxl', usecols=columns)
         elif file_ext == '.xls':
             # Use xlrd for .xls files
             if sheet_name is not None:
-                return pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd')
+                return pd.read_excel(file_path, sheet_name=sheet_name, engine='xlrd', usecols=columns)
             else:
-                return pd.read_excel(file_path, engine='xlrd')
+                return pd.read_excel(file_path, engine='xlrd', usecols=columns)
+        elif file_ext == '.parquet':
+            return pd.read_parquet(file_path, columns=columns)
+        elif file_ext in ARROW_EXTENSIONS:  # .feather / .arrow
+            return pd.read_feather(file_path, columns=columns)
         else:  # .csv
-            return pd.read_csv(file_path, encoding='utf-8')
+            return pd.read_csv(file_path, encoding='utf-8', usecols=columns)
     except Exception as e:
         # Enhanced error handling with specific suggestions
         error_msg = f"Lỗi đọc file {file_path}: {str(e)}"
         
+        if file_ext in ARROW_EXTENSIONS and not PYARROW_AVAILABLE:
+            error_msg += f"\n\nGợi ý: cài đặt pyarrow để đọc {file_ext}: pip install pyarrow"
+        
         if file_ext == '.xls':
             error_msg += f"\n\nGợi ý cho file .xls:"
             error_msg += f"\n- Đảm bảo đã cài đặt xlrd: pip install xlrd==2.0.1"
@@ -58,6 +96,284 @@ def read_file(file_path, sheet_name=None):
         raise Exception(error_msg)
 
 
+def iter_file_chunks(file_path, sheet_name=None, chunk_size=STREAM_CHUNK_SIZE, columns=None):
+    """
+    Đọc file theo từng chunk DataFrame - bộ nhớ tỉ lệ với chunk_size thay vì cả sheet
+    
+    .xlsx đọc streaming bằng openpyxl read-only, .csv đọc streaming theo chunk (iter_csv_chunks),
+    Parquet/Feather đọc theo record batch (iter_arrow_chunks); .xls đọc cả file rồi chia chunk.
+    
+    Args:
+        file_path: Đường dẫn file
+        sheet_name: Tên sheet cần đọc (None để đọc sheet đầu tiên)
+        chunk_size: Số dòng mỗi chunk
+        columns: Chỉ lấy các cột này (None = tất cả). Parquet/Feather chỉ đọc các cột này từ đĩa
+        
+    Yields:
+        pd.DataFrame: Từng chunk (index liên tục qua các chunk)
+    """
+    file_ext = os.path.splitext(file_path.lower())[1]
+    if file_ext in ARROW_EXTENSIONS:
+        yield from iter_arrow_chunks(file_path, chunk_size, columns)
+        return
+    
+    if file_ext == '.xlsx':
+        chunks = iter_excel_chunks(file_path, sheet_name, chunk_size)
+    elif file_ext == '.csv':
+        chunks = iter_csv_chunks(file_path, chunk_size)
+    else:
+        df = read_file(file_path, sheet_name, columns)
+        chunks = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+    for chunk in chunks:
+        yield chunk[list(columns)] if columns is not None else chunk
+
+
+def iter_arrow_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE, columns=None):
+    """
+    Đọc file Parquet hoặc Arrow IPC/Feather theo từng chunk (cần pyarrow)
+    
+    Chỉ các cột trong columns được đọc từ đĩa (column projection). Cột dictionary
+    (vd. cột kết quả do StreamingArrowWriter ghi) được trả về dạng category.
+    
+    Args:
+        file_path: Đường dẫn file .parquet/.feather/.arrow
+        chunk_size: Số dòng mỗi chunk
+        columns: Danh sách cột cần đọc (None = tất cả)
+        
+    Yields:
+        pd.DataFrame: Từng chunk (index liên tục qua các chunk)
+        
+    Raises:
+        ImportError: Nếu chưa cài pyarrow
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File không tồn tại: {file_path}")
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Cần cài đặt pyarrow để đọc Parquet/Feather: pip install pyarrow")
+    
+    start = 0
+    if os.path.splitext(file_path.lower())[1] == '.parquet':
+        parquet_file = pa_parquet.ParquetFile(file_path)
+        try:
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                df = batch.to_pandas()
+                df.index = pd.RangeIndex(start, start + len(df))
+                start += len(df)
+                yield df
+        finally:
+            parquet_file.close()
+        return
+    
+    # Feather v2 = Arrow IPC file: đọc qua memory map, gom các record batch thành chunk chunk_size dòng
+    with pa.memory_map(file_path) as source:
+        reader = pa_ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(list(columns))
+            for offset in range(0, batch.num_rows, chunk_size):
+                df = batch.slice(offset, chunk_size).to_pandas()
+                df.index = pd.RangeIndex(start, start + len(df))
+                start += len(df)
+                yield df
+
+
+def get_file_columns(file_path, sheet_name=None):
+    """
+    Lấy danh sách tên cột mà không đọc dữ liệu (Parquet/Feather: chỉ đọc schema)
+    
+    Args:
+        file_path: Đường dẫn file
+        sheet_name: Tên sheet (chỉ với Excel)
+        
+    Returns:
+        list: Tên các cột
+    """
+    file_ext = os.path.splitext(file_path.lower())[1]
+    if file_ext in ARROW_EXTENSIONS:
+        if not PYARROW_AVAILABLE:
+            raise ImportError("Cần cài đặt pyarrow để đọc Parquet/Feather: pip install pyarrow")
+        if file_ext == '.parquet':
+            return list(pa_parquet.read_schema(file_path).names)
+        with pa.memory_map(file_path) as source:
+            return list(pa_ipc.open_file(source).schema.names)
+    if file_ext == '.csv':
+        return list(pd.read_csv(file_path, encoding='utf-8', nrows=0).columns)
+    if file_ext == '.xlsx':
+        return list(next(iter_excel_chunks(file_path, sheet_name, chunk_size=1), pd.DataFrame()).columns)
+    return list(read_file(file_path, sheet_name).columns)
+
+
+def iter_excel_chunks(file_path, sheet_name=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Đọc sheet .xlsx theo từng chunk bằng openpyxl read-only (iter_rows)
+    
+    Dòng đầu là header (tên cột trống/trùng được đặt như pandas: 'Unnamed: n', 'x.1').
+    Ô trống và các chuỗi trong NA_STRINGS thành NaN như pd.read_excel. Giá trị khác giữ
+    nguyên kiểu của openpyxl (dtype object): cột số có ô trống không bị đổi sang float
+    như pd.read_excel. Các dòng trống ở cuối sheet bị bỏ qua.
+    
+    Args:
+        file_path: Đường dẫn file .xlsx
+        sheet_name: Tên sheet cần đọc (None để đọc sheet đầu tiên)
+        chunk_size: Số dòng mỗi chunk
+        
+    Yields:
+        pd.DataFrame: Từng chunk (index liên tục qua các chunk)
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File không tồn tại: {file_path}")
+    
+    from openpyxl import load_workbook
+    
+    nan = float('nan')
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            return
+        columns = _make_column_names(header)
+        width = len(columns)
+        
+        buffer = []
+        blank_rows = 0  # Dòng trống chỉ được giữ nếu sau nó còn dữ liệu
+        start = 0
+        for row in rows:
+            row = tuple(
+                nan if value is None or (type(value) is str and value in NA_STRINGS) else value
+                for value in row[:width]
+            ) + (nan,) * (width - len(row))
+            if all(value is nan for value in row):
+                blank_rows += 1
+                continue
+            if blank_rows:
+                buffer.extend([(nan,) * width] * blank_rows)
+                blank_rows = 0
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield _rows_to_frame(buffer, columns, start)
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield _rows_to_frame(buffer, columns, start)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE, reader=None):
+    """
+    Đọc file CSV (utf-8) theo từng chunk - bộ nhớ tỉ lệ với chunk_size thay vì cả file
+    
+    Mọi cột được đọc dạng chuỗi (dtype object): kiểu dữ liệu không đổi giữa các chunk và
+    mã BN/số điện thoại giữ nguyên số 0 ở đầu. Ô trống và các chuỗi trong NA_STRINGS thành NaN.
+    Tên cột trống/trùng được đặt như pandas ('Unnamed: n', 'x.1').
+    
+    Args:
+        file_path: Đường dẫn file .csv
+        chunk_size: Số dòng mỗi chunk
+        reader: 'pyarrow' hoặc 'pandas' (mặc định CSV_READER; 'auto' = pyarrow nếu đã cài)
+        
+    Yields:
+        pd.DataFrame: Từng chunk (index liên tục qua các chunk)
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File không tồn tại: {file_path}")
+    
+    reader = reader or CSV_READER
+    if reader == 'auto':
+        reader = 'pyarrow' if PYARROW_AVAILABLE else 'pandas'
+    
+    if reader == 'pyarrow' and PYARROW_AVAILABLE:
+        yield from _iter_csv_chunks_pyarrow(file_path, chunk_size)
+        return
+    
+    # NA mặc định của pandas trùng với NA_STRINGS
+    chunks = pd.read_csv(file_path, encoding='utf-8', dtype=object, chunksize=chunk_size)
+    with chunks:
+        yield from chunks
+
+
+def _iter_csv_chunks_pyarrow(file_path, chunk_size):
+    """Đọc CSV bằng pyarrow streaming reader (parse đa luồng theo block), gom lại thành chunk chunk_size dòng"""
+    # Header đọc riêng để đặt tên cột như pandas và ép mọi cột về kiểu chuỗi
+    with open(file_path, encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        return
+    columns = _make_column_names([name if name != '' else None for name in header])
+    arrow_names = [f"c{i}" for i in range(len(columns))]  # Tên tạm không trùng nhau
+    
+    stream = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE,
+                                        skip_rows=1, column_names=arrow_names),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in arrow_names},
+                                              null_values=list(NA_STRINGS), strings_can_be_null=True),
+    )
+    
+    nan = float('nan')
+    pending = []
+    pending_rows = 0
+    start = 0
+    try:
+        for batch in stream:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows < chunk_size:
+                continue
+            table = pa.Table.from_batches(pending)
+            offset = 0
+            while pending_rows - offset >= chunk_size:
+                yield _arrow_to_frame(table.slice(offset, chunk_size), columns, start, nan)
+                offset += chunk_size
+                start += chunk_size
+            pending = table.slice(offset).to_batches()
+            pending_rows -= offset
+        if pending_rows:
+            yield _arrow_to_frame(pa.Table.from_batches(pending), columns, start, nan)
+    finally:
+        stream.close()
+
+
+def _arrow_to_frame(table, columns, start, nan):
+    """Chuyển bảng pyarrow thành DataFrame dtype object (ô null -> NaN), index bắt đầu từ start"""
+    df = table.to_pandas().astype(object)
+    df = df.where(df.notna(), nan)
+    df.columns = columns
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def _make_column_names(header):
+    """Đặt tên cột giống pd.read_excel: ô trống -> 'Unnamed: n', trùng tên -> 'x.1', 'x.2'"""
+    columns = []
+    seen = {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        if name in seen:
+            seen[name] += 1
+            new_name = f"{name}.{seen[name]}"
+            while new_name in seen:
+                seen[name] += 1
+                new_name = f"{name}.{seen[name]}"
+            seen[new_name] = 0
+            name = new_name
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _rows_to_frame(rows, columns, start):
+    """Tạo DataFrame dtype object từ các tuple dòng, index bắt đầu từ start"""
+    return pd.DataFrame(rows, columns=columns, index=pd.RangeIndex(start, start + len(rows)), dtype=object)
+
+
 def get_excel_sheet_names(file_path):
     """
     Lấy danh sách tên sheets trong file Excel - UPDATED with enhanced .xls support
@@ -98,39 +414,449 @@ def get_excel_sheet_names(file_path):
         raise Exception(error_msg)
 
 
-def save_file(df, file_path):
+class StreamingExcelWriter:
     """
-    Lưu DataFrame thành file Excel
+    Ghi file .xlsx theo từng chunk - mỗi dòng được ghi ra đĩa ngay, không giữ toàn bộ sheet trong bộ nhớ
+    
+    Các sheet được ghi lần lượt (không quay lại sheet trước). Ô NaN/None được ghi thành ô trống.
+    
+    Ví dụ:
+        with StreamingExcelWriter(path) as writer:
+            writer.add_sheet('Sheet1')
+            for chunk in result_chunks:
+                writer.write_chunk(chunk)
+    """
+    
+    def __init__(self, file_path, engine=None):
+        """
+        Args:
+            file_path: Đường dẫn file .xlsx đích
+            engine: 'openpyxl' hoặc 'xlsxwriter' (mặc định EXCEL_WRITER_ENGINE;
+                    tự dùng openpyxl nếu chưa cài xlsxwriter)
+        """
+        self.file_path = file_path
+        self.engine = engine or EXCEL_WRITER_ENGINE
+        if self.engine == 'xlsxwriter' and not XLSXWRITER_AVAILABLE:
+            self.engine = 'openpyxl'
+        
+        if self.engine == 'xlsxwriter':
+            # constant_memory: mỗi dòng được flush ra file tạm ngay khi sang dòng mới
+            self.workbook = xlsxwriter.Workbook(file_path, {
+                'constant_memory': True, 'nan_inf_to_errors': True, 'strings_to_urls': False,
+            })
+        else:
+            from openpyxl import Workbook
+            # write_only: dòng được serialize ngay khi append, chuỗi lặp lại dùng chung shared strings
+            self.workbook = Workbook(write_only=True)
+        
+        self.worksheet = None
+        self.columns = None
+        self.row_count = 0  # Số dòng dữ liệu đã ghi vào sheet hiện tại
+        self.sheet_count = 0
+    
+    def add_sheet(self, sheet_name, columns=None):
+        """
+        Bắt đầu sheet mới - header được ghi cùng chunk đầu tiên (hoặc ngay nếu truyền columns)
+        
+        Args:
+            sheet_name: Tên sheet
+            columns: Danh sách tên cột (optional - mặc định lấy từ chunk đầu tiên)
+        """
+        if self.engine == 'xlsxwriter':
+            self.worksheet = self.workbook.add_worksheet(sheet_name)
+        else:
+            self.worksheet = self.workbook.create_sheet(title=sheet_name)
+        self.columns = None
+        self.row_count = 0
+        self.sheet_count += 1
+        if columns is not None:
+            self._write_header(columns)
+    
+    def write_chunk(self, df):
+        """
+        Ghi tiếp các dòng của một chunk vào cuối sheet hiện tại (không ghi index)
+        
+        Args:
+            df: DataFrame chunk - các chunk của cùng một sheet phải có cùng cột
+        
+        Raises:
+            ValueError: Nếu chưa gọi add_sheet hoặc cột khác chunk đầu tiên
+        """
+        if self.worksheet is None:
+            raise ValueError("Chưa tạo sheet - gọi add_sheet() trước write_chunk()")
+        if self.columns is None:
+            self._write_header(df.columns)
+        elif list(df.columns) != self.columns:
+            raise ValueError("Các chunk của cùng một sheet phải có cùng danh sách cột")
+        
+        values = df.to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        rows = values.tolist()
+        
+        if self.engine == 'xlsxwriter':
+            first_row = self.row_count + 1  # Dòng 0 là header
+            for offset, row in enumerate(rows):
+                self.worksheet.write_row(first_row + offset, 0, row)
+        else:
+            append = self.worksheet.append
+            for row in rows:
+                append(row)
+        self.row_count += len(rows)
+    
+    def _write_header(self, columns):
+        """Ghi dòng header"""
+        self.columns = list(columns)
+        if self.engine == 'xlsxwriter':
+            self.worksheet.write_row(0, 0, self.columns)
+        else:
+            self.worksheet.append(self.columns)
+    
+    def close(self, discard=False):
+        """
+        Hoàn tất và lưu file
+        
+        Args:
+            discard: True = bỏ file đang ghi dở (không tạo file đích). Luôn bỏ nếu chưa có sheet nào.
+        """
+        if self.workbook is None:
+            return
+        workbook, self.workbook = self.workbook, None
+        discard = discard or self.sheet_count == 0
+        if self.engine == 'xlsxwriter':
+            if self.sheet_count == 0:
+                workbook.add_worksheet()  # xlsxwriter không đóng được workbook rỗng
+            # Phải close() để dọn file tạm của constant_memory, sau đó mới xóa file bỏ dở
+            workbook.close()
+            if discard and os.path.exists(self.file_path):
+                os.remove(self.file_path)
+        elif not discard:
+            workbook.save(self.file_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Lỗi giữa chừng -> không để lại file kết quả thiếu dòng
+        self.close(discard=exc_type is not None)
+        return False
+
+
+class StreamingCsvWriter:
+    """
+    Ghi file .csv (utf-8 có BOM để Excel hiển thị đúng tiếng Việt) theo từng chunk
+    
+    Cùng giao diện với StreamingExcelWriter nhưng chỉ có một bảng (một sheet).
+    """
+    
+    def __init__(self, file_path):
+        """
+        Args:
+            file_path: Đường dẫn file .csv đích
+        """
+        self.file_path = file_path
+        self.file = open(file_path, 'w', encoding='utf-8-sig', newline='')
+        self.columns = None
+        self.row_count = 0
+        self.sheet_count = 0
+    
+    def add_sheet(self, sheet_name, columns=None):
+        """
+        Bắt đầu bảng - file CSV chỉ chứa được một sheet
+        
+        Raises:
+            ValueError: Nếu đã có sheet trước đó
+        """
+        if self.sheet_count:
+            raise ValueError(f"File CSV chỉ lưu được một sheet (thêm '{sheet_name}') - hãy lưu ra .xlsx")
+        self.sheet_count = 1
+        if columns is not None:
+            self._write_header(columns)
+    
+    def write_chunk(self, df):
+        """
+        Ghi tiếp các dòng của một chunk vào cuối file (không ghi index)
+        
+        Raises:
+            ValueError: Nếu chưa gọi add_sheet hoặc cột khác chunk đầu tiên
+        """
+        if not self.sheet_count:
+            raise ValueError("Chưa tạo sheet - gọi add_sheet() trước write_chunk()")
+        if self.columns is None:
+            self._write_header(df.columns)
+        elif list(df.columns) != self.columns:
+            raise ValueError("Các chunk của cùng một sheet phải có cùng danh sách cột")
+        df.to_csv(self.file, header=False, index=False)
+        self.row_count += len(df)
+    
+    def _write_header(self, columns):
+        """Ghi dòng header"""
+        self.columns = list(columns)
+        csv.writer(self.file).writerow(self.columns)
+    
+    def close(self, discard=False):
+        """
+        Đóng file
+        
+        Args:
+            discard: True = xóa file đang ghi dở. Luôn xóa nếu chưa có sheet nào.
+        """
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        if discard or not self.sheet_count:
+            os.remove(self.file_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+        return False
+
+
+class StreamingArrowWriter:
+    """
+    Ghi file Parquet hoặc Arrow IPC/Feather theo từng chunk bằng pyarrow (một bảng - một sheet)
+    
+    Schema lấy từ chunk đầu tiên: cột object ghi dạng chuỗi, cột số/ngày giữ kiểu gốc.
+    Nếu chunk sau không ép được về schema đó (vd. cột int gặp số thực, cột toàn null ở
+    chunk đầu rồi có chuỗi) thì kiểu cột được nâng (null -> bất kỳ, int -> float64,
+    khác nữa -> chuỗi) và phần đã ghi được ghi lại theo schema mới.
+    Các cột trong dictionary_columns (vd. cột kết quả lặp lại nhiều) được ghi dạng
+    dictionary-encoded string; từ điển chỉ được nối thêm giữa các chunk nên file IPC
+    ghi được bằng dictionary delta.
+    """
+    
+    def __init__(self, file_path, dictionary_columns=()):
+        """
+        Args:
+            file_path: Đường dẫn file .parquet/.feather/.arrow đích
+            dictionary_columns: Tên các cột ghi dạng dictionary
+        
+        Raises:
+            ImportError: Nếu chưa cài pyarrow
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("Cần cài đặt pyarrow để ghi Parquet/Feather: pip install pyarrow")
+        self.file_path = file_path
+        self.is_parquet = os.path.splitext(file_path.lower())[1] == '.parquet'
+        self.dictionary_columns = set(dictionary_columns)
+        self.dictionaries = {}  # Tên cột -> (danh sách giá trị, {giá trị: mã})
+        self.writer = None
+        self.schema = None
+        self.columns = None
+        self.row_count = 0
+        self.sheet_count = 0
+        self.closed = False
+    
+    def add_sheet(self, sheet_name, columns=None):
+        """
+        Bắt đầu bảng - file Parquet/Feather chỉ chứa được một sheet
+        
+        Raises:
+            ValueError: Nếu đã có sheet trước đó
+        """
+        if self.sheet_count:
+            raise ValueError(f"File {os.path.splitext(self.file_path)[1]} chỉ lưu được một sheet "
+                             f"(thêm '{sheet_name}') - hãy lưu ra .xlsx")
+        self.sheet_count = 1
+        if columns is not None:
+            self.columns = list(columns)
+    
+    def write_chunk(self, df):
+        """
+        Ghi tiếp các dòng của một chunk (không ghi index)
+        
+        Raises:
+            ValueError: Nếu chưa gọi add_sheet hoặc cột khác chunk đầu tiên
+        """
+        if not self.sheet_count:
+            raise ValueError("Chưa tạo sheet - gọi add_sheet() trước write_chunk()")
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif list(df.columns) != self.columns:
+            raise ValueError("Các chunk của cùng một sheet phải có cùng danh sách cột")
+        
+        table = self._to_table(df)
+        if self.writer is None:
+            self._open_writer(table.schema)
+        elif table.schema != self.schema:
+            try:
+                table = table.cast(self.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                self._promote_schema(table.schema)
+                table = table.cast(self.schema)
+        self.writer.write_table(table)
+        self.row_count += len(df)
+    
+    def _open_writer(self, schema):
+        """Mở writer Parquet/IPC mới với schema cho trước"""
+        self.schema = schema
+        if self.is_parquet:
+            self.writer = pa_parquet.ParquetWriter(self.file_path, schema)
+        else:
+            options = pa_ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa_ipc.new_file(self.file_path, schema, options=options)
+    
+    def _promote_schema(self, schema):
+        """
+        Nâng schema đang ghi để chứa được cả schema mới rồi ghi lại phần đã ghi
+        
+        Parquet/IPC không đổi được schema giữa chừng nên các dòng đã ghi được đọc lại vào
+        bộ nhớ - chỉ xảy ra khi kiểu cột đổi giữa các chunk (mỗi cột nâng tối đa 2 lần).
+        """
+        promoted = pa.schema([
+            field.with_type(_promote_arrow_type(field.type, new_field.type))
+            for field, new_field in zip(self.schema, schema)
+        ])
+        self.writer.close()
+        if self.is_parquet:
+            written = pa_parquet.read_table(self.file_path)
+        else:
+            with pa.OSFile(self.file_path, 'rb') as source:
+                written = pa_ipc.open_file(source).read_all()
+        self._open_writer(promoted)
+        self.writer.write_table(written.cast(promoted))
+    
+    def _to_table(self, df):
+        """Chuyển chunk thành pa.Table theo quy tắc kiểu của writer"""
+        arrays = []
+        for position, name in enumerate(self.columns):
+            series = df.iloc[:, position]
+            if name in self.dictionary_columns:
+                arrays.append(self._encode_dictionary(name, series))
+            elif series.dtype == object:
+                arrays.append(pa.array([
+                    value if type(value) is str else (None if missing else str(value))
+                    for value, missing in zip(series.tolist(), series.isna().tolist())
+                ], type=pa.string()))
+            else:
+                arrays.append(pa.Array.from_pandas(series))
+        return pa.Table.from_arrays(arrays, names=[str(name) for name in self.columns])
+    
+    def _encode_dictionary(self, name, series):
+        """Mã hóa cột theo từ điển dùng chung cho mọi chunk (giá trị mới được nối vào cuối)"""
+        values, codes = self.dictionaries.setdefault(name, ([], {}))
+        indices = []
+        for value, missing in zip(series.tolist(), series.isna().tolist()):
+            if missing:
+                indices.append(None)
+                continue
+            value = value if type(value) is str else str(value)
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(values)
+                values.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()), pa.array(values, type=pa.string()))
+    
+    def close(self, discard=False):
+        """
+        Đóng file
+        
+        Args:
+            discard: True = xóa file đang ghi dở. Không tạo file nếu chưa có dòng nào.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer is None:
+            if not discard and self.sheet_count:
+                # Sheet không có dòng nào - vẫn tạo file chỉ có các cột (nếu biết)
+                schema = pa.schema([(str(name), pa.string()) for name in self.columns or []])
+                if self.is_parquet:
+                    pa_parquet.write_table(schema.empty_table(), self.file_path)
+                else:
+                    pa_ipc.new_file(self.file_path, schema).close()
+            return
+        self.writer.close()
+        if discard and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+        return False
+
+
+def _promote_arrow_type(current, new):
+    """Kiểu Arrow chung nhỏ nhất chứa được cả hai kiểu: null -> bất kỳ, số nguyên/thực -> float64, còn lại -> chuỗi"""
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if pa.types.is_integer(current) and pa.types.is_integer(new):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (current, new)):
+        return pa.float64()
+    return pa.string()
+
+
+def create_streaming_writer(file_path, dictionary_columns=()):
+    """
+    Tạo writer ghi theo chunk phù hợp với phần mở rộng của file đích
+    
+    Args:
+        file_path: Đường dẫn file đích (.csv -> StreamingCsvWriter, .parquet/.feather/.arrow ->
+                   StreamingArrowWriter, .xlsx/.xls -> StreamingExcelWriter)
+        dictionary_columns: Các cột ghi dạng dictionary-encoded (chỉ Parquet/Feather)
+        
+    Returns:
+        StreamingExcelWriter, StreamingCsvWriter hoặc StreamingArrowWriter
+        
+    Raises:
+        ValueError: Nếu phần mở rộng không được hỗ trợ
+    """
+    file_ext = os.path.splitext(file_path.lower())[1]
+    if file_ext == '.csv':
+        return StreamingCsvWriter(file_path)
+    if file_ext in ARROW_EXTENSIONS:
+        return StreamingArrowWriter(file_path, dictionary_columns)
+    if file_ext in ('.xlsx', '.xls'):
+        return StreamingExcelWriter(file_path)
+    raise ValueError(f"Định dạng file không được hỗ trợ: {file_ext}")
+
+
+def save_file(df, file_path, dictionary_columns=()):
+    """
+    Lưu DataFrame thành file Excel (ghi theo từng chunk STREAM_CHUNK_SIZE dòng)
     
     Args:
         df: DataFrame cần lưu
         file_path: Đường dẫn file đích
+        dictionary_columns: Các cột ghi dạng dictionary-encoded (chỉ Parquet/Feather)
         
     Raises:
         Exception: Nếu không thể lưu file
     """
-    try:
-        # Always save as .xlsx for better compatibility
-        df.to_excel(file_path, index=False, engine='openpyxl')
-    except Exception as e:
-        raise Exception(f"Lỗi lưu file {file_path}: {str(e)}")
+    save_multiple_sheets({'Sheet1': df}, file_path, dictionary_columns)
 
 
-def save_multiple_sheets(sheet_data_dict, file_path):
+def save_multiple_sheets(sheet_data_dict, file_path, dictionary_columns=()):
     """
     Lưu multiple sheets vào file Excel
     
+    Ghi bằng StreamingExcelWriter theo từng chunk STREAM_CHUNK_SIZE dòng - không tạo thêm
+    bản sao toàn bộ sheet dạng cell object trong bộ nhớ như df.to_excel.
+    File đích .csv/.parquet/.feather/.arrow được ghi bằng writer tương ứng (chỉ một sheet).
+    
     Args:
         sheet_data_dict: Dictionary {sheet_name: DataFrame}
         file_path: Đường dẫn file đích
+        dictionary_columns: Các cột ghi dạng dictionary-encoded (chỉ Parquet/Feather)
         
     Raises:
         Exception: Nếu không thể lưu file
     """
     try:
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        with create_streaming_writer(file_path, dictionary_columns) as writer:
             for sheet_name, df in sheet_data_dict.items():
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+                writer.add_sheet(sheet_name, df.columns)
+                for start in range(0, len(df), STREAM_CHUNK_SIZE):
+                    writer.write_chunk(df.iloc[start:start + STREAM_CHUNK_SIZE])
     except Exception as e:
         raise Exception(f"Lỗi lưu file {file_path}: {str(e)}")
 
@@ -4,9 +4,38 @@ UPDATED: Support new sheet2 structure with ấp matching
 FIXED: Return original data with Vietnamese characters instead of normalized data
 FIXED: Syntax errors and logic issues
 """
+import time
+from functools import lru_cache
 from thefuzz import fuzz
+from thefuzz import utils as fuzz_utils
 from core.text_processor import tach_chu_so, tach_phanchinh, normalize_ap_value, parse_ap_from_address
-from config import FUZZY_THRESHOLDS
+from core.match_cache import MatchResultCache
+from core.match_stats import MatchPathStats
+from core.typo_index import DeletionIndex
+from core.component_index import ComponentIndex
+from core.mapping_table import StringPool
+from config import FUZZY_THRESHOLDS, MATCH_CACHE_SIZE, TYPO_MAX_DISTANCE, TOKEN_SORT_CACHE_SIZE, COMPONENT_CACHE_SIZE
+from utils.profiling import profiler
+
+# Optional: gọi trực tiếp scorer của rapidfuzz với score_cutoff (bộ quét tuần tự)
+try:
+    from rapidfuzz import fuzz as rf_fuzz
+    SCORE_CUTOFF_AVAILABLE = True
+except ImportError:
+    SCORE_CUTOFF_AVAILABLE = False
+
+# Optional: NumPy cho chỉ mục đếm ký tự tên xã (lọc ứng viên của các bộ quét fuzzy)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Biên cho sai số dấu phẩy động khi suy ngược điểm thành phần tối thiểu từ điểm tổng
+SCORE_EPSILON = 1e-6
+
+# Tăng khi đổi logic match/chấm điểm - kết quả cũ trong cache trên đĩa bị bỏ qua
+MATCHER_VERSION = 1
 
 
 class FuzzyMatcher:
@@ -20,6 +49,20 @@ class FuzzyMatcher:
         self.mapping_sheet2 = []           # Normalized data for matching
         self.mapping_sheet1_original = []  # NEW: Original data for output
         self.mapping_sheet2_original = []  # NEW: Original data for output
+        self.candidates = {'sheet1': {}, 'sheet2': {}}  # Precomputed candidate columns
+        self.block_index = {}              # tỉnh -> huyện -> ứng viên
+        self.known_names = {'xa': frozenset(), 'huyen': frozenset(), 'tinh': frozenset()}  # Cho _check_error_cases
+        self.xa_index = {}                 # Ma trận đếm ký tự tên xã - lọc ứng viên cho các bộ quét fuzzy
+        self.typo_index = {}               # Từ điển biến thể xóa ký tự cho tên xã/huyện/tỉnh cũ
+        self.xa_members = {}               # Tên xã cũ -> [(position, index, sheet)]
+        self.name_groups = {}              # Ứng viên gom theo tên xã - mỗi tên chỉ chấm điểm một lần mỗi lần quét
+        self.components = {}               # 'tinh'/'huyen'/'tinh_moi' -> ComponentIndex (điểm theo id tên chuẩn)
+        self.component_ids = {}            # sheet -> {'tinh'/'huyen'/'tinh_moi': cột id tên chuẩn}
+        self.result_cache = MatchResultCache(MATCH_CACHE_SIZE)  # Kết quả match theo khóa chuẩn hóa
+        self.mapping_signature = None      # Dấu vân tay mapping để biết khi nào xóa result_cache
+        self.persistent_cache = None       # PersistentMatchCache (optional) - dùng lại kết quả giữa các lần chạy
+        self._persistent_warmed = False
+        self.path_stats = MatchPathStats()  # Đường match, số ứng viên, phân bố điểm
     
     def load_mapping_data(self, mapping_sheet1, mapping_sheet2, mapping_sheet1_original=None, mapping_sheet2_original=None):
         """
@@ -31,6 +74,47 @@ class FuzzyMatcher:
             mapping_sheet1_original: Original data từ sheet1 (5 elements, with Vietnamese chars)
             mapping_sheet2_original: Original data từ sheet2 (7 elements, with Vietnamese chars)
         """
+        self._set_mapping_data(mapping_sheet1, mapping_sheet2, mapping_sheet1_original, mapping_sheet2_original)
+        self._build_cache()
+    
+    def load_compiled_data(self, mapping_sheet1, mapping_sheet2, mapping_sheet1_original, mapping_sheet2_original, index_state):
+        """
+        Load dữ liệu mapping kèm các cache đã build sẵn (từ snapshot) - bỏ qua _build_cache
+        
+        Args:
+            mapping_sheet1, mapping_sheet2: Dữ liệu mapping đã chuẩn hóa
+            mapping_sheet1_original, mapping_sheet2_original: Dữ liệu gốc
+            index_state: dict từ get_index_state()
+        """
+        self._set_mapping_data(mapping_sheet1, mapping_sheet2, mapping_sheet1_original, mapping_sheet2_original)
+        self.cache = index_state['cache']
+        self.new_address_cache = index_state['new_address_cache']
+        self.sheet2_cache = index_state['sheet2_cache']
+        self.candidates = index_state['candidates']
+        self.block_index = index_state['block_index']
+        self.known_names = self._build_known_names()
+        self.xa_index = self._build_xa_index() if NUMPY_AVAILABLE else {}
+        self.name_groups = self._build_name_groups()
+        self._build_components()
+        self._build_typo_index()
+    
+    def get_index_state(self):
+        """
+        Lấy các cache đã build để lưu snapshot
+        
+        Returns:
+            dict: cache, new_address_cache, sheet2_cache, candidates, block_index
+        """
+        return {
+            'cache': self.cache,
+            'new_address_cache': self.new_address_cache,
+            'sheet2_cache': self.sheet2_cache,
+            'candidates': self.candidates,
+            'block_index': self.block_index,
+        }
+    
+    def _set_mapping_data(self, mapping_sheet1, mapping_sheet2, mapping_sheet1_original, mapping_sheet2_original):
+        """Lưu dữ liệu mapping và xóa kết quả cũ nếu mapping thay đổi"""
         self.mapping_sheet1 = mapping_sheet1
         self.mapping_sheet2 = mapping_sheet2
         
@@ -38,26 +122,36 @@ class FuzzyMatcher:
         self.mapping_sheet1_original = mapping_sheet1_original or mapping_sheet1
         self.mapping_sheet2_original = mapping_sheet2_original or mapping_sheet2
         
-        self._build_cache()
+        # Mapping thay đổi thì kết quả cũ không còn đúng
+        signature = hash((
+            tuple(self.mapping_sheet1), tuple(self.mapping_sheet2),
+            tuple(self.mapping_sheet1_original), tuple(self.mapping_sheet2_original)
+        ))
+        if signature != self.mapping_signature:
+            self.result_cache.clear()
+            self.detach_persistent_cache()
+            self.mapping_signature = signature
     
     def _build_cache(self):
         """Tạo cache để tối ưu hiệu suất - using normalized data for matching"""
         self.cache = {}
         self.new_address_cache = {}
         self.sheet2_cache = {}
+        # Các chuỗi tách ra từ mapping (khóa cache, bảng ứng viên) lặp lại rất nhiều - dùng chung một bản
+        intern = StringPool().canonical
         
         # Build cache for sheet1 (using normalized data)
         for i, item in enumerate(self.mapping_sheet1):
             xacu, huyencu, tinhcu, xamoi, tinhmoi = item
             
             # Cache cho địa chỉ cũ (xã cũ + huyện + tỉnh cũ)
-            key = (tach_phanchinh(xacu), tach_phanchinh(huyencu), tach_phanchinh(tinhcu))
+            key = (intern(tach_phanchinh(xacu)), intern(tach_phanchinh(huyencu)), intern(tach_phanchinh(tinhcu)))
             if key not in self.cache:
                 self.cache[key] = []
             self.cache[key].append((i, 'sheet1'))  # Store index instead of item
             
             # Cache cho địa chỉ mới (xã mới + tỉnh mới)
-            new_key = (tach_phanchinh(xamoi), tach_phanchinh(tinhmoi))
+            new_key = (intern(tach_phanchinh(xamoi)), intern(tach_phanchinh(tinhmoi)))
             if new_key not in self.new_address_cache:
                 self.new_address_cache[new_key] = []
             self.new_address_cache[new_key].append((i, 'sheet1'))  # Store index instead of item
@@ -68,14 +162,144 @@ class FuzzyMatcher:
             
             # Cache cho địa chỉ cũ với ấp (ấp cũ + xã cũ + huyện + tỉnh cũ)
             key = (
-                tach_phanchinh(apcu), 
-                tach_phanchinh(xacu), 
-                tach_phanchinh(huyencu), 
-                tach_phanchinh(tinhcu)
+                intern(tach_phanchinh(apcu)), 
+                intern(tach_phanchinh(xacu)), 
+                intern(tach_phanchinh(huyencu)), 
+                intern(tach_phanchinh(tinhcu))
             )
             if key not in self.sheet2_cache:
                 self.sheet2_cache[key] = []
             self.sheet2_cache[key].append(i)  # Store index instead of item
+        
+        # Bảng ứng viên dạng cột - tách chữ/số một lần khi load thay vì mỗi dòng input
+        self.candidates = {
+            'sheet1': self._build_candidate_table(self.mapping_sheet1, intern, xa=0, huyen=1, tinh=2, xamoi=3, tinhmoi=4),
+            'sheet2': self._build_candidate_table(self.mapping_sheet2, intern, xa=1, huyen=2, tinh=3, xamoi=5, tinhmoi=6, ap=0),
+        }
+        
+        # Chỉ mục khối theo tỉnh cũ -> huyện cũ: {tinh: {huyen: [(position, index, sheet)]}}
+        # position giữ thứ tự quét gốc (sheet1 trước sheet2) để xử lý hòa điểm
+        self.block_index = {}
+        position = 0
+        for sheet in ('sheet1', 'sheet2'):
+            table = self.candidates[sheet]
+            for i, (huyen_chu, tinh_chu) in enumerate(zip(table['huyen_chu'], table['tinh_chu'])):
+                huyen_blocks = self.block_index.setdefault(tinh_chu, {})
+                huyen_blocks.setdefault(huyen_chu, []).append((position, i, sheet))
+                position += 1
+        
+        self.known_names = self._build_known_names()
+        self.xa_index = self._build_xa_index() if NUMPY_AVAILABLE else {}
+        self.name_groups = self._build_name_groups()
+        self._build_components()
+        self._build_typo_index()
+    
+    def _build_typo_index(self):
+        """
+        Tạo từ điển biến thể xóa (khoảng cách sửa <= TYPO_MAX_DISTANCE) cho tên xã/huyện/tỉnh cũ
+        của cả hai sheet, và danh sách ứng viên theo tên xã (position giống block_index)
+        """
+        self.typo_index = {}
+        self.xa_members = {}
+        if TYPO_MAX_DISTANCE <= 0:
+            return
+        for huyen_blocks in self.block_index.values():
+            for members in huyen_blocks.values():
+                for position, index, sheet in members:
+                    self.xa_members.setdefault(self.candidates[sheet]['xa_chu'][index], []).append((position, index, sheet))
+        for members in self.xa_members.values():
+            members.sort()
+        self.typo_index = {
+            'xa': DeletionIndex(self.xa_members, TYPO_MAX_DISTANCE),
+            'huyen': DeletionIndex(self.known_names['huyen'], TYPO_MAX_DISTANCE),
+            'tinh': DeletionIndex(self.known_names['tinh'], TYPO_MAX_DISTANCE),
+        }
+    
+    def _build_components(self):
+        """
+        Tạo chỉ mục tên chuẩn cho tỉnh cũ, huyện cũ, tỉnh mới (cả hai sheet) và cột id tương ứng
+        của từng sheet - các bộ quét so sánh tỉnh/huyện bằng id và hàng điểm đã cache theo query
+        """
+        table1, table2 = self.candidates['sheet1'], self.candidates['sheet2']
+        self.components = {
+            kind: ComponentIndex(table1[column] + table2[column], self._score_text,
+                                 FUZZY_THRESHOLDS[threshold], COMPONENT_CACHE_SIZE)
+            for kind, column, threshold in (('tinh', 'tinh_chu', 'tinh_min'),
+                                            ('huyen', 'huyen_chu', 'huyen_min'),
+                                            ('tinh_moi', 'tinh_moi_chu', 'tinh_moi_min'))
+        }
+        self.component_ids = {
+            sheet: {
+                kind: self.components[kind].encode(self.candidates[sheet][column])
+                for kind, column in (('tinh', 'tinh_chu'), ('huyen', 'huyen_chu'), ('tinh_moi', 'tinh_moi_chu'))
+            }
+            for sheet in ('sheet1', 'sheet2')
+        }
+    
+    def _build_name_groups(self):
+        """
+        Gom ứng viên theo tên xã cho các bộ quét tuần tự
+        
+        Returns:
+            dict: {'sheet2_xa': [(xã cũ, [(index, xa_so)])] - các dòng sheet2,
+                   'new_xa': [(xã mới, [(position, index, sheet, xa_moi_so)])] - cả hai sheet,
+                   cùng thứ tự id tên với xa_index['new']}
+        """
+        table1, table2 = self.candidates['sheet1'], self.candidates['sheet2']
+        sheet2_xa = {}
+        for i, (xa_chu, xa_so) in enumerate(zip(table2['xa_chu'], table2['xa_so'])):
+            sheet2_xa.setdefault(xa_chu, []).append((i, xa_so))
+        
+        new_xa = {}
+        position = 0
+        for sheet, table in (('sheet1', table1), ('sheet2', table2)):
+            for i, (xa_moi_chu, xa_moi_so) in enumerate(zip(table['xa_moi_chu'], table['xa_moi_so'])):
+                new_xa.setdefault(xa_moi_chu, []).append((position, i, sheet, xa_moi_so))
+                position += 1
+        return {'sheet2_xa': list(sheet2_xa.items()), 'new_xa': list(new_xa.items())}
+    
+    def _build_known_names(self):
+        """
+        Tập tên xã (phần chữ)/huyện/tỉnh cũ có trong mapping (cả hai sheet) - để phân loại lỗi
+        
+        Returns:
+            dict: {'xa': frozenset, 'huyen': frozenset, 'tinh': frozenset}
+        """
+        table1, table2 = self.candidates['sheet1'], self.candidates['sheet2']
+        return {
+            'xa': frozenset(table1['xa_chu']) | frozenset(table2['xa_chu']),
+            'huyen': frozenset(table1['huyen_chu']) | frozenset(table2['huyen_chu']),
+            'tinh': frozenset(table1['tinh_chu']) | frozenset(table2['tinh_chu']),
+        }
+    
+    def _build_candidate_table(self, mapping, intern, xa, huyen, tinh, xamoi, tinhmoi, ap=None):
+        """
+        Tạo bảng ứng viên dạng cột (column-oriented) cho fuzzy matching
+        
+        Args:
+            mapping: Dữ liệu mapping đã chuẩn hóa (list of tuples hoặc MappingView)
+            intern: Hàm trả về bản dùng chung của một chuỗi (StringPool.canonical)
+            xa, huyen, tinh, xamoi, tinhmoi, ap: Vị trí các cột trong tuple
+            
+        Returns:
+            dict: {tên cột: list} - cùng thứ tự với mapping
+        """
+        table = {
+            'xa_chu': [], 'xa_so': [], 'huyen_chu': [], 'tinh_chu': [],
+            'xa_moi_chu': [], 'xa_moi_so': [], 'tinh_moi_chu': [], 'ap_chu': [],
+        }
+        for item in mapping:
+            xa_chu, xa_so = tach_chu_so(tach_phanchinh(item[xa]))
+            xa_moi_chu, xa_moi_so = tach_chu_so(tach_phanchinh(item[xamoi]))
+            table['xa_chu'].append(intern(xa_chu))
+            table['xa_so'].append(intern(xa_so))
+            table['huyen_chu'].append(intern(tach_phanchinh(item[huyen])))
+            table['tinh_chu'].append(intern(tach_phanchinh(item[tinh])))
+            table['xa_moi_chu'].append(intern(xa_moi_chu))
+            table['xa_moi_so'].append(intern(xa_moi_so))
+            table['tinh_moi_chu'].append(intern(tach_phanchinh(item[tinhmoi])))
+            table['ap_chu'].append(intern(tach_phanchinh(item[ap])) if ap is not None else '')
+        return table
     
     def match_row(self, xa, huyen, tinh, ap=None, address_detail=None):
         """
@@ -89,25 +313,366 @@ class FuzzyMatcher:
         Returns:
             tuple: (xacu, huyencu, tinhcu, xamoi, tinhmoi, lý do) - with original Vietnamese characters
         """
+        key = self.build_match_key(xa, huyen, tinh, ap, address_detail)
+        if profiler.enabled:
+            return self._match_row_profiled(key)
+        start = time.perf_counter()
+        result = self.result_cache.get(key)
+        if result is None:
+            result = self._persistent_lookup([key]).get(key)
+            if result is None:
+                result = self._match_key(key)
+                self._persistent_store({key: result})
+                self.result_cache.put(key, result)
+                return result
+            self.result_cache.put(key, result)
+        else:
+            self._persistent_touch([key])
+        self.path_stats.record('cache', time.perf_counter() - start)
+        return result
+    
+    def _match_row_profiled(self, key):
+        """Như phần tra cache/match của match_row nhưng đo thời gian từng bước (khi profiler bật)"""
+        start = time.perf_counter()
+        with profiler.stage('match_row.cache_lookup'):
+            result = self.result_cache.get(key)
+            if result is None:
+                result = self._persistent_lookup([key]).get(key)
+                if result is not None:
+                    self.result_cache.put(key, result)
+            else:
+                self._persistent_touch([key])
+        if result is not None:
+            self.path_stats.record('cache', time.perf_counter() - start)
+            profiler.count('match_row.cache_hits')
+            return result
+        
+        with profiler.stage('match_row.match'):
+            result = self._match_key(key)
+        with profiler.stage('match_row.cache_store'):
+            self._persistent_store({key: result})
+            self.result_cache.put(key, result)
+        profiler.count('match_row.computed')
+        return result
+    
+    def _match_key(self, key):
+        """Match một khóa chuẩn hóa (xa, huyen, tinh, ap_info) - không qua result_cache"""
+        start = time.perf_counter()
+        result, path = self._resolve_key(key)
+        self.path_stats.record(path, time.perf_counter() - start)
+        return result
+    
+    def _resolve_key(self, key):
+        """
+        Match một khóa và cho biết đường match (tra cứu chính xác / quét fuzzy / phân loại lỗi)
+        
+        Returns:
+            tuple: (kết quả, tên đường match - xem core.match_stats.MATCH_PATHS)
+        """
+        xa, huyen, tinh, ap_info = key
         xa_chu, xa_so = tach_chu_so(tach_phanchinh(xa))
         huyen_chu = tach_phanchinh(huyen)
         tinh_chu = tach_phanchinh(tinh)
 
-        # Determine ấp information
-        ap_info = self._get_ap_info(ap, address_detail)
-
         # XỬ LÝ TRƯỜNG HỢP THIẾU HUYỆN - KIỂM TRA VỚI ĐỊA CHỈ MỚI
         if not huyen_chu.strip():
-            return self._match_new_address(xa_chu, xa_so, tinh_chu)
+            result = self._lookup_new_address(xa_chu, xa_so, tinh_chu)
+            if result is not None:
+                return result, 'new_address.exact'
+            result = self._fuzzy_match_new_address(xa_chu, xa_so, tinh_chu)
+            return result, 'new_address.fuzzy' if result[0] is not None else 'new_address.none'
         
         # XỬ LÝ TRƯỜNG HỢP CÓ ẤP - MATCH VỚI SHEET2 TRƯỚC
         if ap_info:
-            result = self._match_sheet2_with_ap(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+            result = self._lookup_sheet2(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+            path = 'sheet2.exact'
+            if result is None:
+                result = self._fuzzy_match_sheet2(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+                path = 'sheet2.fuzzy'
             if result[0] is not None:  # Found match in sheet2
-                return result
+                return result, path
         
         # XỬ LÝ TRƯỜNG HỢP CÓ ĐẦY ĐỦ XÃ + HUYỆN + TỈNH - MATCH VỚI SHEET1
-        return self._match_full_address(xa_chu, xa_so, huyen_chu, tinh_chu, xa, huyen, tinh)
+        result = self._lookup_full_address(xa_chu, xa_so, huyen_chu, tinh_chu)
+        if result is not None:
+            return result, 'full.exact'
+        
+        # Lỗi gõ sai 1-2 ký tự: ứng viên từ từ điển biến thể xóa - trả thẳng nếu chứng minh được
+        # không ứng viên nào vượt qua, ngược lại dùng làm điểm khởi đầu cho bước quét
+        seed = self._typo_seed(xa_chu, xa_so, huyen_chu, tinh_chu)
+        if seed is not None and self._is_unbeatable_seed(seed, xa_chu, xa_so, huyen_chu, tinh_chu):
+            return self._full_address_result(seed[1], seed[2]), 'full.typo'
+        result = self._fuzzy_match_full_address(xa_chu, xa_so, huyen_chu, tinh_chu, xa, huyen, tinh, seed)
+        return result, 'full.fuzzy' if result[0] is not None else 'error_cases'
+    
+    def match_batch(self, xa_list, huyen_list, tinh_list, ap_list=None, address_list=None):
+        """
+        Match nhiều dòng cùng lúc - kết quả giống hệt gọi match_row từng dòng
+        
+        Cả lô được tra cache một lần; mỗi khóa unique còn thiếu chỉ được match một lần
+        (cùng các bộ quét có cắt tỉa như match_row).
+        
+        Args:
+            xa_list, huyen_list, tinh_list: Danh sách xã/huyện/tỉnh đã chuẩn hóa
+            ap_list: Danh sách giá trị cột ấp (optional)
+            address_list: Danh sách địa chỉ chi tiết (optional)
+            
+        Returns:
+            list: Danh sách tuple kết quả theo đúng thứ tự đầu vào
+        """
+        n = len(xa_list)
+        ap_list = ap_list if ap_list is not None else [None] * n
+        address_list = address_list if address_list is not None else [None] * n
+        keys = [
+            self.build_match_key(xa_list[i], huyen_list[i], tinh_list[i], ap_list[i], address_list[i])
+            for i in range(n)
+        ]
+        return self.match_keys(keys)
+    
+    def match_keys(self, keys):
+        """
+        Match danh sách khóa chuẩn hóa (từ build_match_key) - qua result_cache và cache trên đĩa
+        
+        Args:
+            keys: Danh sách tuple (xa, huyen, tinh, ap_info)
+            
+        Returns:
+            list: Danh sách tuple kết quả theo đúng thứ tự keys
+        """
+        start = time.perf_counter()
+        with profiler.stage('match.cache_lookup'):
+            results = self.lookup_results(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        self.path_stats.record('cache', time.perf_counter() - start, len(keys) - len(missing))
+        if missing:
+            with profiler.stage('match.compute'):
+                computed = self._compute_keys([keys[i] for i in missing])
+            for i, result in zip(missing, computed):
+                results[i] = result
+            with profiler.stage('match.cache_store'):
+                self.store_results([keys[i] for i in missing], computed)
+        profiler.count('match.keys', len(keys))
+        profiler.count('match.computed', len(missing))
+        return results
+    
+    def lookup_results(self, keys):
+        """
+        Tra kết quả đã có cho các khóa (result_cache, sau đó cache trên đĩa cho cả lô)
+        
+        Returns:
+            list: Kết quả theo thứ tự keys, None nếu chưa có
+        """
+        results = [self.result_cache.get(key) for key in keys]
+        missing = {keys[i] for i, result in enumerate(results) if result is None}
+        self._persistent_touch([key for key, result in zip(keys, results) if result is not None])
+        stored = self._persistent_lookup(missing)
+        if stored:
+            for i, key in enumerate(keys):
+                if results[i] is None and key in stored:
+                    results[i] = stored[key]
+                    self.result_cache.put(key, results[i])
+        return results
+    
+    def store_results(self, keys, results):
+        """Lưu kết quả vừa tính vào result_cache và cache trên đĩa"""
+        for key, result in zip(keys, results):
+            self.result_cache.put(key, result)
+        self._persistent_store(dict(zip(keys, results)))
+    
+    def _compute_keys(self, keys):
+        """
+        Tính kết quả cho các khóa (không qua cache) - mỗi khóa unique chỉ match một lần
+        
+        Args:
+            keys: Danh sách khóa chuẩn hóa
+            
+        Returns:
+            list: Kết quả theo thứ tự keys
+        """
+        unique = {}
+        for key in keys:
+            if key not in unique:
+                unique[key] = self._match_key(key)
+        # Khóa lặp lại trong lô tính như trúng cache (giống match_row từng dòng)
+        self.path_stats.record('cache', 0.0, len(keys) - len(unique))
+        return [unique[key] for key in keys]
+    
+    def get_cache_stats(self):
+        """
+        Thống kê result cache (hits/misses/evictions)
+        
+        Returns:
+            dict: Thống kê từ MatchResultCache.get_stats()
+        """
+        stats = self.result_cache.get_stats()
+        if self.persistent_cache is not None:
+            stats['persistent'] = self.persistent_cache.get_stats()
+        return stats
+    
+    def get_match_stats(self):
+        """
+        Thống kê đường match từ lần reset_match_stats gần nhất (gồm cả các khóa match ở worker
+        của ProcessMatchEngine - được gộp về sau mỗi lô)
+        
+        Returns:
+            dict: Từ MatchPathStats.get_stats()
+        """
+        return self.path_stats.get_stats()
+    
+    def reset_match_stats(self):
+        """Xóa thống kê đường match (gọi ở đầu mỗi lần chạy)"""
+        self.path_stats.reset()
+    
+    def attach_persistent_cache(self, persistent_cache):
+        """
+        Gắn cache trên đĩa - được nạp vào result_cache ở lần match đầu tiên
+        
+        Args:
+            persistent_cache: PersistentMatchCache đã namespace theo mapping hiện tại
+        """
+        self.detach_persistent_cache()
+        self.persistent_cache = persistent_cache
+        self._persistent_warmed = False
+    
+    def detach_persistent_cache(self):
+        """Flush và bỏ cache trên đĩa hiện tại (khi mapping thay đổi)"""
+        if self.persistent_cache is not None:
+            self.persistent_cache.close()
+        self.persistent_cache = None
+        self._persistent_warmed = False
+    
+    def _persistent_lookup(self, keys):
+        """Tra cache trên đĩa cho các khóa chưa có trong result_cache - {key: result}"""
+        cache = self.persistent_cache
+        if cache is None or not keys:
+            return {}
+        if not self._persistent_warmed:
+            # Warm lazily: chỉ đọc đĩa khi thực sự bắt đầu match
+            self._persistent_warmed = True
+            cache.warm(self.result_cache)
+            found = {}
+            for key in keys:
+                result = self.result_cache.get(key)
+                if result is not None:
+                    found[key] = result
+            cache.touch(list(found))
+            keys = [key for key in keys if key not in found]
+            found.update(cache.get_many(keys))
+            return found
+        return cache.get_many(list(keys))
+    
+    def _persistent_touch(self, keys):
+        """Báo cache trên đĩa các khóa vừa trúng result_cache - last_used được cập nhật khi flush"""
+        if self.persistent_cache is not None and keys:
+            self.persistent_cache.touch(keys)
+    
+    def _persistent_store(self, results):
+        """Ghi các kết quả vừa tính vào cache trên đĩa"""
+        if self.persistent_cache is None:
+            return
+        for key, result in results.items():
+            self.persistent_cache.put(key, result)
+    
+    def _build_xa_index(self):
+        """
+        Chỉ mục đếm ký tự cho tên xã cũ ('old') và xã mới ('new') để lọc ứng viên fuzzy
+        
+        Mỗi tên xã unique là một dòng của ma trận số lần xuất hiện từng ký tự, cho cả tên gốc
+        và dạng token_sort (full_process + sắp xếp token). Từ số ký tự chung với query suy ra
+        điểm trần của ratio/partial_ratio/token_sort_ratio (xem _xa_candidates).
+        """
+        table1, table2 = self.candidates['sheet1'], self.candidates['sheet2']
+        index = {}
+        for prefix, xa_col in (('old', 'xa_chu'), ('new', 'xa_moi_chu')):
+            names, ids = self._unique_ids(table1[xa_col] + table2[xa_col])
+            tokens = [self._token_sort_text(name) for name in names]
+            alphabet = {char: k for k, char in enumerate(sorted({char for text in names + tokens for char in text}))}
+            index[prefix] = {
+                'alphabet': alphabet,
+                'ids': {'sheet1': ids[:len(table1[xa_col])].tolist(), 'sheet2': ids[len(table1[xa_col]):].tolist()},
+                'counts': self._char_counts(names, alphabet),
+                'lengths': np.array([len(name) for name in names], dtype=np.intp),
+                'token_counts': self._char_counts(tokens, alphabet),
+                'token_lengths': np.array([len(text) for text in tokens], dtype=np.intp),
+            }
+        return index
+    
+    @staticmethod
+    @lru_cache(maxsize=TOKEN_SORT_CACHE_SIZE)
+    def _token_sort_text(text):
+        """Chuỗi mà token_sort_ratio (thefuzz) thực sự so sánh: full_process rồi sắp xếp token"""
+        return ' '.join(sorted(fuzz_utils.full_process(text, force_ascii=True).split()))
+    
+    @staticmethod
+    def _char_counts(texts, alphabet):
+        """Ma trận số lần xuất hiện của từng ký tự trong alphabet (ký tự ngoài alphabet bị bỏ qua)"""
+        counts = np.zeros((len(texts), len(alphabet)), dtype=np.int32)
+        for row, text in enumerate(texts):
+            for char in text:
+                column = alphabet.get(char)
+                if column is not None:
+                    counts[row, column] += 1
+        return counts
+    
+    def _xa_candidates(self, prefix, xa_chu, threshold):
+        """
+        Lọc tên xã có thể đạt threshold với query xa_chu (không bỏ sót ứng viên nào)
+        
+        Với c = số ký tự chung (tính cả lặp) và s = độ dài chuỗi ngắn hơn: chuỗi con chung dài
+        nhất không vượt quá c, nên ratio <= 200c/(len1+len2) <= 200c/(s+c) và partial_ratio
+        <= 200c/(s+c). token_sort_ratio được chặn tương tự trên dạng token_sort. Ngưỡng cắt
+        trừ 1 điểm cho phần làm tròn, giống score_cutoff trong _score_text.
+        
+        Args:
+            prefix: 'old' (xã cũ) hoặc 'new' (xã mới)
+            xa_chu: Phần chữ của tên xã cần match
+            threshold: Điểm xã tối thiểu (xa_min / xa_moi_min)
+        
+        Returns:
+            list or None: Cờ True/False theo id tên xã (xa_index[prefix]['ids']), None nếu không có chỉ mục
+        """
+        index = self.xa_index.get(prefix)
+        if not index:
+            return None
+        
+        alphabet = index['alphabet']
+        bounds = []
+        for text, counts, lengths in ((xa_chu, index['counts'], index['lengths']),
+                                      (self._token_sort_text(xa_chu), index['token_counts'], index['token_lengths'])):
+            query = np.zeros(len(alphabet), dtype=np.int32)
+            for char in text:
+                column = alphabet.get(char)
+                if column is not None:
+                    query[column] += 1
+            bounds.append((np.minimum(counts, query).sum(axis=1), lengths, len(text)))
+        
+        (common, lengths, size), (token_common, token_lengths, token_size) = bounds
+        # Mẫu số bằng 0 nghĩa là cả hai chuỗi rỗng - rapidfuzz cho 100 điểm nên luôn giữ lại
+        shorter = np.minimum(lengths, size) + common
+        partial_bound = np.where(shorter > 0, 200.0 * common / np.maximum(shorter, 1), 100.0)
+        token_total = token_lengths + token_size
+        token_bound = np.where(token_total > 0, 200.0 * token_common / np.maximum(token_total, 1), 100.0)
+        return ((partial_bound >= threshold - 1) | (token_bound * 0.9 >= threshold - 1)).tolist()
+    
+    @staticmethod
+    def _unique_ids(values):
+        """Trả về (danh sách giá trị unique, mảng id cho từng phần tử)"""
+        names = list(dict.fromkeys(values))
+        ids = {name: k for k, name in enumerate(names)}
+        return names, np.array([ids[value] for value in values], dtype=np.intp)
+    
+    def build_match_key(self, xa, huyen, tinh, ap=None, address_detail=None):
+        """
+        Khóa chuẩn hóa của một dòng - các dòng cùng khóa luôn cho cùng kết quả match
+        
+        Args:
+            xa, huyen, tinh: Xã/huyện/tỉnh đã chuẩn hóa (chuan_hoa)
+            ap, address_detail: Giá trị gốc cột ấp/địa chỉ (chỉ dùng phần ấp parse được)
+            
+        Returns:
+            tuple: (xa, huyen, tinh, ap_info)
+        """
+        return (xa, huyen, tinh, self._get_ap_info(ap, address_detail))
     
     def _get_ap_info(self, ap, address_detail):
         """Get ấp information from ap column or parse from address detail"""
@@ -126,6 +691,15 @@ class FuzzyMatcher:
     def _match_sheet2_with_ap(self, xa_chu, xa_so, huyen_chu, tinh_chu, ap_info):
         """Match với sheet2 data using ấp information - FIXED to return original data"""
         # Exact match first
+        result = self._lookup_sheet2(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+        if result is not None:
+            return result
+        
+        # Fuzzy match
+        return self._fuzzy_match_sheet2(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+    
+    def _lookup_sheet2(self, xa_chu, xa_so, huyen_chu, tinh_chu, ap_info):
+        """Tra cứu chính xác sheet2 theo ấp - trả về None nếu không có"""
         exact_key = (ap_info, xa_chu + ' ' + xa_so if xa_so else xa_chu, huyen_chu, tinh_chu)
         if exact_key in self.sheet2_cache:
             indices = self.sheet2_cache[exact_key]
@@ -134,56 +708,57 @@ class FuzzyMatcher:
                 original_item = self.mapping_sheet2_original[indices[0]]
                 # Convert sheet2 to sheet1 format using original data
                 return (original_item[1], original_item[2], original_item[3], original_item[5], original_item[6], '')
-        
-        # Fuzzy match
-        return self._fuzzy_match_sheet2(xa_chu, xa_so, huyen_chu, tinh_chu, ap_info)
+        return None
     
     def _fuzzy_match_sheet2(self, xa_chu, xa_so, huyen_chu, tinh_chu, ap_info):
         """Fuzzy match với sheet2 data - FIXED to return original data"""
         best_score = 0
         best_match_index = None
+        scored = 0
         
-        for i, item in enumerate(self.mapping_sheet2):
-            apcu, xacu, huyencu, tinhcu, apmoi, xamoi, tinhmoi = item
-            
-            # Parse components (using normalized data for comparison)
-            apcu_chu = tach_phanchinh(apcu)
-            xacu_chu, xacu_so = tach_chu_so(tach_phanchinh(xacu))
-            
+        table = self.candidates['sheet2']
+        ids = self.component_ids['sheet2']
+        huyen_scores = self.components['huyen'].scores(huyen_chu)
+        tinh_scores = self.components['tinh'].scores(tinh_chu)
+        
+        # Điểm xã tính một lần cho mỗi tên xã (nhiều dòng ấp chung một xã), giữ các dòng đạt xa_min
+        # theo thứ tự gốc. Xã được xét trước ấp vì loại được phần lớn ứng viên với ít phép tính nhất.
+        candidates = []
+        for xacu_chu, members in self.name_groups['sheet2_xa']:
             # Filter by number first
-            if xa_so and xa_so != xacu_so:
+            rows = [i for i, xacu_so in members if not xa_so or xa_so == xacu_so]
+            if not rows:
                 continue
-            
-            # Score ấp (highest priority)
-            score_ap = self._score_ap_match(ap_info, apcu_chu)
-            if score_ap < FUZZY_THRESHOLDS['ap_min']:
+            scored += len(rows)
+            score_xa = self._score_text(xa_chu, xacu_chu, FUZZY_THRESHOLDS['xa_min'])
+            if score_xa >= FUZZY_THRESHOLDS['xa_min']:
+                candidates.extend((i, score_xa) for i in rows)
+        candidates.sort()
+        
+        for i, score_xa in candidates:
+            # Mỗi thành phần phải đạt ngưỡng riêng và đủ để tổng điểm còn có thể vượt best_score
+            # (các thành phần chưa tính lấy 100 điểm) - dưới mức đó thì bỏ ứng viên ngay
+            if score_xa < (best_score - 70) / 0.3 - SCORE_EPSILON:
                 continue
             
-            # Score xã
-            score_xa = max(
-                fuzz.ratio(xa_chu, xacu_chu),
-                fuzz.partial_ratio(xa_chu, xacu_chu),
-                fuzz.token_sort_ratio(xa_chu, xacu_chu) * 0.9
-            )
-            if score_xa < FUZZY_THRESHOLDS['xa_min']:
+            # Score ấp (highest priority)
+            cutoff = max(FUZZY_THRESHOLDS['ap_min'], (best_score - 0.3 * score_xa - 30) / 0.4 - SCORE_EPSILON)
+            score_ap = self._score_ap_match(ap_info, table['ap_chu'][i], cutoff)
+            if score_ap < cutoff:
                 continue
             
             # Score huyện
-            score_huyen = max(
-                fuzz.ratio(huyen_chu, tach_phanchinh(huyencu)),
-                fuzz.partial_ratio(huyen_chu, tach_phanchinh(huyencu)),
-                fuzz.token_sort_ratio(huyen_chu, tach_phanchinh(huyencu)) * 0.9
-            )
-            if score_huyen < FUZZY_THRESHOLDS['huyen_min']:
+            cutoff = max(FUZZY_THRESHOLDS['huyen_min'],
+                         (best_score - 0.4 * score_ap - 0.3 * score_xa - 10) / 0.2 - SCORE_EPSILON)
+            score_huyen = huyen_scores[ids['huyen'][i]]
+            if score_huyen < cutoff:
                 continue
             
             # Score tỉnh
-            score_tinh = max(
-                fuzz.ratio(tinh_chu, tach_phanchinh(tinhcu)),
-                fuzz.partial_ratio(tinh_chu, tach_phanchinh(tinhcu)),
-                fuzz.token_sort_ratio(tinh_chu, tach_phanchinh(tinhcu)) * 0.9
-            )
-            if score_tinh < FUZZY_THRESHOLDS['tinh_min']:
+            cutoff = max(FUZZY_THRESHOLDS['tinh_min'],
+                         (best_score - 0.4 * score_ap - 0.3 * score_xa - 0.2 * score_huyen) / 0.1 - SCORE_EPSILON)
+            score_tinh = tinh_scores[ids['tinh'][i]]
+            if score_tinh < cutoff:
                 continue
             
             # Calculate total score with ấp priority
@@ -198,6 +773,7 @@ class FuzzyMatcher:
                 best_score = total_score
                 best_match_index = i
         
+        self.path_stats.record_scan('sheet2', scored, best_score if best_match_index is not None else None)
         if best_match_index is not None and best_score >= FUZZY_THRESHOLDS['total_min']:
             # FIXED: Return original data instead of normalized
             original_item = self.mapping_sheet2_original[best_match_index]
@@ -206,8 +782,12 @@ class FuzzyMatcher:
         
         return (None, None, None, None, None, 'xã cấu véo, cần thực hiện thủ công')
     
-    def _score_ap_match(self, ap_info, apcu_chu):
-        """Score ấp matching with special rules for numbers vs text"""
+    def _score_ap_match(self, ap_info, apcu_chu, cutoff=0):
+        """
+        Score ấp matching with special rules for numbers vs text
+        
+        cutoff: Như _score_text - điểm >= cutoff là chính xác, điểm < cutoff có thể bị cắt
+        """
         if not ap_info or not apcu_chu:
             return 0
         
@@ -227,20 +807,31 @@ class FuzzyMatcher:
             
             # For text-based ấp, use fuzzy matching
             if ap_keyword == apcu_keyword:
-                return max(
-                    fuzz.ratio(ap_value, apcu_value),
-                    fuzz.partial_ratio(ap_value, apcu_value)
-                )
+                if not SCORE_CUTOFF_AVAILABLE:
+                    return max(
+                        fuzz.ratio(ap_value, apcu_value),
+                        fuzz.partial_ratio(ap_value, apcu_value)
+                    )
+                score = round(rf_fuzz.ratio(ap_value, apcu_value, score_cutoff=max(0, cutoff - 1)))
+                if score < 100:
+                    score = max(score, round(rf_fuzz.partial_ratio(ap_value, apcu_value,
+                                                                   score_cutoff=max(0, cutoff - 1, score - 1))))
+                return score
         
         # Fallback to general fuzzy matching
-        return max(
-            fuzz.ratio(ap_info, apcu_chu),
-            fuzz.partial_ratio(ap_info, apcu_chu),
-            fuzz.token_sort_ratio(ap_info, apcu_chu) * 0.9
-        )
+        return self._score_text(ap_info, apcu_chu, cutoff)
     
     def _match_new_address(self, xa_chu, xa_so, tinh_chu):
         """Match với địa chỉ mới khi thiếu huyện - FIXED to return original data"""
+        result = self._lookup_new_address(xa_chu, xa_so, tinh_chu)
+        if result is not None:
+            return result
+        
+        # Nếu không match chính xác, thử fuzzy match với địa chỉ mới
+        return self._fuzzy_match_new_address(xa_chu, xa_so, tinh_chu)
+    
+    def _lookup_new_address(self, xa_chu, xa_so, tinh_chu):
+        """Tra cứu chính xác địa chỉ mới (xã mới + tỉnh mới) - trả về None nếu không có"""
         new_address_key = (xa_chu + ' ' + xa_so if xa_so else xa_chu, tinh_chu)
         
         # Kiểm tra chính xác với địa chỉ mới
@@ -260,88 +851,55 @@ class FuzzyMatcher:
                     original_item = self.mapping_sheet2_original[index]
                     return (original_item[1], original_item[2], original_item[3], 
                            original_item[5], original_item[6], 'Địa chỉ mới - giữ nguyên')
-        
-        # Nếu không match chính xác, thử fuzzy match với địa chỉ mới
-        return self._fuzzy_match_new_address(xa_chu, xa_so, tinh_chu)
+        return None
     
     def _fuzzy_match_new_address(self, xa_chu, xa_so, tinh_chu):
         """Fuzzy match với địa chỉ mới - FIXED to return original data"""
         best_score = 0
         best_match_index = None
         best_sheet = None
+        scored = 0
+        allowed = self._xa_candidates('new', xa_chu, FUZZY_THRESHOLDS['xa_moi_min'])
+        tinh_moi_scores = self.components['tinh_moi'].scores(tinh_chu)
         
-        # Check sheet1
-        for i, item in enumerate(self.mapping_sheet1):
-            xacu, huyencu, tinhcu, xamoi, tinhmoi = item
-            xa_moi_chu, xa_moi_so = tach_chu_so(tach_phanchinh(xamoi))
-            
-            # Lọc sơ bộ theo số
-            if xa_so and xa_so != xa_moi_so:
-                continue
-            
-            # Tính điểm cho xã mới
-            score_xa_moi = max(
-                fuzz.ratio(xa_chu, xa_moi_chu),
-                fuzz.partial_ratio(xa_chu, xa_moi_chu),
-                fuzz.token_sort_ratio(xa_chu, xa_moi_chu) * 0.9
-            )
-            
-            if score_xa_moi < FUZZY_THRESHOLDS['xa_moi_min']:
+        # Điểm xã mới tính một lần cho mỗi tên (nhiều xã cũ sáp nhập vào cùng một xã mới),
+        # giữ các dòng đạt xa_moi_min theo thứ tự gốc: sheet1 rồi sheet2 (thứ tự ưu tiên khi hòa điểm)
+        candidates = []
+        for name_id, (xa_moi_chu, members) in enumerate(self.name_groups['new_xa']):
+            # Tên xã mới chắc chắn không đạt xa_moi_min (theo chỉ mục ký tự)
+            if allowed is not None and not allowed[name_id]:
                 continue
-
-            # Tính điểm cho tỉnh mới
-            score_tinh_moi = max(
-                fuzz.ratio(tinh_chu, tach_phanchinh(tinhmoi)),
-                fuzz.partial_ratio(tinh_chu, tach_phanchinh(tinhmoi)),
-                fuzz.token_sort_ratio(tinh_chu, tach_phanchinh(tinhmoi)) * 0.9
-            )
             
-            if score_tinh_moi < FUZZY_THRESHOLDS['tinh_moi_min']:
+            # Lọc sơ bộ theo số
+            rows = [member for member in members if not xa_so or xa_so == member[3]]
+            if not rows:
                 continue
-
-            total_score = 0.7 * score_xa_moi + 0.3 * score_tinh_moi
-            
-            if total_score > best_score:
-                best_score = total_score
-                best_match_index = i
-                best_sheet = 'sheet1'
+            scored += len(rows)
+            score_xa_moi = self._score_text(xa_chu, xa_moi_chu, FUZZY_THRESHOLDS['xa_moi_min'])
+            if score_xa_moi >= FUZZY_THRESHOLDS['xa_moi_min']:
+                candidates.extend((position, i, sheet, score_xa_moi) for position, i, sheet, _ in rows)
+        candidates.sort()
         
-        # Check sheet2
-        for i, item in enumerate(self.mapping_sheet2):
-            apcu, xacu, huyencu, tinhcu, apmoi, xamoi, tinhmoi = item
-            xa_moi_chu, xa_moi_so = tach_chu_so(tach_phanchinh(xamoi))
-            
-            # Lọc sơ bộ theo số
-            if xa_so and xa_so != xa_moi_so:
+        for _, i, sheet, score_xa_moi in candidates:
+            # Bỏ ngay nếu kể cả tỉnh 100 điểm cũng không vượt được best_score
+            if score_xa_moi < (best_score - 30) / 0.7 - SCORE_EPSILON:
                 continue
             
-            # Tính điểm cho xã mới
-            score_xa_moi = max(
-                fuzz.ratio(xa_chu, xa_moi_chu),
-                fuzz.partial_ratio(xa_chu, xa_moi_chu),
-                fuzz.token_sort_ratio(xa_chu, xa_moi_chu) * 0.9
-            )
-            
-            if score_xa_moi < FUZZY_THRESHOLDS['xa_moi_min']:
-                continue
-
             # Tính điểm cho tỉnh mới
-            score_tinh_moi = max(
-                fuzz.ratio(tinh_chu, tach_phanchinh(tinhmoi)),
-                fuzz.partial_ratio(tinh_chu, tach_phanchinh(tinhmoi)),
-                fuzz.token_sort_ratio(tinh_chu, tach_phanchinh(tinhmoi)) * 0.9
-            )
+            cutoff = max(FUZZY_THRESHOLDS['tinh_moi_min'], (best_score - 0.7 * score_xa_moi) / 0.3 - SCORE_EPSILON)
+            score_tinh_moi = tinh_moi_scores[self.component_ids[sheet]['tinh_moi'][i]]
             
-            if score_tinh_moi < FUZZY_THRESHOLDS['tinh_moi_min']:
+            if score_tinh_moi < cutoff:
                 continue
-
+            
             total_score = 0.7 * score_xa_moi + 0.3 * score_tinh_moi
             
             if total_score > best_score:
                 best_score = total_score
                 best_match_index = i
-                best_sheet = 'sheet2'
+                best_sheet = sheet
 
+        self.path_stats.record_scan('new_address', scored, best_score if best_match_index is not None else None)
         if best_match_index is not None and best_score >= FUZZY_THRESHOLDS['total_min']:
             if best_sheet == 'sheet1':
                 # FIXED: Return original data
@@ -358,6 +916,15 @@ class FuzzyMatcher:
     def _match_full_address(self, xa_chu, xa_so, huyen_chu, tinh_chu, xa_orig, huyen_orig, tinh_orig):
         """Match với địa chỉ đầy đủ - FIXED to return original data"""
         # Tìm kiếm chính xác trước
+        result = self._lookup_full_address(xa_chu, xa_so, huyen_chu, tinh_chu)
+        if result is not None:
+            return result
+
+        # Nếu không tìm thấy chính xác, dùng fuzzy matching
+        return self._fuzzy_match_full_address(xa_chu, xa_so, huyen_chu, tinh_chu, xa_orig, huyen_orig, tinh_orig)
+    
+    def _lookup_full_address(self, xa_chu, xa_so, huyen_chu, tinh_chu):
+        """Tra cứu chính xác địa chỉ cũ (xã + huyện + tỉnh) - trả về None nếu không có"""
         exact_key = (xa_chu + ' ' + xa_so if xa_so else xa_chu, huyen_chu, tinh_chu)
         if exact_key in self.cache:
             matches = self.cache[exact_key]
@@ -375,133 +942,264 @@ class FuzzyMatcher:
                     original_item = self.mapping_sheet2_original[index]
                     return (original_item[1], original_item[2], original_item[3], 
                            original_item[5], original_item[6], 'Xã cấu véo')
-
-        # Nếu không tìm thấy chính xác, dùng fuzzy matching
-        return self._fuzzy_match_full_address(xa_chu, xa_so, huyen_chu, tinh_chu, xa_orig, huyen_orig, tinh_orig)
+        return None
     
-    def _fuzzy_match_full_address(self, xa_chu, xa_so, huyen_chu, tinh_chu, xa_orig, huyen_orig, tinh_orig):
-        """Fuzzy match với địa chỉ đầy đủ - FIXED to return original data"""
-        best_score = 0
-        best_match_index = None
-        best_sheet = None
+    def _typo_seed(self, xa_chu, xa_so, huyen_chu, tinh_chu):
+        """
+        Ứng viên hợp lệ tốt nhất có xã/huyện/tỉnh cách query không quá TYPO_MAX_DISTANCE phép sửa
         
-        # Tạo danh sách ứng viên
-        candidates = []
+        Chỉ tra từ điển biến thể xóa rồi chấm điểm vài ứng viên tìm được theo đúng công thức của
+        _fuzzy_match_full_address.
         
-        # Check sheet1
-        for i, item in enumerate(self.mapping_sheet1):
-            xacu, huyencu, tinhcu, xamoi, tinhmoi = item
-            xacu_chu, xacu_so = tach_chu_so(tach_phanchinh(xacu))
-            
-            # Lọc sơ bộ theo số
-            if xa_so and xa_so != xacu_so:
-                continue
-            
-            # Lọc sơ bộ theo độ dài tên xã
-            if abs(len(xa_chu) - len(xacu_chu)) > 5:
+        Returns:
+            tuple or None: (điểm, index, sheet, position) hoặc None nếu không có ứng viên hợp lệ
+        """
+        if not self.typo_index:
+            return None
+        # Huyện/tỉnh đã đúng tên thì khối tốt nhất là khối của chính tên đó - không cần tra biến thể
+        huyen_names = self._typo_names('huyen', huyen_chu)
+        tinh_names = self._typo_names('tinh', tinh_chu) if huyen_names else None
+        if not tinh_names:
+            return None
+        
+        best = None
+        huyen_scores = self.components['huyen'].scores(huyen_chu)
+        tinh_scores = self.components['tinh'].scores(tinh_chu)
+        for name in self.typo_index['xa'].lookup(xa_chu):
+            if abs(len(xa_chu) - len(name)) > 5:
                 continue
+            score_xa = None
+            for position, index, sheet in self.xa_members[name]:
+                table = self.candidates[sheet]
+                if table['huyen_chu'][index] not in huyen_names or table['tinh_chu'][index] not in tinh_names:
+                    continue
+                if xa_so and xa_so != table['xa_so'][index]:
+                    continue
+                
+                if score_xa is None:
+                    score_xa = self._score_text(xa_chu, name, FUZZY_THRESHOLDS['xa_min'])
+                score_huyen = huyen_scores[self.component_ids[sheet]['huyen'][index]]
+                score_tinh = tinh_scores[self.component_ids[sheet]['tinh'][index]]
+                if (score_xa < FUZZY_THRESHOLDS['xa_min'] or score_huyen < FUZZY_THRESHOLDS['huyen_min'] or
+                        score_tinh < FUZZY_THRESHOLDS['tinh_min']):
+                    continue
                 
-            candidates.append((i, 'sheet1'))
+                total_score = 0.5 * score_xa + 0.3 * score_huyen + 0.2 * score_tinh
+                if best is None or total_score > best[0] or (total_score == best[0] and position < best[3]):
+                    best = (total_score, index, sheet, position)
+        return best
+    
+    def _typo_names(self, kind, name):
+        """Tên huyện/tỉnh cũ cách name không quá TYPO_MAX_DISTANCE phép sửa ({name} nếu đã có trong mapping)"""
+        if name in self.known_names[kind]:
+            return {name}
+        return set(self.typo_index[kind].lookup(name))
+    
+    def _is_unbeatable_seed(self, seed, xa_chu, xa_so, huyen_chu, tinh_chu):
+        """
+        Kiểm tra seed chắc chắn là kết quả của _fuzzy_match_full_address mà không cần chấm điểm xã
         
-        # Check sheet2
-        for i, item in enumerate(self.mapping_sheet2):
-            apcu, xacu, huyencu, tinhcu, apmoi, xamoi, tinhmoi = item
-            xacu_chu, xacu_so = tach_chu_so(tach_phanchinh(xacu))
+        Điều kiện: điểm seed đạt total_min và bằng điểm trần lớn nhất của các khối (tức điểm xã
+        của seed là 100 và khối của seed có điểm huyện/tỉnh cao nhất), và không có ứng viên nào
+        đứng trước seed trong các khối đạt điểm trần đó có tên xã cũng đạt 100 điểm (trùng hoặc
+        chứa nhau). Tên ngắn (< 100 ký tự) chỉ đạt 100 điểm khi trùng hoặc là chuỗi con của nhau.
+        
+        Returns:
+            bool: True nếu trả thẳng seed cho kết quả giống hệt bước quét
+        """
+        best_score, _, _, best_position = seed
+        if best_score < FUZZY_THRESHOLDS['total_min'] or len(xa_chu) >= 100:
+            return False
+        for bound, _, _, members in self._get_candidate_blocks(huyen_chu, tinh_chu, best_score):
+            if bound > best_score:
+                return False
+            if bound < best_score:
+                break
+            for position, index, sheet in members:
+                if position >= best_position:
+                    break
+                table = self.candidates[sheet]
+                xacu_chu = table['xa_chu'][index]
+                if xa_so and xa_so != table['xa_so'][index]:
+                    continue
+                if abs(len(xa_chu) - len(xacu_chu)) > 5:
+                    continue
+                if xa_chu in xacu_chu or xacu_chu in xa_chu:
+                    return False
+        return True
+    
+    def _full_address_result(self, index, sheet):
+        """Kết quả match địa chỉ cũ theo dữ liệu gốc của dòng mapping (dạng sheet1)"""
+        if sheet == 'sheet1':
+            # FIXED: Return original data
+            original_item = self.mapping_sheet1_original[index]
+            return original_item + ('',)
+        # FIXED: Return original data, convert to sheet1 format
+        original_item = self.mapping_sheet2_original[index]
+        return (original_item[1], original_item[2], original_item[3], 
+               original_item[5], original_item[6], 'Xã cấu véo')
+    
+    def _fuzzy_match_full_address(self, xa_chu, xa_so, huyen_chu, tinh_chu, xa_orig, huyen_orig, tinh_orig, seed=None):
+        """
+        Fuzzy match với địa chỉ đầy đủ - chỉ quét các khối tỉnh/huyện có thể đạt ngưỡng
+        
+        Điểm huyện/tỉnh của mọi ứng viên trong cùng một khối là như nhau, nên khối nào
+        không đạt huyen_min/tinh_min thì bỏ qua cả khối. Các khối được quét theo điểm trần
+        giảm dần và dừng khi điểm trần thấp hơn điểm tốt nhất - kết quả giống hệt quét toàn bộ.
+        
+        seed: (điểm, index, sheet, position) của một ứng viên hợp lệ (từ _typo_seed) - dùng làm
+        điểm tốt nhất ban đầu để bỏ qua sớm các tỉnh/khối không thể vượt qua. Hòa điểm vẫn
+        ưu tiên ứng viên đứng trước nên kết quả không đổi.
+        """
+        best_score = 0
+        best_match_index = None
+        best_sheet = None
+        best_position = None
+        scored = 0
+        allowed = None
+        if seed is not None:
+            best_score, best_match_index, best_sheet, best_position = seed
+        
+        for bound, score_huyen, score_tinh, members in self._get_candidate_blocks(huyen_chu, tinh_chu, best_score):
+            # Khối này không thể vượt (hoặc hòa) điểm tốt nhất hiện tại
+            if bound < best_score:
+                break
             
-            # Lọc sơ bộ theo số
-            if xa_so and xa_so != xacu_so:
-                continue
+            # Chỉ tính bộ lọc tên xã khi có ít nhất một khối cần quét
+            if allowed is None:
+                allowed = self._xa_candidates('old', xa_chu, FUZZY_THRESHOLDS['xa_min']) or ()
+                xa_ids = self.xa_index['old']['ids'] if allowed else None
             
-            # Lọc sơ bộ theo độ dài tên xã
-            if abs(len(xa_chu) - len(xacu_chu)) > 5:
-                continue
+            for position, index, sheet in members:
+                table = self.candidates[sheet]
+                xacu_chu = table['xa_chu'][index]
                 
-            candidates.append((i, 'sheet2'))
-
-        # Tính điểm cho các ứng viên
-        for index, sheet in candidates:
-            if sheet == 'sheet1':
-                item = self.mapping_sheet1[index]
-                xacu, huyencu, tinhcu, xamoi, tinhmoi = item
-            else:  # sheet2
-                item = self.mapping_sheet2[index]
-                apcu, xacu, huyencu, tinhcu, apmoi, xamoi, tinhmoi = item
-            
-            xacu_chu, xacu_so = tach_chu_so(tach_phanchinh(xacu))
-            
-            # Tính điểm xã với các phương pháp khác nhau
-            score_xa_ratio = fuzz.ratio(xa_chu, xacu_chu)
-            score_xa_partial = fuzz.partial_ratio(xa_chu, xacu_chu)
-            score_xa_token = fuzz.token_sort_ratio(xa_chu, xacu_chu)
-            score_xa = max(score_xa_ratio, score_xa_partial, score_xa_token * 0.9)
-            
-            if score_xa < FUZZY_THRESHOLDS['xa_min']:
-                continue
-
-            # Tính điểm huyện
-            score_huyen = max(
-                fuzz.ratio(huyen_chu, tach_phanchinh(huyencu)),
-                fuzz.partial_ratio(huyen_chu, tach_phanchinh(huyencu)),
-                fuzz.token_sort_ratio(huyen_chu, tach_phanchinh(huyencu)) * 0.9
-            )
-            if score_huyen < FUZZY_THRESHOLDS['huyen_min']:
-                continue
-
-            # Tính điểm tỉnh
-            score_tinh = max(
-                fuzz.ratio(tinh_chu, tach_phanchinh(tinhcu)),
-                fuzz.partial_ratio(tinh_chu, tach_phanchinh(tinhcu)),
-                fuzz.token_sort_ratio(tinh_chu, tach_phanchinh(tinhcu)) * 0.9
-            )
-            if score_tinh < FUZZY_THRESHOLDS['tinh_min']:
-                continue
+                # Lọc sơ bộ theo số
+                if xa_so and xa_so != table['xa_so'][index]:
+                    continue
+                
+                # Lọc sơ bộ theo độ dài tên xã
+                if abs(len(xa_chu) - len(xacu_chu)) > 5:
+                    continue
+                
+                # Tên xã chắc chắn không đạt xa_min (theo chỉ mục ký tự)
+                if allowed and not allowed[xa_ids[sheet][index]]:
+                    continue
+                scored += 1
+                
+                # Tính điểm xã - chỉ cần chính xác khi đủ để tổng điểm đạt (hoặc hòa) best_score
+                cutoff = max(FUZZY_THRESHOLDS['xa_min'],
+                             (best_score - 0.3 * score_huyen - 0.2 * score_tinh) / 0.5 - SCORE_EPSILON)
+                score_xa = self._score_text(xa_chu, xacu_chu, cutoff)
+                
+                if score_xa < cutoff:
+                    continue
 
-            # Điều chỉnh trọng số
-            total_score = (
-                0.5 * score_xa +      # Xã quan trọng nhất
-                0.3 * score_huyen +   # Huyện quan trọng thứ hai
-                0.2 * score_tinh      # Tỉnh ít quan trọng nhất
-            )
-            
-            if total_score > best_score:
-                best_score = total_score
-                best_match_index = index
-                best_sheet = sheet
+                # Điều chỉnh trọng số
+                total_score = (
+                    0.5 * score_xa +      # Xã quan trọng nhất
+                    0.3 * score_huyen +   # Huyện quan trọng thứ hai
+                    0.2 * score_tinh      # Tỉnh ít quan trọng nhất
+                )
+                
+                # Hòa điểm thì ưu tiên ứng viên đứng trước trong mapping (như quét tuần tự)
+                if total_score > best_score or (total_score == best_score and position < best_position):
+                    best_score = total_score
+                    best_match_index = index
+                    best_sheet = sheet
+                    best_position = position
 
+        self.path_stats.record_scan('full', scored, best_score if best_match_index is not None else None)
+        
         # Ngưỡng điểm tối thiểu
         if best_match_index is not None and best_score >= FUZZY_THRESHOLDS['total_min']:
-            if best_sheet == 'sheet1':
-                # FIXED: Return original data
-                original_item = self.mapping_sheet1_original[best_match_index]
-                return original_item + ('',)
-            else:  # sheet2
-                # FIXED: Return original data, convert to sheet1 format
-                original_item = self.mapping_sheet2_original[best_match_index]
-                return (original_item[1], original_item[2], original_item[3], 
-                       original_item[5], original_item[6], 'Xã cấu véo')
+            return self._full_address_result(best_match_index, best_sheet)
 
         # Nếu không match được, kiểm tra các trường hợp lỗi
         return self._check_error_cases(xa_orig, huyen_orig, tinh_orig)
     
-    def _check_error_cases(self, xa, huyen, tinh):
-        """Kiểm tra các trường hợp lỗi cụ thể - using normalized data for checking"""
-        # Use normalized data for error checking
-        all_mapping = self.mapping_sheet1 + [
-            (item[1], item[2], item[3], item[5], item[6]) for item in self.mapping_sheet2
-        ]
+    def _get_candidate_blocks(self, huyen_chu, tinh_chu, min_bound=0):
+        """
+        Lấy các khối ứng viên (theo tỉnh cũ, rồi huyện cũ) có thể đạt ngưỡng
+        
+        Tỉnh không khớp chính xác vẫn được mở rộng sang mọi tỉnh đạt tinh_min (fuzzy).
+        
+        Args:
+            huyen_chu, tinh_chu: Huyện/tỉnh cần match
+            min_bound: Bỏ qua các khối có điểm trần < min_bound (tỉnh không thể đạt thì không chấm điểm huyện)
+        
+        Returns:
+            list: [(điểm trần, điểm huyện, điểm tỉnh, members)] sắp xếp theo điểm trần giảm dần
+        """
+        blocks = []
+        tinh_ids, huyen_ids = self.components['tinh'].ids, self.components['huyen'].ids
+        tinh_scores = self.components['tinh'].scores(tinh_chu)
+        huyen_scores = self.components['huyen'].scores(huyen_chu)
+        tinh_cutoff = max(FUZZY_THRESHOLDS['tinh_min'], (min_bound - 80) / 0.2 - SCORE_EPSILON)
+        for tinh_key, huyen_blocks in self.block_index.items():
+            score_tinh = tinh_scores[tinh_ids[tinh_key]]
+            if score_tinh < tinh_cutoff:
+                continue
+            
+            huyen_cutoff = max(FUZZY_THRESHOLDS['huyen_min'], (min_bound - 50 - 0.2 * score_tinh) / 0.3 - SCORE_EPSILON)
+            for huyen_key, members in huyen_blocks.items():
+                score_huyen = huyen_scores[huyen_ids[huyen_key]]
+                if score_huyen < huyen_cutoff:
+                    continue
+                
+                bound = 0.5 * 100 + 0.3 * score_huyen + 0.2 * score_tinh
+                blocks.append((bound, score_huyen, score_tinh, members))
+        
+        blocks.sort(key=lambda block: block[0], reverse=True)
+        return blocks
+    
+    @staticmethod
+    def _score_text(query, target, cutoff=0):
+        """
+        Điểm fuzzy chuẩn cho một thành phần địa chỉ: max(ratio, partial_ratio, token_sort_ratio * 0.9)
+        
+        Các scorer được gọi lần lượt, mỗi scorer với score_cutoff = điểm nó cần vượt
+        (max(cutoff, điểm tốt nhất đã có)) trừ 1 cho phần làm tròn của thefuzz. ratio và
+        token_sort_ratio bị bỏ qua hẳn nếu điểm trần theo độ dài (200 * len ngắn / tổng len)
+        không đủ; token_sort_ratio cũng bị bỏ qua khi điểm hiện có đã > 90.
         
-        xa_found = any(
-            tach_chu_so(tach_phanchinh(xa))[0] == tach_chu_so(tach_phanchinh(m[0]))[0]
-            for m in all_mapping
-        )
-        huyen_found = any(
-            tach_phanchinh(huyen) == tach_phanchinh(m[1])
-            for m in all_mapping
-        )
-        tinh_found = any(
-            tach_phanchinh(tinh) == tach_phanchinh(m[2])
-            for m in all_mapping
-        )
+        Args:
+            query, target: Chuỗi cần so sánh
+            cutoff: Điểm tối thiểu cần quan tâm (0 = luôn tính đủ)
+        
+        Returns:
+            float: Đúng bằng điểm không cắt nếu điểm đó >= cutoff, ngược lại một giá trị < cutoff
+        """
+        if not SCORE_CUTOFF_AVAILABLE:
+            return max(
+                fuzz.ratio(query, target),
+                fuzz.partial_ratio(query, target),
+                fuzz.token_sort_ratio(query, target) * 0.9
+            )
+        if cutoff > 100:
+            return 0
+        
+        best = 0
+        size, target_size = len(query), len(target)
+        if not size + target_size or 200 * min(size, target_size) / (size + target_size) >= cutoff - 1:
+            best = round(rf_fuzz.ratio(query, target, score_cutoff=max(0, cutoff - 1)))
+        if best < 100:
+            best = max(best, round(rf_fuzz.partial_ratio(query, target, score_cutoff=max(0, cutoff - 1, best - 1))))
+        
+        need = max(cutoff, best) / 0.9
+        if need <= 100:
+            query_tokens = FuzzyMatcher._token_sort_text(query)
+            target_tokens = FuzzyMatcher._token_sort_text(target)
+            size, target_size = len(query_tokens), len(target_tokens)
+            if not size + target_size or 200 * min(size, target_size) / (size + target_size) >= need - 1:
+                best = max(best, round(rf_fuzz.ratio(query_tokens, target_tokens, score_cutoff=max(0, need - 1))) * 0.9)
+        return best
+    
+    def _check_error_cases(self, xa, huyen, tinh):
+        """Kiểm tra các trường hợp lỗi cụ thể - tra tập tên đã chuẩn hóa sẵn (known_names)"""
+        xa_found = tach_chu_so(tach_phanchinh(xa))[0] in self.known_names['xa']
+        huyen_found = tach_phanchinh(huyen) in self.known_names['huyen']
+        tinh_found = tach_phanchinh(tinh) in self.known_names['tinh']
 
         if not xa_found:
             return (None, None, None, None, None, 'Thông tin sai: Xã không tồn tại')
@@ -523,4 +1221,18 @@ def fuzzy_match_row(xa, huyen, tinh, ap=None, address_detail=None):
     """
     Wrapper function để maintain compatibility với code cũ - UPDATED
     """
-    return fuzzy_matcher.match_row(xa, huyen, tinh, ap, address_detail)
\ No newline at end of file
+    return fuzzy_matcher.match_row(xa, huyen, tinh, ap, address_detail)
+
+
+def fuzzy_match_batch(xa_list, huyen_list, tinh_list, ap_list=None, address_list=None):
+    """
+    Wrapper function cho batch matching - cùng kết quả với fuzzy_match_row từng dòng
+    """
+    return fuzzy_matcher.match_batch(xa_list, huyen_list, tinh_list, ap_list, address_list)
+
+
+def get_match_key(xa, huyen, tinh, ap=None, address_detail=None):
+    """
+    Wrapper function lấy khóa chuẩn hóa của một dòng (dùng để gom dòng trùng)
+    """
+    return fuzzy_matcher.build_match_key(xa, huyen, tinh, ap, address_detail)
@@ -0,0 +1,214 @@
+"""
+Module bảng mapping dạng gọn (compact)
+Mọi tên hành chính của mapping (dạng gốc và dạng chuẩn hóa) được lưu một lần trong StringPool;
+mỗi cột chỉ là array('i') các id chuỗi. Một dòng tốn vài byte mỗi cột thay vì một tuple cộng các
+chuỗi riêng, snapshot chỉ gồm danh sách chuỗi + mảng số (JSON), và các worker fork không phải chạm vào
+refcount của hàng nghìn tuple (trang nhớ copy-on-write được giữ nguyên).
+
+Code cũ vẫn dùng được như list of tuples qua MappingView / MappingRow:
+    rows = table.view(['xacu', 'huyencu', 'tinhcu'])
+    rows[0][1]          # 'Huyện ...'
+    rows[0] + ('',)     # tuple
+"""
+from array import array
+
+
+class StringPool:
+    """Danh sách chuỗi không trùng lặp, mỗi chuỗi có một id số nguyên"""
+    
+    def __init__(self, strings=()):
+        self.strings = []
+        self.ids = {}
+        for text in strings:
+            self.intern(text)
+    
+    def intern(self, text):
+        """
+        Lấy id của chuỗi (thêm vào pool nếu chưa có)
+        
+        Args:
+            text: Chuỗi cần intern
+        
+        Returns:
+            int: Id chuỗi
+        """
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+    
+    def canonical(self, text):
+        """Đối tượng chuỗi dùng chung trong pool bằng với text (các bản trùng lặp trỏ về một chỗ)"""
+        return self.strings[self.intern(text)]
+    
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+    
+    def __len__(self):
+        return len(self.strings)
+    
+    def __getstate__(self):
+        # Chỉ lưu danh sách chuỗi - dict id được dựng lại khi load
+        return self.strings
+    
+    def __setstate__(self, strings):
+        self.strings = strings
+        self.ids = {text: string_id for string_id, text in enumerate(strings)}
+
+
+class MappingTable:
+    """Bảng mapping dạng cột: tên cột -> array('i') id chuỗi trong pool"""
+    
+    def __init__(self, columns, pool=None):
+        """
+        Args:
+            columns: dict {tên cột: dãy chuỗi} - mọi cột cùng số dòng
+            pool: StringPool dùng chung (optional, mặc định tạo mới)
+        
+        Raises:
+            ValueError: Nếu các cột không cùng số dòng
+        """
+        self.pool = pool if pool is not None else StringPool()
+        intern = self.pool.intern
+        self.columns = {name: array('i', (intern(text) for text in values)) for name, values in columns.items()}
+        self.row_count = self._check_columns()
+    
+    @classmethod
+    def from_ids(cls, columns, pool):
+        """
+        Tạo bảng từ các cột id chuỗi có sẵn (vd. đọc từ snapshot) - không intern lại
+        
+        Args:
+            columns: dict {tên cột: dãy id trong pool}
+            pool: StringPool chứa các chuỗi
+        
+        Returns:
+            MappingTable
+        
+        Raises:
+            ValueError: Nếu các cột không cùng số dòng hoặc có id nằm ngoài pool
+        """
+        table = cls({}, pool)
+        table.columns = {name: array('i', ids) for name, ids in columns.items()}
+        for name, column in table.columns.items():
+            if column and (min(column) < 0 or max(column) >= len(pool)):
+                raise ValueError(f"Cột mapping '{name}' có id chuỗi nằm ngoài pool")
+        table.row_count = table._check_columns()
+        return table
+    
+    def _check_columns(self):
+        """Số dòng chung của các cột (ValueError nếu khác nhau)"""
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Các cột mapping không cùng số dòng: {sorted(lengths)}")
+        return lengths.pop() if lengths else 0
+    
+    def view(self, column_names):
+        """
+        Dãy dòng (giống list of tuples) gồm các cột column_names theo đúng thứ tự
+        
+        Args:
+            column_names: Danh sách tên cột
+        
+        Returns:
+            MappingView
+        """
+        return MappingView(self, column_names)
+    
+    def column(self, name):
+        """Giá trị chuỗi của một cột (list)"""
+        strings = self.pool.strings
+        return [strings[string_id] for string_id in self.columns[name]]
+    
+    def get_stats(self):
+        """
+        Thống kê bộ nhớ của bảng
+        
+        Returns:
+            dict: rows, columns, strings (số chuỗi trong pool), array_bytes (tổng byte các mảng id)
+        """
+        return {
+            'rows': self.row_count,
+            'columns': len(self.columns),
+            'strings': len(self.pool),
+            'array_bytes': sum(column.itemsize * len(column) for column in self.columns.values()),
+        }
+    
+    def __len__(self):
+        return self.row_count
+
+
+class MappingView:
+    """Một số cột của MappingTable nhìn như list of tuples (len, index, iterate)"""
+    __slots__ = ('table', 'column_names', 'arrays')
+    
+    def __init__(self, table, column_names):
+        self.table = table
+        self.column_names = tuple(column_names)
+        self.arrays = tuple(table.columns[name] for name in self.column_names)
+    
+    def __len__(self):
+        return self.table.row_count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [MappingRow(self, k) for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('mapping row index out of range')
+        return MappingRow(self, index)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield MappingRow(self, index)
+    
+    def __getstate__(self):
+        return self.table, self.column_names
+    
+    def __setstate__(self, state):
+        self.table, self.column_names = state
+        self.arrays = tuple(self.table.columns[name] for name in self.column_names)
+
+
+class MappingRow:
+    """View một dòng của MappingView - hành xử như tuple chuỗi, chỉ dựng tuple khi cần"""
+    __slots__ = ('view', 'index')
+    
+    def __init__(self, view, index):
+        self.view = view
+        self.index = index
+    
+    def as_tuple(self):
+        """Tuple chuỗi của dòng"""
+        strings, index = self.view.table.pool.strings, self.index
+        return tuple(strings[column[index]] for column in self.view.arrays)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return self.as_tuple()[position]
+        return self.view.table.pool.strings[self.view.arrays[position][self.index]]
+    
+    def __len__(self):
+        return len(self.view.arrays)
+    
+    def __iter__(self):
+        return iter(self.as_tuple())
+    
+    def __add__(self, other):
+        return self.as_tuple() + tuple(other)
+    
+    def __radd__(self, other):
+        return tuple(other) + self.as_tuple()
+    
+    def __eq__(self, other):
+        if isinstance(other, (MappingRow, tuple)):
+            return self.as_tuple() == tuple(other)
+        return NotImplemented
+    
+    def __hash__(self):
+        return hash(self.as_tuple())
+    
+    def __repr__(self):
+        return repr(self.as_tuple())
@@ -0,0 +1,283 @@
+"""
+Module cache kết quả match
+LRU cache giới hạn kích thước, thread-safe, dùng chung giữa các sheet và các file trong một phiên
+PersistentMatchCache: cache trên đĩa (SQLite) dùng lại giữa các lần chạy
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MatchResultCache:
+    """LRU cache kết quả match theo khóa chuẩn hóa (xa, huyen, tinh, ap_info)"""
+    
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """
+        Lấy kết quả đã cache
+        
+        Args:
+            key: Khóa chuẩn hóa của dòng
+            
+        Returns:
+            tuple or None: Kết quả match, None nếu chưa có
+        """
+        with self._lock:
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key, result):
+        """Lưu kết quả, loại bỏ mục ít dùng nhất khi vượt quá max_size"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Xóa toàn bộ cache và reset bộ đếm"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def get_stats(self):
+        """
+        Lấy thống kê cache
+        
+        Returns:
+            dict: size, max_size, hits, misses, evictions, hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+    
+    def __len__(self):
+        return len(self._data)
+
+
+class PersistentMatchCache:
+    """
+    Cache kết quả match trên đĩa (SQLite) - namespace theo hash của mapping.xlsx + FUZZY_THRESHOLDS
+    
+    Kết nối được mở lazily ở lần tra cứu đầu tiên. Mọi lỗi SQLite đều tắt cache thay vì
+    làm hỏng quá trình match. Khóa được dùng lại (trúng get_many hoặc touch) được cập nhật
+    last_used ở lần flush kế tiếp, nên compact giữ lại các kết quả còn được dùng.
+    """
+    
+    def __init__(self, db_path, namespace, max_entries=500000, flush_every=1000):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.enabled = True
+        self._conn = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._touched = set()   # Khóa đã có trên đĩa vừa được dùng lại - cập nhật last_used khi flush
+        self.hits = 0
+        self.misses = 0
+    
+    def _connect(self):
+        """Mở kết nối và tạo bảng nếu chưa có (gọi trong lock)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS match_cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, result TEXT NOT NULL, '
+                'last_used INTEGER NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            self._conn.commit()
+        return self._conn
+    
+    def _disable(self, error):
+        """Tắt cache khi có lỗi SQLite"""
+        print(f"⚠️ Tắt cache kết quả trên đĩa: {error}")
+        self.enabled = False
+        self._pending.clear()
+        self._touched.clear()
+    
+    @staticmethod
+    def _encode(value):
+        return json.dumps(list(value), ensure_ascii=False)
+    
+    def warm(self, result_cache):
+        """
+        Nạp các kết quả dùng gần nhất của namespace vào LRU cache trong bộ nhớ
+        
+        Args:
+            result_cache: MatchResultCache cần nạp
+            
+        Returns:
+            int: Số kết quả đã nạp
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            try:
+                rows = self._connect().execute(
+                    'SELECT key, result FROM match_cache WHERE namespace = ? ORDER BY last_used DESC, rowid DESC LIMIT ?',
+                    (self.namespace, result_cache.max_size)
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return 0
+        # Nạp từ cũ đến mới để mục mới nhất nằm cuối LRU
+        for key, result in reversed(rows):
+            result_cache.put(tuple(json.loads(key)), tuple(json.loads(result)))
+        return len(rows)
+    
+    def get_many(self, keys):
+        """
+        Tra cứu nhiều khóa cùng lúc
+        
+        Args:
+            keys: Danh sách khóa chuẩn hóa
+            
+        Returns:
+            dict: {key: result} cho các khóa tìm thấy
+        """
+        if not self.enabled or not keys:
+            return {}
+        encoded = {self._encode(key): key for key in keys}
+        found = {}
+        with self._lock:
+            try:
+                conn = self._connect()
+                names = list(encoded)
+                for start in range(0, len(names), 500):
+                    part = names[start:start + 500]
+                    placeholders = ','.join('?' * len(part))
+                    for key, result in conn.execute(
+                        f'SELECT key, result FROM match_cache WHERE namespace = ? AND key IN ({placeholders})',
+                        [self.namespace] + part
+                    ):
+                        found[encoded[key]] = tuple(json.loads(result))
+                        self._touched.add(key)
+            except sqlite3.Error as e:
+                self._disable(e)
+                return {}
+            self.hits += len(found)
+            self.misses += len(encoded) - len(found)
+            should_flush = len(self._touched) >= self.flush_every
+        if should_flush:
+            self.flush()
+        return found
+    
+    def get(self, key):
+        """Tra cứu một khóa - trả về None nếu không có"""
+        return self.get_many([key]).get(key)
+    
+    def touch(self, keys):
+        """
+        Đánh dấu các khóa vừa được dùng lại từ bộ nhớ (vd. trúng LRU cache đã warm từ đĩa)
+        
+        Args:
+            keys: Danh sách khóa chuẩn hóa
+        """
+        if not self.enabled or not keys:
+            return
+        encoded = [self._encode(key) for key in keys]
+        with self._lock:
+            self._touched.update(encoded)
+            should_flush = len(self._touched) >= self.flush_every
+        if should_flush:
+            self.flush()
+    
+    def put(self, key, result):
+        """Ghi kết quả vào bộ đệm, tự flush khi đủ flush_every mục"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[self._encode(key)] = self._encode(result)
+            should_flush = len(self._pending) >= self.flush_every
+        if should_flush:
+            self.flush()
+    
+    def flush(self):
+        """Ghi các kết quả đang chờ và last_used của khóa được dùng lại xuống đĩa, compact nếu vượt max_entries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self._pending and not self._touched:
+                return
+            now = int(time.time())
+            rows = [(self.namespace, key, result, now) for key, result in self._pending.items()]
+            touched = [(now, self.namespace, key) for key in self._touched if key not in self._pending]
+            self._pending.clear()
+            self._touched.clear()
+            try:
+                conn = self._connect()
+                conn.executemany('INSERT OR REPLACE INTO match_cache VALUES (?, ?, ?, ?)', rows)
+                conn.executemany('UPDATE match_cache SET last_used = ? WHERE namespace = ? AND key = ?', touched)
+                conn.commit()
+                total = conn.execute('SELECT COUNT(*) FROM match_cache').fetchone()[0]
+                if total > self.max_entries:
+                    self._compact(conn)
+            except sqlite3.Error as e:
+                self._disable(e)
+    
+    def _compact(self, conn):
+        """Xóa namespace cũ, sau đó xóa mục ít dùng nhất cho còn ~80% max_entries (gọi trong lock)"""
+        conn.execute('DELETE FROM match_cache WHERE namespace != ?', (self.namespace,))
+        keep = int(self.max_entries * 0.8)
+        conn.execute(
+            'DELETE FROM match_cache WHERE namespace = ? AND key NOT IN ('
+            'SELECT key FROM match_cache WHERE namespace = ? ORDER BY last_used DESC, rowid DESC LIMIT ?)',
+            (self.namespace, self.namespace, keep)
+        )
+        conn.commit()
+        conn.execute('VACUUM')
+    
+    def close(self):
+        """Flush và đóng kết nối"""
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+                self._conn = None
+    
+    def get_stats(self):
+        """
+        Lấy thống kê cache trên đĩa
+        
+        Returns:
+            dict: enabled, path, namespace, hits, misses, pending, touched
+        """
+        return {
+            'enabled': self.enabled,
+            'path': self.db_path,
+            'namespace': self.namespace,
+            'hits': self.hits,
+            'misses': self.misses,
+            'pending': len(self._pending),
+            'touched': len(self._touched),
+        }
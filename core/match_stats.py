@@ -0,0 +1,182 @@
+"""
+Module thống kê đường match
+Đếm mỗi khóa được giải bằng đường nào (cache, tra cứu chính xác, quét fuzzy, phân loại lỗi),
+thời gian theo từng đường, số ứng viên được chấm điểm và phân bố điểm tốt nhất của mỗi lần quét.
+"""
+import threading
+
+# Tên các đường match (thứ tự dùng khi hiển thị)
+MATCH_PATHS = (
+    'cache',               # result_cache hoặc cache trên đĩa
+    'full.exact',          # self.cache (xã + huyện + tỉnh)
+    'full.typo',           # ứng viên của từ điển lỗi gõ (typo_index) chắc chắn tốt nhất - không quét
+    'full.fuzzy',          # quét fuzzy địa chỉ cũ
+    'sheet2.exact',        # self.sheet2_cache (theo ấp)
+    'sheet2.fuzzy',        # quét fuzzy sheet2 theo ấp
+    'new_address.exact',   # self.new_address_cache (thiếu huyện)
+    'new_address.fuzzy',   # quét fuzzy địa chỉ mới
+    'new_address.none',    # thiếu huyện, không tìm thấy
+    'error_cases',         # quét fuzzy không đạt ngưỡng -> _check_error_cases
+)
+
+# Biên trên (không tính) của các nhóm số ứng viên được chấm điểm
+CANDIDATE_BUCKETS = (1, 10, 100, 1000, 10000)
+
+
+def _candidate_bucket(candidates):
+    """Nhãn nhóm số ứng viên, vd. '10-99', '>=10000'"""
+    lower = 0
+    for upper in CANDIDATE_BUCKETS:
+        if candidates < upper:
+            return str(lower) if upper - lower == 1 else f"{lower}-{upper - 1}"
+        lower = upper
+    return f">={lower}"
+
+
+def _score_bucket(score):
+    """Nhãn nhóm điểm tốt nhất theo khoảng 10 điểm, 'none' nếu không ứng viên nào qua ngưỡng thành phần"""
+    if score is None:
+        return 'none'
+    lower = min(int(score) // 10 * 10, 100)
+    return '100' if lower == 100 else f"{lower}-{lower + 9}"
+
+
+class MatchPathStats:
+    """Bộ đếm đường match và histogram các lần quét fuzzy (thread-safe)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Xóa toàn bộ số liệu (gọi ở đầu mỗi lần chạy)"""
+        with self._lock:
+            self.paths = {}  # Đường -> [số khóa, tổng giây]
+            self.scans = {}  # Bộ quét -> {'queries', 'candidates', 'candidate_hist', 'best_score_hist'}
+    
+    def record(self, path, seconds, count=1):
+        """
+        Ghi nhận count khóa được giải bằng đường path
+        
+        Args:
+            path: Tên đường (xem MATCH_PATHS)
+            seconds: Tổng thời gian của count khóa
+            count: Số khóa
+        """
+        if not count:
+            return
+        with self._lock:
+            entry = self.paths.get(path)
+            if entry is None:
+                self.paths[path] = [count, seconds]
+            else:
+                entry[0] += count
+                entry[1] += seconds
+    
+    def drain(self):
+        """
+        Lấy số liệu thô rồi xóa - worker của ProcessMatchEngine gửi phần tăng thêm về tiến trình cha
+        
+        Returns:
+            tuple: (paths, scans) cho merge()
+        """
+        with self._lock:
+            state = (self.paths, self.scans)
+            self.paths = {}
+            self.scans = {}
+        return state
+    
+    def merge(self, state):
+        """
+        Cộng số liệu thô từ drain() của tiến trình khác vào bộ đếm này
+        
+        Args:
+            state: tuple (paths, scans) từ drain()
+        """
+        paths, scans = state
+        with self._lock:
+            for path, (count, seconds) in paths.items():
+                entry = self.paths.setdefault(path, [0, 0.0])
+                entry[0] += count
+                entry[1] += seconds
+            for scanner, scan in scans.items():
+                target = self._get_scan(scanner)
+                target['queries'] += scan['queries']
+                target['candidates'] += scan['candidates']
+                for hist in ('candidate_hist', 'best_score_hist'):
+                    for bucket, count in scan[hist].items():
+                        target[hist][bucket] = target[hist].get(bucket, 0) + count
+    
+    def _get_scan(self, scanner):
+        """Bộ đếm của một bộ quét, tạo mới nếu chưa có (gọi trong lock)"""
+        scan = self.scans.get(scanner)
+        if scan is None:
+            scan = self.scans[scanner] = {'queries': 0, 'candidates': 0,
+                                          'candidate_hist': {}, 'best_score_hist': {}}
+        return scan
+    
+    def record_scan(self, scanner, candidates, best_score):
+        """
+        Ghi nhận một lần quét fuzzy
+        
+        Args:
+            scanner: Tên bộ quét ('full', 'sheet2', 'new_address')
+            candidates: Số ứng viên được chấm điểm
+            best_score: Điểm tổng tốt nhất trong các ứng viên qua ngưỡng thành phần (None nếu không có)
+        """
+        with self._lock:
+            scan = self._get_scan(scanner)
+            scan['queries'] += 1
+            scan['candidates'] += candidates
+            bucket = _candidate_bucket(candidates)
+            scan['candidate_hist'][bucket] = scan['candidate_hist'].get(bucket, 0) + 1
+            bucket = _score_bucket(best_score)
+            scan['best_score_hist'][bucket] = scan['best_score_hist'].get(bucket, 0) + 1
+    
+    def get_stats(self):
+        """
+        Lấy thống kê
+        
+        Returns:
+            dict: {'keys': tổng số khóa,
+                   'paths': {đường: {'count', 'share', 'seconds', 'avg_ms'}},
+                   'scans': {bộ quét: {'queries', 'candidates', 'avg_candidates',
+                                       'candidate_hist', 'best_score_hist'}}}
+        """
+        with self._lock:
+            total = sum(count for count, _ in self.paths.values())
+            order = {name: k for k, name in enumerate(MATCH_PATHS)}
+            paths = {
+                name: {
+                    'count': count,
+                    'share': count / total if total else 0.0,
+                    'seconds': round(seconds, 6),
+                    'avg_ms': round(seconds * 1000 / count, 4),
+                }
+                for name, (count, seconds) in sorted(self.paths.items(), key=lambda item: order.get(item[0], len(order)))
+            }
+            scans = {
+                name: {
+                    'queries': scan['queries'],
+                    'candidates': scan['candidates'],
+                    'avg_candidates': scan['candidates'] / scan['queries'] if scan['queries'] else 0.0,
+                    'candidate_hist': dict(sorted(scan['candidate_hist'].items(),
+                                                  key=lambda item: int(item[0].lstrip('>=').split('-')[0]))),
+                    'best_score_hist': dict(sorted(scan['best_score_hist'].items())),
+                }
+                for name, scan in sorted(self.scans.items())
+            }
+            return {'keys': total, 'paths': paths, 'scans': scans}
+    
+    def format_summary(self, top=5):
+        """
+        Chuỗi tóm tắt một dòng, vd. "full.exact 62% | full.fuzzy 30% (4.1ms/khóa) | cache 8%"
+        
+        Args:
+            top: Số đường nhiều khóa nhất được hiển thị
+        """
+        paths = self.get_stats()['paths']
+        ranked = sorted(paths.items(), key=lambda item: -item[1]['count'])[:top]
+        return ' | '.join(
+            f"{name} {entry['share']:.0%} ({entry['avg_ms']:.2f}ms/khóa)" for name, entry in ranked
+        ) or 'chưa có số liệu'
@@ -0,0 +1,149 @@
+"""
+Module engine match đa tiến trình (process pool)
+Worker được fork sau khi load mapping nên thừa hưởng sẵn dữ liệu mapping và các chỉ mục
+(copy-on-write) - không phải đọc lại mapping.xlsx. Worker chỉ nhận khóa địa chỉ chuẩn hóa
+và trả về kết quả dạng gọn (danh sách kết quả unique + mảng mã theo từng khóa).
+"""
+import os
+import time
+import multiprocessing
+from array import array
+from core.fuzzy_matcher import fuzzy_matcher
+
+
+def is_process_engine_supported():
+    """
+    Kiểm tra hệ điều hành có hỗ trợ fork (Linux/macOS) hay không
+    
+    Returns:
+        bool: True nếu dùng được process engine
+    """
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _init_worker():
+    """Khởi tạo worker: không dùng chung kết nối SQLite của tiến trình cha, bắt đầu thống kê từ 0"""
+    # Chỉ bỏ tham chiếu, không close() - kết nối thuộc về tiến trình cha
+    fuzzy_matcher.persistent_cache = None
+    # Số liệu thừa hưởng lúc fork đã có ở tiến trình cha
+    fuzzy_matcher.path_stats.reset()
+
+
+def _match_keys_worker(keys):
+    """
+    Match một lô khóa trong worker
+    
+    Args:
+        keys: Danh sách khóa (xa, huyen, tinh, ap_info)
+    
+    Returns:
+        tuple: (danh sách kết quả unique, array mã kết quả theo từng khóa,
+                thống kê đường match của lô - MatchPathStats.drain())
+    """
+    unique_results = []
+    positions = {}
+    codes = array('i')
+    for result in fuzzy_matcher.match_keys(keys):
+        code = positions.get(result)
+        if code is None:
+            code = positions[result] = len(unique_results)
+            unique_results.append(result)
+        codes.append(code)
+    return unique_results, codes, fuzzy_matcher.path_stats.drain()
+
+
+class ProcessMatchEngine:
+    """Engine match dùng multiprocessing pool (fork) - thay cho luồng khi fuzzy nặng CPU"""
+    
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.mapping_signature = None  # Mapping mà các worker đang giữ
+    
+    def start(self):
+        """
+        Tạo pool - phải gọi sau khi đã load mapping để worker thừa hưởng dữ liệu
+        
+        Raises:
+            RuntimeError: Nếu hệ điều hành không hỗ trợ fork hoặc chưa load mapping
+        """
+        if self.pool is not None:
+            if self.mapping_signature == fuzzy_matcher.mapping_signature:
+                return
+            # Mapping đã load lại - worker cũ giữ dữ liệu cũ
+            self.close()
+        if not is_process_engine_supported():
+            raise RuntimeError("Process engine cần start method 'fork' (không hỗ trợ trên Windows)")
+        if not fuzzy_matcher.mapping_sheet1:
+            raise RuntimeError("Chưa load mapping - gọi load_mapping() trước khi khởi tạo process engine")
+        context = multiprocessing.get_context('fork')
+        self.pool = context.Pool(processes=self.workers, initializer=_init_worker)
+        self.mapping_signature = fuzzy_matcher.mapping_signature
+    
+    def match_batch(self, xa_list, huyen_list, tinh_list, ap_list=None, address_list=None):
+        """
+        Match nhiều dòng - cùng giao diện và kết quả với fuzzy_match_batch
+        
+        Các khóa đã có trong cache của tiến trình cha không được gửi sang worker;
+        kết quả mới được ghi lại vào cache của tiến trình cha, thống kê đường match
+        của worker được gộp vào fuzzy_matcher.path_stats.
+        
+        Returns:
+            list: Danh sách tuple kết quả theo đúng thứ tự đầu vào
+        """
+        n = len(xa_list)
+        ap_list = ap_list if ap_list is not None else [None] * n
+        address_list = address_list if address_list is not None else [None] * n
+        keys = [
+            fuzzy_matcher.build_match_key(xa_list[i], huyen_list[i], tinh_list[i], ap_list[i], address_list[i])
+            for i in range(n)
+        ]
+        
+        start = time.perf_counter()
+        results = fuzzy_matcher.lookup_results(keys)
+        missing_keys = list(dict.fromkeys(keys[i] for i in range(n) if results[i] is None))
+        # Khóa lặp lại trong lô tính như trúng cache (giống FuzzyMatcher.match_keys)
+        fuzzy_matcher.path_stats.record('cache', time.perf_counter() - start, n - len(missing_keys))
+        if not missing_keys:
+            return results
+        
+        self.start()
+        unique_results, codes, stats = self.pool.apply(_match_keys_worker, (missing_keys,))
+        fuzzy_matcher.path_stats.merge(stats)
+        computed = [unique_results[code] for code in codes]
+        fuzzy_matcher.store_results(missing_keys, computed)
+        
+        found = dict(zip(missing_keys, computed))
+        return [result if result is not None else found[key] for key, result in zip(keys, results)]
+    
+    def close(self):
+        """Đóng pool"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+def create_match_batch(engine_name, workers):
+    """
+    Tạo hàm match theo engine được chọn - dùng chung cho CLI và benchmark
+    
+    Phải gọi sau khi đã load mapping (process engine fork worker ngay khi tạo).
+    
+    Args:
+        engine_name: 'serial', 'thread' hoặc 'process'
+        workers: Số worker/luồng mong muốn
+    
+    Returns:
+        tuple: (match_batch hoặc None = fuzzy_match_batch, ProcessMatchEngine hoặc None, số luồng)
+    """
+    if engine_name == 'process':
+        if is_process_engine_supported():
+            engine = ProcessMatchEngine(workers)
+            engine.start()
+            return engine.match_batch, engine, engine.workers
+        print("⚠️ Process engine cần fork - dùng chế độ luồng")
+        engine_name = 'thread'
+    if engine_name == 'thread':
+        return None, None, workers
+    return None, None, 1
@@ -6,42 +6,142 @@ OPTIMIZED: Simplified logic for better accuracy
 import pandas as pd
 import unicodedata
 import re
+import sys
 from functools import lru_cache
-from config import REGEX_PATTERNS, VIETTAT_MAP, REMOVE_WORDS
+from config import REGEX_PATTERNS, VIETTAT_MAP, REMOVE_WORDS, CHUAN_HOA_CACHE_SIZE
+
+
+# Pre-compiled patterns cho chuan_hoa
+_QUOTE_PATTERN = re.compile(r'[""''„"]')
+_ORDINAL_PATTERN = re.compile(r'\b(\d+)(st|nd|rd|th)\b')
+
+
+def _build_viettat_pattern(viettat_map):
+    """
+    Gộp VIETTAT_MAP thành một regex alternation + bảng dispatch thay thế
+    
+    Mỗi pattern được bọc trong một group ngoài; m.lastindex cho biết pattern nào khớp.
+    Thứ tự alternation giữ đúng thứ tự VIETTAT_MAP. Backreference trong replacement
+    (\\1...) được đánh số lại theo vị trí group trong regex gộp.
+    
+    Args:
+        viettat_map: dict {pattern: replacement}
+        
+    Returns:
+        tuple: (compiled regex, dict {group index: (replacement, is_template)})
+    """
+    parts = []
+    dispatch = {}
+    offset = 0
+    for pattern, replacement in viettat_map.items():
+        group_count = re.compile(pattern).groups
+        outer = offset + 1
+        parts.append(f'({pattern})')
+        if re.search(r'\\\d', replacement):
+            # Backreference dạng số (\\1) - đổi sang \\g<n> của regex gộp
+            template = re.sub(r'\\(\d+)', lambda m: f'\\g<{outer + int(m.group(1))}>', replacement)
+            dispatch[outer] = (template, True)
+        else:
+            dispatch[outer] = (replacement, False)
+        offset = outer + group_count
+    return re.compile('|'.join(parts)), dispatch
+
+
+_VIETTAT_PATTERN, _VIETTAT_DISPATCH = _build_viettat_pattern(VIETTAT_MAP)
+
+# Các viết tắt hành chính có dấu chấm (TP. TX. ...) - gộp thành một regex
+_ADMIN_REMOVAL_PATTERN = re.compile(
+    '|'.join(f'(?:{pattern.pattern})' for pattern in REGEX_PATTERNS['admin_removals']),
+    re.IGNORECASE
+)
+
+
+_VIETTAT_SEQUENTIAL = [(re.compile(pattern), replacement) for pattern, replacement in VIETTAT_MAP.items()]
+_WORD_CHAR = re.compile(r'\w')
+
+
+def _is_word_char(char):
+    return bool(_WORD_CHAR.match(char))
+
+
+def _apply_viettat(text):
+    """
+    Áp dụng VIETTAT_MAP bằng một lượt quét regex gộp - kết quả giống hệt re.sub tuần tự
+    
+    Thay thế tuần tự có thể làm đổi ranh giới từ (\\b) cho các pattern sau, ví dụ
+    "tp hcm.ht": "tp hcm." bị thay thành "...minh" dính liền "ht". Khi một thay thế đổi
+    loại ký tự (chữ/không phải chữ) ở mép mà bên cạnh còn text thì quay về cách tuần tự.
+    
+    Args:
+        text: Text đã lowercase
+        
+    Returns:
+        str: Text sau khi mở rộng viết tắt
+    """
+    matches = list(_VIETTAT_PATTERN.finditer(text))
+    if not matches:
+        return text
+    
+    parts = []
+    position = 0
+    for match in matches:
+        replacement, is_template = _VIETTAT_DISPATCH[match.lastindex]
+        if is_template:
+            replacement = match.expand(replacement)
+        start, end = match.span()
+        matched = match.group(0)
+        if (not replacement or not matched or
+                (start > 0 and _is_word_char(replacement[0]) != _is_word_char(matched[0])) or
+                (end < len(text) and _is_word_char(replacement[-1]) != _is_word_char(matched[-1]))):
+            for pattern, sequential_replacement in _VIETTAT_SEQUENTIAL:
+                text = pattern.sub(sequential_replacement, text)
+            return text
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
 
 
 def chuan_hoa(text):
     """
     Chuẩn hóa text địa chỉ - FIXED với logic xóa trực tiếp
     
+    Kết quả được nhớ theo chuỗi gốc (xem _chuan_hoa_text).
+    
     Args:
         text: Text cần chuẩn hóa
         
     Returns:
         str: Text đã được chuẩn hóa
     """
+    if type(text) is str:
+        return _chuan_hoa_text(text)
     if pd.isna(text):
         return ''
+    return _chuan_hoa_text(str(text))
+
 
-    text = str(text).strip()
+@lru_cache(maxsize=CHUAN_HOA_CACHE_SIZE)
+def _chuan_hoa_text(text):
+    """Pipeline chuẩn hóa cho một chuỗi (đã str) - có memo theo chuỗi gốc"""
+    text = text.strip()
     
     # Bước 1: Xử lý ký tự đặc biệt trước khi lowercase
     text = text.replace('–', '-').replace('—', '-')  # Normalize dashes
-    text = re.sub(r'[""''„"]', '"', text)  # Normalize quotes
+    text = _QUOTE_PATTERN.sub('"', text)  # Normalize quotes
     
     # Bước 2: Lowercase
     text = text.lower()
     
     # Bước 3: FIXED - Xóa trực tiếp các viết tắt hành chính (TRƯỚC khi áp dụng VIETTAT_MAP)
-    for admin_pattern in REGEX_PATTERNS['admin_removals']:
-        text = admin_pattern.sub('', text)
+    text = _ADMIN_REMOVAL_PATTERN.sub('', text)
     
-    # Bước 4: Áp dụng mapping viết tắt cho địa danh cụ thể (sau khi đã xóa viết tắt hành chính)
-    for pattern, replacement in VIETTAT_MAP.items():
-        text = re.sub(pattern, replacement, text)
+    # Bước 4: Áp dụng mapping viết tắt cho địa danh cụ thể (một lượt quét cho toàn bộ VIETTAT_MAP)
+    text = _apply_viettat(text)
     
     # Bước 5: Xử lý số thứ tự trong tên
-    text = re.sub(r'\b(\d+)(st|nd|rd|th)\b', r'\1', text)
+    text = _ORDINAL_PATTERN.sub(r'\1', text)
     
     # Bước 6: Chuẩn hóa Unicode
     text = unicodedata.normalize('NFKD', text)
@@ -70,6 +170,76 @@ def chuan_hoa(text):
     return ' '.join(meaningful_words)
 
 
+@lru_cache(maxsize=1)
+def _get_combining_table():
+    """Bảng str.translate xóa mọi ký tự có combining class khác 0 (dấu tiếng Việt sau NFKD)"""
+    return {cp: None for cp in range(sys.maxunicode + 1) if unicodedata.combining(chr(cp))}
+
+
+def chuan_hoa_series(series):
+    """
+    Chuẩn hóa cả một cột - kết quả giống hệt series.apply(chuan_hoa)
+    
+    Chỉ xử lý các giá trị unique bằng các phép Series.str, sau đó map ngược về cột gốc.
+    
+    Args:
+        series: pandas Series cần chuẩn hóa
+        
+    Returns:
+        pd.Series: Series đã chuẩn hóa (cùng index với series)
+    """
+    # Gom theo chuỗi (không theo giá trị: 12 và 12.0 cho kết quả khác nhau) - NaN như ''
+    positions = {}
+    codes = [
+        positions.setdefault(value if type(value) is str else ('' if pd.isna(value) else str(value)), len(positions))
+        for value in series.tolist()
+    ]
+    if not positions:
+        return pd.Series([], index=series.index, dtype=object)
+    
+    text = pd.Series(list(positions), dtype=object)
+    
+    # Bước 1-2: Ký tự đặc biệt + lowercase
+    text = text.str.strip()
+    text = text.str.replace('–', '-', regex=False).str.replace('—', '-', regex=False)
+    text = text.str.replace(_QUOTE_PATTERN, '"', regex=True)
+    text = text.str.lower()
+    
+    # Bước 3: Xóa viết tắt hành chính
+    text = text.str.replace(_ADMIN_REMOVAL_PATTERN, '', regex=True)
+    
+    # Bước 4: VIETTAT_MAP - chỉ các giá trị có khớp mới chạy các pattern tuần tự
+    has_viettat = text.map(_VIETTAT_PATTERN.search).notna()
+    if has_viettat.any():
+        subset = text[has_viettat]
+        for pattern, replacement in _VIETTAT_SEQUENTIAL:
+            subset = subset.str.replace(pattern, replacement, regex=True)
+        text[has_viettat] = subset
+    
+    # Bước 5: Số thứ tự
+    text = text.str.replace(_ORDINAL_PATTERN, r'\1', regex=True)
+    
+    # Bước 6: Bỏ dấu - NFKD rồi xóa ký tự combining bằng bảng translate
+    text = text.str.normalize('NFKD').str.translate(_get_combining_table())
+    
+    # Bước 7-9: Số 0 đầu, dấu câu, khoảng trắng
+    text = text.str.replace(REGEX_PATTERNS['remove_zeros'], r'\1', regex=True)
+    text = text.str.replace('-', ' ', regex=False)
+    text = text.str.replace(REGEX_PATTERNS['special_chars'], ' ', regex=True)
+    text = text.str.replace(REGEX_PATTERNS['whitespace'], ' ', regex=True)
+    text = text.str.strip()
+    
+    # Bước 10: Chỉ từ 1 ký tự mới có thể bị loại - bỏ qua nếu REMOVE_WORDS không có từ nào như vậy
+    if any(len(word) < 2 for word in REMOVE_WORDS):
+        text = text.map(lambda value: ' '.join(
+            word for word in value.split()
+            if word.isdigit() or len(word) >= 2 or word not in REMOVE_WORDS
+        ))
+    
+    values = text.tolist()
+    return pd.Series([values[code] for code in codes], index=series.index, dtype=object)
+
+
 def chuan_hoa_dia_chi_chi_tiet(address_text):
     """
     Chuẩn hóa địa chỉ chi tiết (bao gồm số nhà, đường, hẻm)
@@ -0,0 +1,76 @@
+"""
+Module từ điển biến thể xóa ký tự (kiểu SymSpell) cho tên xã/huyện/tỉnh
+Mỗi tên được lưu dưới mọi chuỗi thu được khi xóa tối đa max_distance ký tự. Hai chuỗi cách nhau
+không quá max_distance phép sửa (chèn/xóa/thay) luôn có chung ít nhất một biến thể xóa, nên
+tra cứu các lỗi gõ sai 1-2 ký tự chỉ là vài phép tra dict thay vì quét toàn bộ danh sách tên.
+"""
+# Optional: xác minh khoảng cách Levenshtein thực sự
+try:
+    from rapidfuzz.distance import Levenshtein
+    LEVENSHTEIN_AVAILABLE = True
+except ImportError:
+    LEVENSHTEIN_AVAILABLE = False
+
+
+def get_deletes(text, max_distance):
+    """
+    Tập các chuỗi thu được khi xóa 0..max_distance ký tự của text
+    
+    Args:
+        text: Chuỗi gốc
+        max_distance: Số ký tự xóa tối đa
+    
+    Returns:
+        set: Các biến thể (gồm cả text)
+    """
+    deletes = {text}
+    level = {text}
+    for _ in range(max_distance):
+        # Xóa thêm một ký tự từ các biến thể của mức trước (set tự loại trùng lặp)
+        level = {variant[:k] + variant[k + 1:] for variant in level for k in range(len(variant))}
+        deletes |= level
+    return deletes
+
+
+class DeletionIndex:
+    """Từ điển biến thể xóa -> tên gốc, tra tên cách query không quá max_distance phép sửa"""
+    
+    def __init__(self, names, max_distance=2):
+        """
+        Args:
+            names: Danh sách tên đã chuẩn hóa (trùng lặp được bỏ qua)
+            max_distance: Khoảng cách sửa tối đa khi tra cứu
+        """
+        self.max_distance = max_distance
+        self.deletes = {}
+        for name in dict.fromkeys(names):
+            for variant in get_deletes(name, max_distance):
+                self.deletes.setdefault(variant, []).append(name)
+    
+    def lookup(self, query):
+        """
+        Tìm các tên cách query không quá max_distance phép sửa
+        
+        Nếu không có rapidfuzz, kết quả có thể gồm thêm vài tên xa hơn (tối đa 2 * max_distance)
+        vì chưa được xác minh khoảng cách.
+        
+        Args:
+            query: Chuỗi cần tra (đã chuẩn hóa như names)
+        
+        Returns:
+            list: Các tên tìm thấy (tên trùng khớp chính xác đứng đầu nếu có)
+        """
+        found = {}
+        for variant in sorted(get_deletes(query, self.max_distance), key=len, reverse=True):
+            for name in self.deletes.get(variant, ()):
+                found[name] = None
+        if query in found:
+            # Các tên dài hơn chứa query như một biến thể xóa có thể đã đứng trước - đưa tên trùng khớp lên đầu
+            found = {query: None, **found}
+        if LEVENSHTEIN_AVAILABLE:
+            return [name for name in found
+                    if Levenshtein.distance(query, name, score_cutoff=self.max_distance) <= self.max_distance]
+        return list(found)
+    
+    def __len__(self):
+        return len(self.deletes)
@@ -5,9 +5,26 @@ FIXED: Store both original and normalized data to preserve Vietnamese characters
 """
 import pandas as pd
 import os
-from core.text_processor import chuan_hoa
-from core.fuzzy_matcher import fuzzy_matcher
-from utils.helpers import get_mapping_file_path
+import sys
+import json
+import atexit
+import hashlib
+from core.text_processor import chuan_hoa, chuan_hoa_series
+from core.fuzzy_matcher import fuzzy_matcher, MATCHER_VERSION
+from core.match_cache import PersistentMatchCache
+from core.mapping_table import MappingTable, StringPool
+from config import FUZZY_THRESHOLDS, PERSISTENT_CACHE, MAPPING_SNAPSHOT, VIETTAT_MAP, REMOVE_WORDS, REGEX_PATTERNS
+from utils.helpers import get_mapping_file_path, get_file_hash
+
+# Tăng khi đổi cấu trúc snapshot hoặc logic chuẩn hóa/build cache
+SNAPSHOT_VERSION = 3
+
+# Module quyết định nội dung snapshot (chuẩn hóa, bảng mapping, chỉ mục) - sửa mã nguồn là snapshot cũ bị bỏ
+SNAPSHOT_CODE_MODULES = ('core.text_processor', 'core.fuzzy_matcher', 'core.mapping_table', __name__)
+
+# Cột của từng sheet trong mapping.xlsx (thứ tự phần tử của các dòng mapping)
+SHEET1_COLUMNS = ['xacu', 'huyencu', 'tinhcu', 'xamoi', 'tinhmoi']
+SHEET2_COLUMNS = ['apcu', 'xacu', 'huyencu', 'tinhcu', 'apmoi', 'xamoi', 'tinhmoi']
 
 
 class MappingLoader:
@@ -18,8 +35,12 @@ class MappingLoader:
         self.mapping_sheet2 = []
         self.mapping_sheet1_original = []  # NEW: Store original data
         self.mapping_sheet2_original = []  # NEW: Store original data
+        self.table_sheet1 = None           # MappingTable (cột gốc + cột _chuan, chung một StringPool)
+        self.table_sheet2 = None
         self.is_loaded = False
         self.mapping_file_path = get_mapping_file_path()
+        self.mapping_file_hash = None      # SHA-1 nội dung mapping.xlsx
+        self.loaded_from_snapshot = False
     
     def load_mapping(self):
         """
@@ -35,19 +56,24 @@ class MappingLoader:
             if not os.path.exists(self.mapping_file_path):
                 raise FileNotFoundError(f"Không tìm thấy file mapping.xlsx tại: {self.mapping_file_path}")
             
+            # Snapshot còn hợp lệ thì dùng luôn - không đọc Excel, không chuẩn hóa lại
+            if self._load_snapshot():
+                self._attach_persistent_cache()
+                self.loaded_from_snapshot = True
+                self.is_loaded = True
+                return True
+            
             # Đọc dữ liệu từ 2 sheet
             df1 = pd.read_excel(self.mapping_file_path, sheet_name=0)
             df2 = pd.read_excel(self.mapping_file_path, sheet_name=1)
             
             # Validate columns for sheet1 (unchanged)
-            required_columns_sheet1 = ['xacu', 'huyencu', 'tinhcu', 'xamoi', 'tinhmoi']
-            missing_cols = [col for col in required_columns_sheet1 if col not in df1.columns]
+            missing_cols = [col for col in SHEET1_COLUMNS if col not in df1.columns]
             if missing_cols:
                 raise ValueError(f"Sheet 1 thiếu các cột: {missing_cols}")
             
             # Validate columns for sheet2 (NEW structure)
-            required_columns_sheet2 = ['apcu', 'xacu', 'huyencu', 'tinhcu', 'apmoi', 'xamoi', 'tinhmoi']
-            missing_cols = [col for col in required_columns_sheet2 if col not in df2.columns]
+            missing_cols = [col for col in SHEET2_COLUMNS if col not in df2.columns]
             if missing_cols:
                 raise ValueError(f"Sheet 2 thiếu các cột: {missing_cols}")
             
@@ -59,54 +85,167 @@ class MappingLoader:
                 self.mapping_sheet1, self.mapping_sheet2,
                 self.mapping_sheet1_original, self.mapping_sheet2_original
             )
+            self.mapping_file_hash = get_file_hash(self.mapping_file_path)
+            self._save_snapshot()
+            self._attach_persistent_cache()
             
+            self.loaded_from_snapshot = False
             self.is_loaded = True
             return True
             
         except Exception as e:
             raise Exception(f"Lỗi khi load file mapping: {str(e)}")
     
-    def _process_mapping_data(self, df1, df2):
-        """Process mapping data - FIXED: Store both original and normalized versions"""
-        # Process Sheet1
-        # Store original data (with Vietnamese characters)
-        self.mapping_sheet1_original = list(zip(
-            df1['xacu'].fillna('').astype(str),
-            df1['huyencu'].fillna('').astype(str), 
-            df1['tinhcu'].fillna('').astype(str),
-            df1['xamoi'].fillna('').astype(str), 
-            df1['tinhmoi'].fillna('').astype(str)
-        ))
-        
-        # Store normalized data (for matching)
-        for col in ['xacu', 'huyencu', 'tinhcu', 'xamoi', 'tinhmoi']:
-            df1[f'{col}_chuan'] = df1[col].apply(chuan_hoa)
+    def _get_snapshot_path(self):
+        """Đường dẫn file snapshot (cạnh mapping.xlsx)"""
+        return os.path.join(os.path.dirname(self.mapping_file_path), MAPPING_SNAPSHOT['file_name'])
+    
+    @staticmethod
+    def _get_normalizer_fingerprint():
+        """
+        Dấu vân tay của bước chuẩn hóa: VIETTAT_MAP, REMOVE_WORDS, REGEX_PATTERNS và mã nguồn các module
+        SNAPSHOT_CODE_MODULES - đổi bất kỳ thứ gì là snapshot (và cache kết quả trên đĩa) cũ bị bỏ
+        """
+        regex_patterns = json.dumps(REGEX_PATTERNS, sort_keys=True, default=lambda pattern: [pattern.pattern, pattern.flags])
+        return hashlib.sha1(json.dumps(
+            [SNAPSHOT_VERSION, VIETTAT_MAP, REMOVE_WORDS, regex_patterns, _get_code_fingerprint()],
+            sort_keys=True, ensure_ascii=False
+        ).encode('utf-8')).hexdigest()
+    
+    def _load_snapshot(self):
+        """
+        Load mapping từ snapshot nếu mapping.xlsx không đổi (mtime/size, hoặc cùng hash)
         
-        self.mapping_sheet1 = list(zip(
-            df1['xacu_chuan'], df1['huyencu_chuan'], df1['tinhcu_chuan'],
-            df1['xamoi_chuan'], df1['tinhmoi_chuan']
-        ))
+        Returns:
+            bool: True nếu đã load từ snapshot
+        """
+        snapshot_path = self._get_snapshot_path()
+        if not MAPPING_SNAPSHOT.get('enabled') or not os.path.exists(snapshot_path):
+            return False
         
-        # Process Sheet2
-        # Store original data (with Vietnamese characters)
-        self.mapping_sheet2_original = list(zip(
-            df2['apcu'].fillna('').astype(str),
-            df2['xacu'].fillna('').astype(str),
-            df2['huyencu'].fillna('').astype(str),
-            df2['tinhcu'].fillna('').astype(str),
-            df2['apmoi'].fillna('').astype(str),
-            df2['xamoi'].fillna('').astype(str),
-            df2['tinhmoi'].fillna('').astype(str)
-        ))
+        try:
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            
+            if (not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION or
+                    snapshot.get('normalizer') != self._get_normalizer_fingerprint()):
+                return False
+            
+            stat = os.stat(self.mapping_file_path)
+            source = snapshot['source']
+            if source['size'] != stat.st_size:
+                return False
+            if source['mtime_ns'] != stat.st_mtime_ns:
+                # mtime đổi (copy/touch) nhưng nội dung có thể vẫn như cũ
+                if get_file_hash(self.mapping_file_path) != source['sha1']:
+                    return False
+                snapshot['source']['mtime_ns'] = stat.st_mtime_ns
+                self._write_snapshot(snapshot)
+            
+            strings = snapshot['strings']
+            pool = StringPool(strings[:snapshot['table_strings']])
+            self._set_tables(MappingTable.from_ids(snapshot['table_sheet1'], pool),
+                             MappingTable.from_ids(snapshot['table_sheet2'], pool))
+            self.mapping_file_hash = source['sha1']
+            
+            fuzzy_matcher.load_compiled_data(
+                self.mapping_sheet1, self.mapping_sheet2,
+                self.mapping_sheet1_original, self.mapping_sheet2_original,
+                _decode_index_state(snapshot['index_state'], strings)
+            )
+            return True
+            
+        except Exception as e:
+            # Snapshot hỏng/không tương thích - load lại từ Excel
+            print(f"⚠️ Bỏ qua snapshot mapping: {e}")
+            return False
+    
+    def _save_snapshot(self):
+        """
+        Lưu snapshot sau khi load thành công từ Excel
         
-        # Store normalized data (for matching)
-        for col in ['apcu', 'xacu', 'huyencu', 'tinhcu', 'apmoi', 'xamoi', 'tinhmoi']:
-            df2[f'{col}_chuan'] = df2[col].apply(chuan_hoa)
+        Snapshot là JSON (không dùng pickle - file nằm cạnh mapping.xlsx, ai cũng ghi được): một danh sách
+        chuỗi 'strings' (table_strings chuỗi đầu là StringPool của hai bảng) và mọi chỗ khác chỉ chứa id
+        chuỗi / số nguyên.
+        """
+        if not MAPPING_SNAPSHOT.get('enabled'):
+            return
+        stat = os.stat(self.mapping_file_path)
+        # Pool riêng cho snapshot: bắt đầu bằng các chuỗi của bảng (giữ nguyên id), thêm chuỗi của chỉ mục
+        pool = StringPool(self.table_sheet1.pool.strings)
+        table_strings = len(pool)
+        index_state = _encode_index_state(fuzzy_matcher.get_index_state(), pool.intern)
+        self._write_snapshot({
+            'version': SNAPSHOT_VERSION,
+            'normalizer': self._get_normalizer_fingerprint(),
+            'source': {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha1': self.mapping_file_hash,
+            },
+            'strings': pool.strings,
+            'table_strings': table_strings,
+            'table_sheet1': {name: column.tolist() for name, column in self.table_sheet1.columns.items()},
+            'table_sheet2': {name: column.tolist() for name, column in self.table_sheet2.columns.items()},
+            'index_state': index_state,
+        })
+    
+    def _write_snapshot(self, snapshot):
+        """Ghi snapshot qua file tạm rồi đổi tên để không để lại file dở dang"""
+        snapshot_path = self._get_snapshot_path()
+        temp_path = snapshot_path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, snapshot_path)
+        except OSError as e:
+            print(f"⚠️ Không ghi được snapshot mapping: {e}")
+    
+    def _attach_persistent_cache(self):
+        """Gắn cache kết quả trên đĩa (cạnh mapping.xlsx) cho fuzzy matcher nếu được bật"""
+        if not PERSISTENT_CACHE.get('enabled'):
+            return
+        try:
+            # Namespace = nội dung mapping + phiên bản matcher + cấu hình chuẩn hóa + ngưỡng fuzzy:
+            # đổi bất kỳ thành phần nào là kết quả cũ bị bỏ qua
+            namespace = hashlib.sha1((
+                self.mapping_file_hash +
+                json.dumps([MATCHER_VERSION, self._get_normalizer_fingerprint(), FUZZY_THRESHOLDS], sort_keys=True)
+            ).encode('utf-8')).hexdigest()
+            db_path = os.path.join(os.path.dirname(self.mapping_file_path), PERSISTENT_CACHE['file_name'])
+            fuzzy_matcher.attach_persistent_cache(PersistentMatchCache(
+                db_path, namespace,
+                max_entries=PERSISTENT_CACHE.get('max_entries', 500000),
+                flush_every=PERSISTENT_CACHE.get('flush_every', 1000)
+            ))
+        except OSError as e:
+            print(f"⚠️ Không dùng được cache kết quả trên đĩa: {e}")
+    
+    def _process_mapping_data(self, df1, df2):
+        """
+        Process mapping data - FIXED: Store both original and normalized versions
         
-        self.mapping_sheet2 = list(zip(
-            df2['apcu_chuan'], df2['xacu_chuan'], df2['huyencu_chuan'], df2['tinhcu_chuan'],
-            df2['apmoi_chuan'], df2['xamoi_chuan'], df2['tinhmoi_chuan']
-        ))
+        Mỗi sheet là một MappingTable gồm cột gốc (giữ dấu tiếng Việt, để trả kết quả) và cột
+        <tên>_chuan (để match); hai sheet dùng chung một StringPool nên mỗi tên chỉ lưu một lần.
+        """
+        pool = StringPool()
+        tables = []
+        for df, columns in ((df1, SHEET1_COLUMNS), (df2, SHEET2_COLUMNS)):
+            data = {}
+            for col in columns:
+                data[col] = df[col].fillna('').astype(str).tolist()
+                data[f'{col}_chuan'] = chuan_hoa_series(df[col]).tolist()
+            tables.append(MappingTable(data, pool))
+        self._set_tables(*tables)
+    
+    def _set_tables(self, table_sheet1, table_sheet2):
+        """Lưu hai MappingTable và tạo các view mapping_sheet* (dòng như tuple, cùng thứ tự cột như trước)"""
+        self.table_sheet1 = table_sheet1
+        self.table_sheet2 = table_sheet2
+        self.mapping_sheet1_original = table_sheet1.view(SHEET1_COLUMNS)
+        self.mapping_sheet1 = table_sheet1.view([f'{col}_chuan' for col in SHEET1_COLUMNS])
+        self.mapping_sheet2_original = table_sheet2.view(SHEET2_COLUMNS)
+        self.mapping_sheet2 = table_sheet2.view([f'{col}_chuan' for col in SHEET2_COLUMNS])
     
     def get_mapping_stats(self):
         """
@@ -122,6 +261,7 @@ class MappingLoader:
             'sheet1_count': len(self.mapping_sheet1),
             'sheet2_count': len(self.mapping_sheet2),
             'total_count': len(self.mapping_sheet1) + len(self.mapping_sheet2),
+            'unique_strings': len(self.table_sheet1.pool),
             'file_path': self.mapping_file_path,
             'file_exists': os.path.exists(self.mapping_file_path)
         }
@@ -169,20 +309,103 @@ class MappingLoader:
         for i, item_norm in enumerate(self.mapping_sheet1):
             if (item_norm[2] == province_normalized or   # tinhcu
                 item_norm[4] == province_normalized):    # tinhmoi
-                result.append(self.mapping_sheet1_original[i])
+                result.append(tuple(self.mapping_sheet1_original[i]))
         
         # Check sheet2 - use normalized for comparison but return original
         for i, item_norm in enumerate(self.mapping_sheet2):
             if (item_norm[3] == province_normalized or   # tinhcu
                 item_norm[6] == province_normalized):    # tinhmoi
-                result.append(self.mapping_sheet2_original[i])
+                result.append(tuple(self.mapping_sheet2_original[i]))
         
         return result
 
 
+def _get_code_fingerprint():
+    """
+    SHA-1 mã nguồn các module SNAPSHOT_CODE_MODULES
+    
+    Bản đóng gói (PyInstaller) không có file .py - dùng kích thước/mtime của file thực thi thay thế.
+    """
+    digest = hashlib.sha1()
+    for name in SNAPSHOT_CODE_MODULES:
+        digest.update(name.encode('utf-8'))
+        path = getattr(sys.modules.get(name), '__file__', None)
+        if path and os.path.isfile(path):
+            digest.update(get_file_hash(path).encode('ascii'))
+    if getattr(sys, 'frozen', False):
+        stat = os.stat(sys.executable)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def _encode_index_state(state, intern):
+    """
+    Chuyển index_state của fuzzy matcher (xem FuzzyMatcher.get_index_state) sang dạng JSON: chuỗi -> id
+    
+    Args:
+        state: dict cache, new_address_cache, sheet2_cache, candidates, block_index
+        intern: Hàm chuỗi -> id (StringPool.intern của snapshot)
+    
+    Returns:
+        dict: Chỉ gồm list/dict/số nguyên
+    """
+    def encode_key(key):
+        return [intern(text) for text in key]
+    
+    def encode_refs(refs):
+        return [[index, intern(sheet)] for index, sheet in refs]
+    
+    return {
+        'cache': [[encode_key(key), encode_refs(refs)] for key, refs in state['cache'].items()],
+        'new_address_cache': [[encode_key(key), encode_refs(refs)] for key, refs in state['new_address_cache'].items()],
+        'sheet2_cache': [[encode_key(key), list(indices)] for key, indices in state['sheet2_cache'].items()],
+        'candidates': {sheet: {column: encode_key(values) for column, values in table.items()}
+                       for sheet, table in state['candidates'].items()},
+        'block_index': [
+            [intern(tinh), [[intern(huyen), [[position, index, intern(sheet)] for position, index, sheet in members]]
+                            for huyen, members in huyen_blocks.items()]]
+            for tinh, huyen_blocks in state['block_index'].items()
+        ],
+    }
+
+
+def _decode_index_state(data, strings):
+    """
+    Ngược lại của _encode_index_state
+    
+    Args:
+        data: dict từ _encode_index_state (đọc từ JSON)
+        strings: Danh sách chuỗi của snapshot (id -> chuỗi)
+    
+    Returns:
+        dict: index_state cho FuzzyMatcher.load_compiled_data
+    """
+    def decode_key(ids):
+        return tuple(strings[string_id] for string_id in ids)
+    
+    def decode_refs(refs):
+        return [(index, strings[sheet]) for index, sheet in refs]
+    
+    return {
+        'cache': {decode_key(key): decode_refs(refs) for key, refs in data['cache']},
+        'new_address_cache': {decode_key(key): decode_refs(refs) for key, refs in data['new_address_cache']},
+        'sheet2_cache': {decode_key(key): list(indices) for key, indices in data['sheet2_cache']},
+        'candidates': {sheet: {column: list(decode_key(ids)) for column, ids in table.items()}
+                       for sheet, table in data['candidates'].items()},
+        'block_index': {
+            strings[tinh]: {strings[huyen]: [(position, index, strings[sheet]) for position, index, sheet in members]
+                            for huyen, members in huyen_blocks}
+            for tinh, huyen_blocks in data['block_index']
+        },
+    }
+
+
 # Global mapping loader instance
 mapping_loader = MappingLoader()
 
+# Ghi nốt các kết quả match còn trong bộ đệm khi thoát
+atexit.register(fuzzy_matcher.detach_persistent_cache)
+
 
 def load_mapping():
     """
@@ -36,7 +36,7 @@ except ImportError:
         'text_primary': '#1a1a1a',
         'text_secondary': '#4a4a4a',
     }
-    SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+    SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet', '.feather', '.arrow')
 
 
 class DragDropHandler:
@@ -10,9 +10,10 @@ import time
 import os
 import sys
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from config import EXPANDED_GEOMETRY, COLORS, CHUNK_SIZE, FILE_DIALOG_FILETYPES
+from config import (EXPANDED_GEOMETRY, COLORS, CHUNK_SIZE, MATCH_ENGINE, PROCESS_WORKERS, FILE_DIALOG_FILETYPES,
+                    SUPPORTED_EXTENSIONS, ARROW_EXTENSIONS)
 
 # Safe import for sheet_selector
 try:
@@ -36,11 +37,15 @@ except ImportError:
         else:
             return {'action': 'start_processing', 'sheets': [sheet_names[0]]}  # Process only first sheet
 
-from core.file_handler import read_file, save_file, save_multiple_sheets, check_required_columns, get_excel_sheet_names
-from core.text_processor import chuan_hoa, find_ap_column, find_address_column
-from core.fuzzy_matcher import fuzzy_match_row
+from core.file_handler import (read_file, save_file, save_multiple_sheets, check_required_columns, get_excel_sheet_names,
+                               get_file_columns)
+from core.text_processor import chuan_hoa_series, find_ap_column, find_address_column
+from core.address_pipeline import RESULT_COLUMNS, deduplicate_addresses, match_chunk, expand_results
+from core.fuzzy_matcher import fuzzy_matcher
+from core.process_engine import ProcessMatchEngine, is_process_engine_supported
 from utils.performance import detect_mode
 from utils.helpers import format_time, format_number
+from utils.profiling import profiler, get_report_path
 
 
 class FileProcessor:
@@ -50,6 +55,39 @@ class FileProcessor:
         self.main_window = main_window
         self.root = main_window.root
         self.components = None  # Will be set after components are created
+        self.match_engine = self._start_match_engine()  # ProcessMatchEngine khi MATCH_ENGINE = 'process'
+    
+    def _start_match_engine(self):
+        """
+        Tạo process pool nếu MATCH_ENGINE = 'process' - None nếu dùng luồng
+        
+        Gọi khi dựng cửa sổ (luồng chính, sau khi load mapping, trước khi có luồng xử lý hay
+        theo dõi file nào) vì fork từ tiến trình đang chạy nhiều luồng có thể làm worker kẹt
+        khóa. Chỉ bật trên Linux: Tk trên macOS không an toàn khi fork.
+        """
+        if MATCH_ENGINE != 'process':
+            return None
+        if not sys.platform.startswith('linux') or not is_process_engine_supported():
+            print("⚠️ Process engine trong GUI chỉ hỗ trợ Linux - dùng chế độ luồng")
+            return None
+        engine = ProcessMatchEngine(PROCESS_WORKERS)
+        try:
+            engine.start()
+        except RuntimeError as e:
+            print(f"⚠️ Không khởi tạo được process engine ({e}) - dùng chế độ luồng")
+            return None
+        return engine
+    
+    def _get_match_engine(self):
+        """Process engine đã tạo khi mở cửa sổ - None nếu dùng luồng (không bao giờ fork từ luồng xử lý)"""
+        engine = self.match_engine
+        if engine is None:
+            return None
+        if engine.mapping_signature != fuzzy_matcher.mapping_signature:
+            # Worker giữ mapping cũ - tạo lại pool ở đây sẽ fork từ luồng xử lý
+            print("⚠️ Mapping đã load lại sau khi tạo process engine - dùng chế độ luồng")
+            return None
+        return engine
     
     def set_components(self, components):
         """Set reference to window components"""
@@ -70,11 +108,11 @@ class FileProcessor:
 
             # ADDED: Validate file extension
             file_ext = os.path.splitext(file_benh_nhan.lower())[1]
-            if file_ext not in ['.xlsx', '.xls', '.csv']:
+            if file_ext not in SUPPORTED_EXTENSIONS:
                 messagebox.showerror(
                     "Lỗi định dạng file", 
                     f"File không được hỗ trợ: {file_ext}\n\n"
-                    f"Chỉ hỗ trợ: .xlsx, .xls, .csv"
+                    f"Chỉ hỗ trợ: {', '.join(SUPPORTED_EXTENSIONS)}"
                 )
                 return
 
@@ -146,6 +184,14 @@ class FileProcessor:
                     messagebox.showerror("Lỗi đọc CSV", f"Lỗi đọc file CSV:\n{str(e)}")
                     return False
             
+            elif file_ext in ARROW_EXTENSIONS:
+                # Parquet/Feather: chỉ đọc schema
+                try:
+                    get_file_columns(file_path)
+                except Exception as e:
+                    messagebox.showerror("Lỗi đọc file", f"Lỗi đọc file {file_ext}:\n{str(e)}\n\n💡 Cần cài đặt: pip install pyarrow")
+                    return False
+            
             return True
             
         except Exception as e:
@@ -262,6 +308,8 @@ class FileProcessor:
             self.root.after(0, lambda: self.main_window.components.label.config(
                 text=f"Đang xử lý {len(selected_sheets)} sheet(s)..."
             ))
+            profiler.reset(file_path)
+            fuzzy_matcher.reset_match_stats()
             
             for i, sheet_name in enumerate(selected_sheets):
                 if self.main_window.stop_flag:
@@ -285,6 +333,9 @@ class FileProcessor:
                     self.root.after(0, lambda s=sheet_name or "Sheet1": self.main_window.components.update_sheet_log(
                         f"✅ Hoàn thành sheet: {s}"
                     ))
+                    if profiler.enabled:
+                        summary = profiler.format_summary(result_sheet_name)
+                        self.root.after(0, lambda s=summary: self.main_window.components.update_sheet_log(f"⏱️ {s}"))
                 elif self.main_window.stop_flag:
                     break
                 else:
@@ -307,11 +358,14 @@ class FileProcessor:
     def xu_ly_single_sheet(self, file_path, sheet_name, sheet_index):
         """Xử lý một sheet đơn lẻ - ENHANCED with better error handling"""
         try:
+            profiler.set_scope(f"Sheet{sheet_index + 1}")
+            
             # Đọc data từ sheet
-            if sheet_name is not None:
-                df = read_file(file_path, sheet_name)
-            else:
-                df = read_file(file_path)  # CSV
+            with profiler.stage('read_file'):
+                if sheet_name is not None:
+                    df = read_file(file_path, sheet_name)
+                else:
+                    df = read_file(file_path)  # CSV
             
             # Kiểm tra dữ liệu rỗng
             if df.empty:
@@ -321,7 +375,8 @@ class FileProcessor:
                 return None
             
             # Kiểm tra các cột bắt buộc
-            column_check = check_required_columns(df)
+            with profiler.stage('check_columns'):
+                column_check = check_required_columns(df)
             if not column_check['valid']:
                 missing_cols = ', '.join(column_check['missing'])
                 self.root.after(0, lambda: self.main_window.components.update_sheet_log(
@@ -356,29 +411,36 @@ class FileProcessor:
             return None
     
     def _process_dataframe_chunks_with_ap(self, df, xa_col, huyen_col, tinh_col, ap_col, address_col, sheet_index):
-        """Process DataFrame with ấp support"""
+        """Process DataFrame with ấp support - mỗi địa chỉ unique chỉ match một lần cho cả sheet"""
         # Use smaller chunks on Windows for better responsiveness
         chunk_size = min(CHUNK_SIZE, 300)
-        sheet_rows = len(df)
-        n_chunks = (sheet_rows + chunk_size - 1) // chunk_size
+        unique_df, row_codes = deduplicate_addresses(df, xa_col, huyen_col, tinh_col, ap_col, address_col)
+        unique_rows = len(unique_df)
+        n_chunks = (unique_rows + chunk_size - 1) // chunk_size
         results = [None] * n_chunks
         mode = detect_mode()
+        engine = self._get_match_engine()
 
         def worker(chunk_index):
             if self.main_window.stop_flag:
                 return
             start = chunk_index * chunk_size
-            end = min((chunk_index + 1) * chunk_size, sheet_rows)
-            chunk = df.iloc[start:end].copy()
+            end = min((chunk_index + 1) * chunk_size, unique_rows)
+            chunk = unique_df.iloc[start:end].copy()
             processed = self.process_chunk_with_ap(
                 chunk, xa_col, huyen_col, tinh_col, ap_col, address_col, 
-                chunk_index, n_chunks, sheet_index
+                chunk_index, n_chunks, sheet_index, engine
             )
             if not self.main_window.stop_flag:
                 results[chunk_index] = processed
 
+        if engine is not None:
+            # Mỗi luồng chỉ gửi chunk sang process pool và chờ - CPU chạy ở các worker
+            self.main_window.executor = ThreadPoolExecutor(max_workers=engine.workers)
+            futures = [self.main_window.executor.submit(worker, i) for i in range(n_chunks)]
+            self._wait_for_chunks(futures)
         # Use more conservative threading on Windows
-        if mode == "serial" or sys.platform.startswith('win'):
+        elif mode == "serial" or sys.platform.startswith('win'):
             for i in range(n_chunks):
                 if self.main_window.stop_flag:
                     break
@@ -394,70 +456,61 @@ class FileProcessor:
                 future = self.main_window.executor.submit(worker, i)
                 futures.append(future)
 
-            # Wait for completion with timeout
-            timeout_counter = 0
-            while not self.main_window.stop_flag and any(r is None for r in results) and timeout_counter < 300:  # 5 minute timeout
-                time.sleep(1)
-                timeout_counter += 1
-
-            if self.main_window.executor:
-                self.main_window.executor.shutdown(wait=False)
+            self._wait_for_chunks(futures)
 
-        # Gộp kết quả
-        valid_results = [r for r in results if r is not None]
-        if not valid_results:
+        # Gộp kết quả của các địa chỉ unique rồi trả về từng dòng theo thứ tự gốc
+        if self.main_window.stop_flag or any(r is None for r in results):
             return None
 
-        return pd.concat(valid_results, ignore_index=True)
+        with profiler.stage('concat'):
+            unique_result = pd.concat(results, ignore_index=True)
+        return expand_results(df, unique_result, row_codes)
     
-    def process_chunk_with_ap(self, chunk, xa_col, huyen_col, tinh_col, ap_col, address_col, chunk_index=0, chunk_total=1, sheet_index=0):
-        """Xử lý một chunk dữ liệu với ấp support - FIXED"""
-        # Tạo các cột tạm thời để xử lý
-        chunk['_xa_chuan'] = chunk[xa_col].apply(chuan_hoa)
-        chunk['_huyen_chuan'] = chunk[huyen_col].apply(chuan_hoa)
-        chunk['_tinh_chuan'] = chunk[tinh_col].apply(chuan_hoa)
-
-        chunk['Lý do không match'] = chunk.apply(
-            lambda row: 'Thiếu xã/tỉnh' if not row['_xa_chuan'].strip() or not row['_tinh_chuan'].strip() else '',
-            axis=1
-        )
+    def _wait_for_chunks(self, futures):
+        """
+        Chờ mọi chunk đã gửi vào executor chạy xong (không giới hạn thời gian - pause có thể kéo dài)
+        
+        Stop được xử lý trong chính worker (kiểm tra stop_flag) nên các future kết thúc sớm.
+        
+        Raises:
+            Exception: Lỗi đầu tiên xảy ra trong một worker
+        """
+        try:
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            self.main_window.executor.shutdown(wait=False)
+    
+    def process_chunk_with_ap(self, chunk, xa_col, huyen_col, tinh_col, ap_col, address_col, chunk_index=0, chunk_total=1, sheet_index=0, engine=None):
+        """Xử lý một chunk dữ liệu với ấp support - FIXED (engine: ProcessMatchEngine nếu match bằng process pool)"""
+        match_batch = engine.match_batch if engine is not None else None
+        # Các cột chuẩn hóa đã có sẵn nếu chunk đến từ bước gom địa chỉ unique
+        if '_xa_chuan' not in chunk.columns:
+            chunk['_xa_chuan'] = chuan_hoa_series(chunk[xa_col])
+            chunk['_huyen_chuan'] = chuan_hoa_series(chunk[huyen_col])
+            chunk['_tinh_chuan'] = chuan_hoa_series(chunk[tinh_col])
 
-        results = []
-        # FIXED: Sử dụng iterrows() thay vì itertuples() để tránh lỗi attribute
-        for idx, row in chunk.iterrows():
+        def checkpoint():
             # Kiểm tra pause/stop with shorter sleep for Windows responsiveness
             while self.main_window.paused and not self.main_window.stop_flag:
                 time.sleep(0.05)
-            if self.main_window.stop_flag:
-                return chunk
+            return not self.main_window.stop_flag
 
-            if row['Lý do không match']:  # Nếu đã có lý do không match
-                results.append((None, None, None, None, None, row['Lý do không match']))
-            else:
-                # FIXED: Get ấp and address info using proper column access
-                ap_value = row[ap_col] if ap_col and ap_col in chunk.columns else None
-                address_value = row[address_col] if address_col and address_col in chunk.columns else None
-                
-                # FIXED: Call fuzzy match with proper row access
-                matched = fuzzy_match_row(
-                    row['_xa_chuan'], row['_huyen_chuan'], row['_tinh_chuan'],
-                    ap=ap_value, address_detail=address_value
-                )
-                results.append(matched)
+        columns = match_chunk(chunk, ap_col, address_col, match_batch, checkpoint)
+        if columns is None:
+            return chunk
 
-            with self.main_window.lock:
-                self.main_window.done_rows += 1
-            
-            # Update log more frequently on Windows for better user feedback
-            local_idx = len(results)
-            if local_idx % 5 == 0 or local_idx == len(chunk):
-                self.main_window.components.update_log_with_sheet(chunk_index, chunk_total, local_idx, len(chunk), sheet_index)
+        # Tiến độ tính theo số dòng gốc (mỗi dòng unique đại diện cho '_so_dong' dòng)
+        physical_rows = int(chunk['_so_dong'].sum()) if '_so_dong' in chunk.columns else len(chunk)
+        with self.main_window.lock:
+            self.main_window.done_rows += physical_rows
+        self.main_window.components.update_log_with_sheet(chunk_index, chunk_total, len(chunk), len(chunk), sheet_index)
 
-        # Lưu kết quả
-        chunk[['_xacu', '_huyencu', '_tinhcu', 'Xã sau sáp nhập', 'Tỉnh sau sáp nhập', 'Lý do không match']] = pd.DataFrame(results, index=chunk.index)
-        
-        # Xóa các cột tạm thời
-        chunk = chunk.drop(columns=['_xa_chuan', '_huyen_chuan', '_tinh_chuan', '_xacu', '_huyencu', '_tinhcu'])
+        # Lưu kết quả - gán cả cột một lần
+        chunk = chunk.drop(columns=['_xa_chuan', '_huyen_chuan', '_tinh_chuan'])
+        chunk = chunk.drop(columns=['_so_dong'], errors='ignore')
+        for col in RESULT_COLUMNS:
+            chunk[col] = columns[col]
         
         return chunk
     
@@ -465,10 +518,15 @@ class FileProcessor:
         """Lưu kết quả multiple sheets"""
         try:
             # FIXED: Windows specific file dialog
+            # CSV/Parquet/Feather chỉ chứa được một bảng - chỉ cho chọn khi có đúng một sheet kết quả
+            filetypes = [("Excel files", "*.xlsx")]
+            if len(self.main_window.sheet_results) == 1:
+                filetypes += [("CSV files", "*.csv"), ("Parquet files", "*.parquet"),
+                              ("Feather/Arrow files", "*.feather *.arrow")]
             file_luu = filedialog.asksaveasfilename(
                 title="Lưu file kết quả",
                 defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+                filetypes=filetypes + [("All files", "*.*")],
                 initialdir=self._get_initial_dir()
             )
             
@@ -486,7 +544,10 @@ class FileProcessor:
                 total_processed += len(df_result)
             
             # Save multiple sheets
-            save_multiple_sheets(sheets_to_save, file_luu)
+            profiler.set_scope(None)
+            with profiler.stage('save'):
+                save_multiple_sheets(sheets_to_save, file_luu, RESULT_COLUMNS)
+            self._write_run_report(file_luu)
             
             self.root.after(0, lambda: self.main_window.components.label.config(text="✅ Xử lý hoàn tất thành công!"))
             self.root.after(0, lambda: messagebox.showinfo(
@@ -505,6 +566,24 @@ class FileProcessor:
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("Lỗi", f"Lỗi lưu file: {str(e)}"))
     
+    def _write_run_report(self, output_path):
+        """Ghi báo cáo thời gian từng bước (JSON) cạnh file kết quả và in tóm tắt ra log - chỉ khi profiler bật"""
+        if not profiler.enabled:
+            return
+        try:
+            report_path = profiler.write_report(get_report_path(output_path), {
+                'cache': fuzzy_matcher.get_cache_stats(), 'match_paths': fuzzy_matcher.get_match_stats(),
+            })
+            summary = profiler.format_summary()
+            path_summary = fuzzy_matcher.path_stats.format_summary()
+            self.root.after(0, lambda: self.main_window.components.update_sheet_log(f"⏱️ Tổng: {summary}"))
+            self.root.after(0, lambda: self.main_window.components.update_sheet_log(f"🔎 Đường match: {path_summary}"))
+            self.root.after(0, lambda: self.main_window.components.update_sheet_log(
+                f"📊 Báo cáo thời gian: {os.path.basename(report_path)}"
+            ))
+        except OSError as e:
+            print(f"Không ghi được báo cáo thời gian: {e}")
+    
     def update_timer(self):
         """Cập nhật timer"""
         if self.main_window.processing and not self.main_window.stop_flag:
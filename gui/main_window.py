@@ -8,7 +8,7 @@ import time
 import os
 import sys
 
-from config import DEFAULT_GEOMETRY, EXPANDED_GEOMETRY, COLORS
+from config import DEFAULT_GEOMETRY, EXPANDED_GEOMETRY, COLORS, SUPPORTED_EXTENSIONS
 from gui.styles import setup_ui_styles, AnimationHelper, apply_windows_theme
 from gui.drag_drop import DragDropHandler, is_drag_drop_available
 from gui.window_components import WindowComponents
@@ -229,7 +229,7 @@ class MainWindow:
             # Handle Windows file associations if needed
             if len(sys.argv) > 1:
                 file_path = sys.argv[1]
-                if os.path.exists(file_path) and file_path.lower().endswith(('.xlsx', '.xls', '.csv')):
+                if os.path.exists(file_path) and file_path.lower().endswith(SUPPORTED_EXTENSIONS):
                     self.root.after(1000, lambda: self.process_file_from_path(file_path))
                     
         except Exception as e:
@@ -271,7 +271,7 @@ HƯỚNG DẪN SỬ DỤNG
 TÍNH NĂNG KÉO THẢ (DRAG & DROP):
 Status: {drag_status}
 - Kéo file trực tiếp vào cửa sổ để xử lý
-- Hỗ trợ .xlsx, .xls, .csv
+- Hỗ trợ .xlsx, .xls, .csv, .parquet, .feather
 
 PHÍM TẮT:
 - Ctrl+O: Chọn file
@@ -290,7 +290,7 @@ AUTO-RESTART:
 
 HỖ TRỢ:
 - Windows 8, 10, 11 (32-bit và 64-bit)
-- File: .xlsx, .xls, .csv
+- File: .xlsx, .xls, .csv, .parquet, .feather, .arrow
 - Multi-sheet Excel processing
         """
         
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Chương trình chuẩn hóa địa chỉ bệnh nhân - chế độ dòng lệnh (headless)
+Không import tkinter/gui - chạy được trên server không có màn hình (cron, batch)
+
+Ví dụ:
+    python -m pihcm normalize input.xlsx -o output.xlsx --sheets all --workers 8 --engine process
+    python -m pihcm normalize dump.parquet -o ketqua.parquet --address-only --stream
+    python -m pihcm benchmark --sizes 1000,10000,100000 -o benchmark.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from config import MATCH_ENGINE, PROCESS_WORKERS, BENCHMARK
+from core.file_handler import (read_file, iter_file_chunks, save_multiple_sheets, check_required_columns,
+                               get_excel_sheet_names, get_file_columns, create_streaming_writer)
+from core.text_processor import find_ap_column, find_address_column
+from core.address_pipeline import RESULT_COLUMNS, get_address_columns, normalize_dataframe, normalize_chunks
+from core.fuzzy_matcher import fuzzy_matcher
+from core.process_engine import create_match_batch
+from data.mapping_loader import load_mapping
+from utils.helpers import format_time, format_number
+from utils.profiling import profiler, get_report_path
+
+
+def parse_args(argv=None):
+    """
+    Đọc tham số dòng lệnh
+    
+    Args:
+        argv: Danh sách tham số (None = sys.argv)
+    
+    Returns:
+        argparse.Namespace: Tham số đã parse
+    """
+    parser = argparse.ArgumentParser(prog='pihcm', description='Chuẩn hóa địa chỉ bệnh nhân (không cần GUI)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    normalize = subparsers.add_parser('normalize', help='Chuẩn hóa địa chỉ trong file Excel/CSV')
+    normalize.add_argument('input', help='File đầu vào (.xlsx, .xls, .csv, .parquet, .feather, .arrow)')
+    normalize.add_argument('-o', '--output',
+                           help='File kết quả .xlsx, .csv, .parquet, .feather hoặc .arrow (mặc định: <input>_chuan_hoa.xlsx)')
+    normalize.add_argument('--sheets', default='all',
+                           help="'all' (mặc định), 'first' hoặc danh sách tên sheet cách nhau bởi dấu phẩy")
+    normalize.add_argument('--workers', type=int, default=None,
+                           help='Số worker (mặc định: PROCESS_WORKERS hoặc số CPU)')
+    normalize.add_argument('--engine', choices=['serial', 'thread', 'process'], default=MATCH_ENGINE,
+                           help=f"Engine match (mặc định: {MATCH_ENGINE})")
+    normalize.add_argument('--stream', action='store_true',
+                           help='Đọc, match và ghi kết quả theo từng chunk (file .xlsx/.csv rất lớn, bộ nhớ giới hạn theo STREAM_CHUNK_SIZE)')
+    normalize.add_argument('--address-only', action='store_true',
+                           help='Chỉ đọc và ghi các cột xã/huyện/tỉnh/ấp/địa chỉ (+ cột kết quả); Parquet/Feather chỉ đọc các cột này từ đĩa')
+    normalize.add_argument('--profile', action='store_true',
+                           help='Đo thời gian từng bước, in tóm tắt và ghi báo cáo JSON cạnh file kết quả')
+    
+    benchmark = subparsers.add_parser('benchmark', help='Đo tốc độ trên dữ liệu giả lập sinh từ mapping.xlsx')
+    benchmark.add_argument('--sizes', default=','.join(str(size) for size in BENCHMARK['sizes']),
+                           help='Các số dòng cần đo, cách nhau bởi dấu phẩy (mặc định: %(default)s)')
+    benchmark.add_argument('-o', '--output', default='benchmark.json', help='File JSON kết quả (mặc định: %(default)s)')
+    benchmark.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default=BENCHMARK['file_format'],
+                           help='Định dạng file đầu vào/kết quả khi đo pipeline (mặc định: %(default)s)')
+    benchmark.add_argument('--seed', type=int, default=BENCHMARK['seed'], help='Seed sinh dữ liệu')
+    benchmark.add_argument('--duplicate-rate', type=float, default=BENCHMARK['duplicate_rate'],
+                           help='Tỉ lệ dòng trùng địa chỉ (mặc định: %(default)s)')
+    benchmark.add_argument('--match-row-limit', type=int, default=BENCHMARK['match_row_limit'],
+                           help='Số dòng tối đa đo qua FuzzyMatcher.match_row (mặc định: %(default)s)')
+    benchmark.add_argument('--workers', type=int, default=None,
+                           help='Số worker (mặc định: PROCESS_WORKERS hoặc số CPU)')
+    benchmark.add_argument('--engine', choices=['serial', 'thread', 'process'], default=MATCH_ENGINE,
+                           help=f"Engine match (mặc định: {MATCH_ENGINE})")
+    benchmark.add_argument('--stream', action='store_true', help='Đo pipeline streaming (đọc/ghi theo chunk)')
+    
+    generate = subparsers.add_parser('generate', help='Sinh file danh sách bệnh nhân giả lập (có nhiễu) từ mapping.xlsx')
+    generate.add_argument('rows', type=int, help='Số dòng')
+    generate.add_argument('-o', '--output', required=True, help='File kết quả (.xlsx, .csv, .parquet, .feather)')
+    generate.add_argument('--seed', type=int, default=BENCHMARK['seed'], help='Seed sinh dữ liệu')
+    generate.add_argument('--duplicate-rate', type=float, default=BENCHMARK['duplicate_rate'],
+                          help='Tỉ lệ dòng trùng địa chỉ (mặc định: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def _select_sheets(file_path, sheets_arg):
+    """
+    Xác định danh sách sheet cần xử lý
+    
+    Returns:
+        list: Tên sheet (hoặc [None] với file CSV)
+    
+    Raises:
+        ValueError: Nếu có sheet không tồn tại
+    """
+    if os.path.splitext(file_path.lower())[1] not in ('.xlsx', '.xls'):
+        return [None]
+    
+    sheet_names = get_excel_sheet_names(file_path)
+    if sheets_arg == 'all':
+        return sheet_names
+    if sheets_arg == 'first':
+        return sheet_names[:1]
+    
+    selected = [name.strip() for name in sheets_arg.split(',') if name.strip()]
+    missing = [name for name in selected if name not in sheet_names]
+    if missing:
+        raise ValueError(f"Không tìm thấy sheet: {missing} (có: {sheet_names})")
+    return selected
+
+
+def _count_unmatched(result_df):
+    """Số dòng có lý do không match"""
+    return int((result_df['Lý do không match'].fillna('') != '').sum())
+
+
+def _stream_sheet(file_path, sheet_name, sheet_title, writer, match_batch, workers, columns=None):
+    """
+    Đọc, chuẩn hóa và ghi một sheet theo từng chunk - không giữ cả sheet trong bộ nhớ
+    
+    Args:
+        columns: Chỉ đọc các cột này (None = tất cả)
+    
+    Returns:
+        tuple: (số dòng hoặc None nếu sheet trống, số dòng không match)
+    """
+    label = sheet_name or os.path.basename(file_path)
+    
+    def progress(done):
+        print(f"\r   {label}: {format_number(done)} dòng", end='', flush=True)
+    
+    rows = None
+    unmatched = 0
+    chunks = iter_file_chunks(file_path, sheet_name, columns=columns)
+    for result_chunk in normalize_chunks(chunks, match_batch=match_batch, workers=workers, progress=progress):
+        if rows is None:
+            writer.add_sheet(sheet_title)  # Chỉ tạo sheet khi có dữ liệu
+            rows = 0
+        with profiler.stage('write_chunk'):
+            writer.write_chunk(result_chunk)
+        rows += len(result_chunk)
+        unmatched += _count_unmatched(result_chunk)
+    print()
+    return rows, unmatched
+
+
+def _process_sheet(file_path, sheet_name, match_batch, workers, columns=None):
+    """
+    Đọc và chuẩn hóa một sheet
+    
+    Args:
+        columns: Chỉ đọc các cột này (None = tất cả)
+    
+    Returns:
+        tuple: (DataFrame kết quả hoặc None, số địa chỉ unique)
+    """
+    label = sheet_name or os.path.basename(file_path)
+    with profiler.stage('read_file'):
+        df = read_file(file_path, sheet_name, columns)
+    
+    with profiler.stage('check_columns'):
+        column_check = check_required_columns(df)
+    if not column_check['valid']:
+        print(f"❌ {label}: thiếu cột {', '.join(column_check['missing'])} - bỏ qua")
+        return None, 0
+    
+    def progress(done, total):
+        print(f"\r   {label}: {format_number(done)}/{format_number(total)} dòng", end='', flush=True)
+    
+    result_df, unique_rows = normalize_dataframe(
+        df, column_check['xa_col'], column_check['huyen_col'], column_check['tinh_col'],
+        find_ap_column(df), find_address_column(df),
+        match_batch=match_batch, workers=workers, progress=progress
+    )
+    print()
+    return result_df, unique_rows
+
+
+def run_normalize(args):
+    """
+    Lệnh normalize: đọc file, chuẩn hóa các sheet, lưu kết quả và in thống kê
+    
+    Returns:
+        int: Exit code (0 = thành công)
+    """
+    input_path = os.path.abspath(args.input)
+    output_path = args.output or os.path.splitext(input_path)[0] + '_chuan_hoa.xlsx'
+    workers = max(1, args.workers or PROCESS_WORKERS or os.cpu_count() or 1)
+    if args.profile:
+        profiler.enable()
+    profiler.reset(input_path)
+    fuzzy_matcher.reset_match_stats()
+    
+    start_time = time.time()
+    with profiler.stage('load_mapping'):
+        load_mapping()
+    load_time = time.time() - start_time
+    
+    sheets = _select_sheets(input_path, args.sheets)
+    match_batch, engine, threads = create_match_batch(args.engine, workers)
+    
+    # --stream: kết quả được ghi thẳng ra file theo từng chunk thay vì gom lại rồi lưu
+    writer = create_streaming_writer(output_path, RESULT_COLUMNS) if args.stream else None
+    results = {}
+    processed = 0
+    total_rows = 0
+    total_unique = 0
+    total_unmatched = 0
+    match_start = time.time()
+    completed = False
+    try:
+        for index, sheet_name in enumerate(sheets):
+            sheet_start = time.time()
+            sheet_title = sheet_name or f"Sheet{index + 1}"
+            profiler.set_scope(sheet_title)
+            columns = None
+            if args.address_only:
+                try:
+                    columns = get_address_columns(get_file_columns(input_path, sheet_name))
+                except ValueError as e:
+                    print(f"❌ {sheet_name or os.path.basename(input_path)}: {e} - bỏ qua")
+                    continue
+            if writer is not None:
+                rows, unmatched = _stream_sheet(input_path, sheet_name, sheet_title, writer, match_batch, threads, columns)
+                unique_rows = None
+                if rows is None:
+                    continue
+            else:
+                result_df, unique_rows = _process_sheet(input_path, sheet_name, match_batch, threads, columns)
+                if result_df is None:
+                    continue
+                results[sheet_title] = result_df
+                rows = len(result_df)
+                unmatched = _count_unmatched(result_df)
+            elapsed = time.time() - sheet_start
+            processed += 1
+            total_rows += rows
+            total_unique += unique_rows or 0
+            total_unmatched += unmatched
+            unique_text = f"{format_number(unique_rows)} địa chỉ unique, " if unique_rows is not None else ""
+            print(f"✅ {sheet_name or os.path.basename(input_path)}: {format_number(rows)} dòng, "
+                  f"{unique_text}{format_number(unmatched)} không match, {format_time(elapsed)}")
+            if profiler.enabled:
+                print(f"   ⏱️  {profiler.format_summary(sheet_title)}")
+        completed = True
+        profiler.set_scope(None)
+    finally:
+        if engine is not None:
+            engine.close()
+        if writer is not None:
+            writer.close(discard=not completed)
+    match_time = time.time() - match_start
+    
+    if not processed:
+        print("❌ Không có sheet nào được xử lý")
+        return 1
+    
+    if writer is None:
+        with profiler.stage('save'):
+            save_multiple_sheets(results, output_path, RESULT_COLUMNS)
+    total_time = time.time() - start_time
+    
+    cache_stats = fuzzy_matcher.get_cache_stats()
+    print("=" * 60)
+    print(f"📄 Kết quả: {output_path}")
+    print(f"⚙️  Engine: {args.engine}, workers: {threads}")
+    unique_text = f" ({format_number(total_unique)} địa chỉ unique)" if not args.stream else ""
+    print(f"📊 {format_number(total_rows)} dòng{unique_text}, {format_number(total_unmatched)} không match")
+    print(f"⏱️  Load mapping {load_time:.2f}s, xử lý {match_time:.2f}s, tổng {total_time:.2f}s")
+    print(f"🚀 Throughput: {total_rows / match_time if match_time > 0 else 0:,.0f} dòng/giây")
+    print(f"🗃️  Cache: {cache_stats['hit_rate']:.1%} hit ({format_number(cache_stats['hits'])} hits)")
+    match_stats = fuzzy_matcher.get_match_stats()
+    if match_stats['keys']:
+        print(f"🔎 Đường match: {fuzzy_matcher.path_stats.format_summary()}")
+    if profiler.enabled:
+        report_path = profiler.write_report(get_report_path(output_path), {
+            'engine': args.engine, 'workers': threads, 'stream': args.stream, 'cache': cache_stats,
+            'match_paths': match_stats,
+        })
+        print(f"⏱️  Các bước: {profiler.format_summary()}")
+        print(f"📈 Báo cáo thời gian: {report_path}")
+    return 0
+
+
+def run_benchmark_command(args):
+    """
+    Lệnh benchmark: đo match_row và pipeline đầy đủ cho từng kích thước, ghi JSON
+    
+    Returns:
+        int: Exit code (0 = thành công)
+    """
+    from core.benchmark import run_benchmark
+    
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    workers = max(1, args.workers or PROCESS_WORKERS or os.cpu_count() or 1)
+    report = run_benchmark(sizes, seed=args.seed, duplicate_rate=args.duplicate_rate, file_format=args.format,
+                           match_row_limit=args.match_row_limit, engine=args.engine, workers=workers,
+                           stream=args.stream)
+    
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    print("=" * 60)
+    print(f"{'Số dòng':>12} {'match_row (dòng/s)':>20} {'pipeline (dòng/s)':>20} {'không match':>12}")
+    for result in report['results']:
+        print(f"{format_number(result['rows']):>12} {result['match_row']['rows_per_second'] or 0:>20,.0f} "
+              f"{result['pipeline']['rows_per_second'] or 0:>20,.0f} {format_number(result['pipeline']['unmatched']):>12}")
+    print(f"📄 Kết quả: {os.path.abspath(args.output)}")
+    return 0
+
+
+def run_generate(args):
+    """
+    Lệnh generate: sinh file dữ liệu giả lập
+    
+    Returns:
+        int: Exit code (0 = thành công)
+    """
+    from core.benchmark import generate_corpus
+    from core.file_handler import save_file
+    
+    df = generate_corpus(args.rows, seed=args.seed, duplicate_rate=args.duplicate_rate)
+    save_file(df, args.output)
+    print(f"✅ Đã sinh {format_number(len(df))} dòng: {os.path.abspath(args.output)}")
+    return 0
+
+
+def main(argv=None):
+    """Entry point dòng lệnh"""
+    args = parse_args(argv)
+    try:
+        if args.command == 'normalize':
+            return run_normalize(args)
+        if args.command == 'benchmark':
+            return run_benchmark_command(args)
+        if args.command == 'generate':
+            return run_generate(args)
+    except Exception as e:
+        print(f"❌ Lỗi: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Cấu hình pytest và fixture dùng chung: mapping đã load, dữ liệu giả lập đã chuẩn hóa
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def matcher():
+    """fuzzy_matcher đã load mapping.xlsx của repo (không ghi snapshot/cache kết quả cạnh mapping)"""
+    from config import MAPPING_SNAPSHOT, PERSISTENT_CACHE
+    from utils.helpers import get_mapping_file_path
+    if not os.path.exists(get_mapping_file_path()):
+        pytest.skip('Không có mapping.xlsx')
+    
+    saved = MAPPING_SNAPSHOT['enabled'], PERSISTENT_CACHE['enabled']
+    MAPPING_SNAPSHOT['enabled'] = PERSISTENT_CACHE['enabled'] = False
+    from data.mapping_loader import load_mapping
+    from core.fuzzy_matcher import fuzzy_matcher
+    load_mapping()
+    yield fuzzy_matcher
+    MAPPING_SNAPSHOT['enabled'], PERSISTENT_CACHE['enabled'] = saved
+
+
+@pytest.fixture(scope='session')
+def corpus_rows(matcher):
+    """Dòng (xa, huyen, tinh, ap, địa chỉ) đã chuẩn hóa từ dữ liệu giả lập của core.benchmark"""
+    from core.benchmark import generate_corpus
+    from core.text_processor import chuan_hoa
+    df = generate_corpus(1500, seed=21, duplicate_rate=0.1)
+    rows = []
+    for address, ap, xa, huyen, tinh in zip(df['Địa chỉ'], df['Ấp'], df['Xã'], df['Huyện'], df['Tỉnh']):
+        xa, huyen, tinh = chuan_hoa(xa), chuan_hoa(huyen), chuan_hoa(tinh)
+        # Dòng thiếu xã/tỉnh không được đưa vào matcher (xem address_pipeline.match_chunk)
+        if not xa.strip() or not tinh.strip():
+            continue
+        rows.append((xa, huyen, tinh, ap if isinstance(ap, str) else None, address if isinstance(address, str) else None))
+    return rows
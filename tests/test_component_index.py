@@ -0,0 +1,72 @@
+"""
+Kiểm tra ComponentIndex: điểm trong cache giống hệt gọi scorer trực tiếp, mỗi cặp chỉ chấm một lần
+"""
+from core.component_index import ComponentIndex
+from core.text_processor import tach_phanchinh
+
+
+class CountingScorer:
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, query, name, cutoff):
+        self.calls.append((query, name, cutoff))
+        return len(set(query) & set(name)) * 10
+
+
+def test_scores_are_computed_once_per_query_and_name():
+    scorer = CountingScorer()
+    component = ComponentIndex(['an giang', 'long an', 'an giang', 'tien giang'], scorer, 50)
+    assert component.names == ['an giang', 'long an', 'tien giang']
+    assert component.encode(['tien giang', 'an giang']) == [2, 0]
+    
+    row = component.scores('ang')
+    assert [row[name_id] for name_id in range(len(component))] == [30, 30, 30]
+    assert component.scores('ang') is row
+    assert row[1] == 30
+    assert len(scorer.calls) == 3
+    assert all(cutoff == 50 for _, _, cutoff in scorer.calls)
+
+
+def test_exact_name_scores_100_without_scorer_call():
+    scorer = CountingScorer()
+    component = ComponentIndex(['an giang', 'long an'], scorer, 50)
+    row = component.scores('long an')
+    assert row[1] == 100
+    assert scorer.calls == []
+
+
+def test_cache_is_bounded():
+    scorer = CountingScorer()
+    component = ComponentIndex(['a', 'b'], scorer, 50, max_size=2)
+    for query in ('x', 'y', 'z'):
+        component.scores(query)[0]
+    component.scores('x')[0]
+    assert [query for query, _, _ in scorer.calls] == ['x', 'y', 'z', 'x']
+    assert component.get_stats()['size'] == 2
+
+
+def test_cached_scores_match_direct_scorer(matcher, corpus_rows):
+    queries = {
+        'huyen': {tach_phanchinh(row[1]) for row in corpus_rows},
+        'tinh': {tach_phanchinh(row[2]) for row in corpus_rows},
+        'tinh_moi': {tach_phanchinh(row[2]) for row in corpus_rows},
+    }
+    for kind, component in matcher.components.items():
+        for query in sorted(queries[kind])[:60]:
+            row = component.scores(query)
+            for name_id, name in enumerate(component.names):
+                direct = matcher._score_text(query, name)
+                # Điểm dưới ngưỡng chỉ cần biết là dưới ngưỡng (scorer được gọi với cutoff = ngưỡng)
+                if direct >= component.threshold:
+                    assert row[name_id] == direct, (kind, query, name)
+                else:
+                    assert row[name_id] < component.threshold, (kind, query, name)
+
+
+def test_component_ids_point_at_candidate_names(matcher):
+    for sheet, ids in matcher.component_ids.items():
+        table = matcher.candidates[sheet]
+        for kind, column in (('tinh', 'tinh_chu'), ('huyen', 'huyen_chu'), ('tinh_moi', 'tinh_moi_chu')):
+            names = matcher.components[kind].names
+            assert [names[name_id] for name_id in ids[kind]] == table[column]
@@ -0,0 +1,59 @@
+"""
+Kiểm tra writer ghi theo chunk: chọn writer theo phần mở rộng, schema Arrow khi kiểu cột đổi giữa các chunk
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.file_handler import PYARROW_AVAILABLE, StreamingArrowWriter, create_streaming_writer
+
+
+@pytest.mark.parametrize('file_name', ['ket_qua.txt', 'ket_qua', 'ket_qua.json'])
+def test_create_streaming_writer_rejects_unknown_extension(tmp_path, file_name):
+    with pytest.raises(ValueError):
+        create_streaming_writer(str(tmp_path / file_name))
+    assert not (tmp_path / file_name).exists()
+
+
+def _read_back(path):
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+    if path.endswith('.parquet'):
+        return pa_parquet.read_table(path)
+    with pa.OSFile(path, 'rb') as source:
+        return pa_ipc.open_file(source).read_all()
+
+
+CASES = {
+    # chunk đầu là int, chunk sau có NaN (pandas đổi sang float64)
+    'int_then_nan': ([[1, 2], [3, np.nan]], [1, 2, 3, None]),
+    # chunk sau có số thực thật sự -> cột được nâng lên float64
+    'int_then_float': ([[1, 2], [3.5, np.nan], [7, 8]], [1.0, 2.0, 3.5, None, 7.0, 8.0]),
+    # chunk đầu toàn null (float64 NaN), chunk sau là chuỗi -> cột chuỗi
+    'null_then_str': ([[np.nan, np.nan], pd.Series(['x', 'y'], dtype=object)], [None, None, 'x', 'y']),
+    # chunk đầu là int, chunk sau là chuỗi -> cột chuỗi
+    'int_then_str': ([[1, 2], pd.Series(['x', None], dtype=object)], ['1', '2', 'x', None]),
+}
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason='Chưa cài pyarrow')
+@pytest.mark.parametrize('ext', ['.parquet', '.feather'])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_arrow_writer_promotes_schema_between_chunks(tmp_path, ext, case):
+    chunks, expected = CASES[case]
+    path = str(tmp_path / f'ket_qua{ext}')
+    start = 0
+    with StreamingArrowWriter(path, dictionary_columns=['ma']) as writer:
+        writer.add_sheet('Sheet1')
+        for values in chunks:
+            index = pd.RangeIndex(start, start + len(values))
+            start += len(values)
+            writer.write_chunk(pd.DataFrame({
+                'gia_tri': pd.Series(values, index=index) if isinstance(values, list) else values.set_axis(index),
+                'ma': pd.Series([f'm{i % 3}' for i in index], index=index, dtype=object),
+            }))
+
+    table = _read_back(path)
+    assert table.column('gia_tri').to_pylist() == expected
+    assert table.column('ma').to_pylist() == [f'm{i % 3}' for i in range(start)]
@@ -0,0 +1,109 @@
+"""
+Kiểm tra các bước cắt tỉa / batch của FuzzyMatcher cho kết quả giống hệt cách làm đầy đủ
+"""
+import pytest
+from thefuzz import fuzz
+
+import core.fuzzy_matcher as fuzzy_matcher_module
+from config import FUZZY_THRESHOLDS
+from core.text_processor import tach_chu_so, tach_phanchinh
+
+
+def _xa_queries(rows, limit):
+    """Phần chữ của tên xã (unique) trong dữ liệu giả lập"""
+    return list(dict.fromkeys(tach_chu_so(tach_phanchinh(row[0]))[0] for row in rows))[:limit]
+
+
+def _full_keys(rows, limit):
+    """Khóa (xa_chu, xa_so, huyen_chu, tinh_chu, xa, huyen, tinh) unique của các dòng có huyện"""
+    keys = {}
+    for xa, huyen, tinh, _, _ in rows:
+        huyen_chu = tach_phanchinh(huyen)
+        if huyen_chu.strip():
+            xa_chu, xa_so = tach_chu_so(tach_phanchinh(xa))
+            keys.setdefault((xa_chu, xa_so, huyen_chu, tach_phanchinh(tinh)), (xa, huyen, tinh))
+    return [key + original for key, original in keys.items()][:limit]
+
+
+def _full_scan(matcher, xa_chu, xa_so, huyen_chu, tinh_chu, xa, huyen, tinh):
+    """Quét toàn bộ ứng viên như bản gốc (thefuzz, không cắt tỉa) - tham chiếu cho _fuzzy_match_full_address"""
+    def score(query, target):
+        return max(fuzz.ratio(query, target), fuzz.partial_ratio(query, target), fuzz.token_sort_ratio(query, target) * 0.9)
+    
+    best_score, best = 0, None
+    for sheet in ('sheet1', 'sheet2'):
+        table = matcher.candidates[sheet]
+        for i, xacu_chu in enumerate(table['xa_chu']):
+            if xa_so and xa_so != table['xa_so'][i]:
+                continue
+            if abs(len(xa_chu) - len(xacu_chu)) > 5:
+                continue
+            score_xa = score(xa_chu, xacu_chu)
+            if score_xa < FUZZY_THRESHOLDS['xa_min']:
+                continue
+            score_huyen = score(huyen_chu, table['huyen_chu'][i])
+            if score_huyen < FUZZY_THRESHOLDS['huyen_min']:
+                continue
+            score_tinh = score(tinh_chu, table['tinh_chu'][i])
+            if score_tinh < FUZZY_THRESHOLDS['tinh_min']:
+                continue
+            total_score = 0.5 * score_xa + 0.3 * score_huyen + 0.2 * score_tinh
+            if total_score > best_score:
+                best_score, best = total_score, (sheet, i)
+    
+    if best is not None and best_score >= FUZZY_THRESHOLDS['total_min']:
+        sheet, i = best
+        if sheet == 'sheet1':
+            return matcher.mapping_sheet1_original[i] + ('',)
+        item = matcher.mapping_sheet2_original[i]
+        return (item[1], item[2], item[3], item[5], item[6], 'Xã cấu véo')
+    return matcher._check_error_cases(xa, huyen, tinh)
+
+
+@pytest.mark.parametrize('score_cutoff', [True, False])
+def test_pruned_full_address_scan_matches_full_scan(matcher, corpus_rows, monkeypatch, score_cutoff):
+    monkeypatch.setattr(fuzzy_matcher_module, 'SCORE_CUTOFF_AVAILABLE', score_cutoff and fuzzy_matcher_module.SCORE_CUTOFF_AVAILABLE)
+    for key in _full_keys(corpus_rows, 80):
+        xa_chu, xa_so, huyen_chu, tinh_chu = key[:4]
+        expected = _full_scan(matcher, *key)
+        assert matcher._fuzzy_match_full_address(*key) == expected, key
+        # Bắt đầu từ ứng viên của từ điển lỗi gõ (như _resolve_key) cũng phải cho cùng kết quả
+        seed = matcher._typo_seed(xa_chu, xa_so, huyen_chu, tinh_chu)
+        assert matcher._fuzzy_match_full_address(*key, seed=seed) == expected, key
+
+
+def test_unbeatable_typo_seed_matches_scan(matcher, corpus_rows):
+    proven = 0
+    for key in _full_keys(corpus_rows, 1000):
+        xa_chu, xa_so, huyen_chu, tinh_chu = key[:4]
+        if matcher._lookup_full_address(xa_chu, xa_so, huyen_chu, tinh_chu) is not None:
+            continue
+        seed = matcher._typo_seed(xa_chu, xa_so, huyen_chu, tinh_chu)
+        if seed is None or not matcher._is_unbeatable_seed(seed, xa_chu, xa_so, huyen_chu, tinh_chu):
+            continue
+        proven += 1
+        # Trả thẳng seed (đường full.typo) phải giống hệt quét không có seed
+        assert matcher._full_address_result(seed[1], seed[2]) == matcher._fuzzy_match_full_address(*key), key
+    assert proven
+
+
+def test_xa_candidates_keeps_every_passing_name(matcher, corpus_rows):
+    table1, table2 = matcher.candidates['sheet1'], matcher.candidates['sheet2']
+    for prefix, column, threshold in (('old', 'xa_chu', FUZZY_THRESHOLDS['xa_min']),
+                                      ('new', 'xa_moi_chu', FUZZY_THRESHOLDS['xa_moi_min'])):
+        names = list(dict.fromkeys(table1[column] + table2[column]))
+        for query in _xa_queries(corpus_rows, 60):
+            allowed = matcher._xa_candidates(prefix, query, threshold)
+            assert len(allowed) == len(names)
+            for name, keep in zip(names, allowed):
+                if not keep:
+                    assert matcher._score_text(query, name) < threshold, (prefix, query, name)
+
+
+def test_match_batch_matches_match_row(matcher, corpus_rows):
+    matcher.result_cache.clear()
+    expected = [matcher.match_row(*row) for row in corpus_rows]
+    
+    matcher.result_cache.clear()
+    columns = [list(column) for column in zip(*corpus_rows)]
+    assert matcher.match_batch(*columns) == expected
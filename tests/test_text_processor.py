@@ -0,0 +1,82 @@
+"""
+Kiểm tra _apply_viettat (một regex gộp) cho kết quả giống hệt re.sub tuần tự theo VIETTAT_MAP
+"""
+import random
+import re
+
+import pytest
+
+from config import VIETTAT_MAP
+from core.text_processor import _apply_viettat, _build_viettat_pattern, chuan_hoa
+
+
+def _sequential(text, viettat_map=VIETTAT_MAP):
+    for pattern, replacement in viettat_map.items():
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def _combined(text, viettat_map):
+    """Thay thế bằng regex gộp của _build_viettat_pattern (không có nhánh quay về tuần tự)"""
+    pattern, dispatch = _build_viettat_pattern(viettat_map)
+    
+    def replace(match):
+        replacement, is_template = dispatch[match.lastindex]
+        return match.expand(replacement) if is_template else replacement
+    return pattern.sub(replace, text)
+
+
+TOKENS = [
+    'tp', 'tp.', 'h', 'h.', 'c.', 'm', 'm.', 'hcm', 'hcm.', 'tphcm', 'sai', 'gon', 'saigon', 'sg',
+    'br', 'vt', 'br-vt', 'b.', 'ria', 'ria-v.', 'tau', 'ba', 'vung', 'hn', 'dn', 'bd', 'bduong',
+    'la', 'tg', 'ct', 'ag', 'kg', 'cm', 'bl', 'tv', 'st', 'dt', 'vl', 'ht', 'bn',
+    '1st', '2nd', '3rd', '4th', '21st', 'x1st', 'an', 'binh', 'phuong', 'xa', '12', '',
+]
+SEPARATORS = [' ', '', '.', ',', '-', '  ', ', ']
+
+
+@pytest.mark.parametrize('text', [
+    'tp hcm', 'tp.hcm', 'tp. h.c.m.', 'tp hcm.ht', 'hcm.', 'h.c.m.vt', 'tp.hcm.sg', 'sai gon', 'saigon-sg',
+    'br-vt', 'br vt', 'b. ria-v. tau', 'ba ria-vung tau', 'ba ria vung tau', 'hn.dn', 'ap 2nd, xa la',
+    '1st2nd', 'q 3rd.ht', 'bduong.bd', 'tp', 'hcmht', '', '   ',
+])
+def test_apply_viettat_matches_sequential_examples(text):
+    assert _apply_viettat(text) == _sequential(text)
+
+
+def test_apply_viettat_matches_sequential_random_texts():
+    rng = random.Random(8)
+    for _ in range(5000):
+        parts = []
+        for _ in range(rng.randint(1, 6)):
+            parts.append(rng.choice(TOKENS))
+            parts.append(rng.choice(SEPARATORS))
+        text = ''.join(parts)
+        assert _apply_viettat(text) == _sequential(text), text
+
+
+def test_boundary_changing_replacement_falls_back_to_sequential():
+    # "tp hcm." (kết thúc bằng dấu chấm) bị thay bằng chữ -> "minh" dính liền "ht", nên
+    # \bht\b không còn khớp khi thay tuần tự; regex gộp đơn thuần sẽ thay cả hai
+    text = 'tp hcm.ht'
+    assert _apply_viettat(text) == _sequential(text) == 'thanh pho ho chi minhht'
+    assert _combined(text, VIETTAT_MAP) != _sequential(text)
+
+
+def test_build_viettat_pattern_renumbers_backreferences():
+    viettat_map = {
+        r'\b(\d+)x(\d+)\b': r'\2 by \1',
+        r'\b(a)(b)\b': r'\2\1',
+        r'\bq(\d+)\b': r'quan \1',
+        r'\bzz\b': 'z',
+    }
+    rng = random.Random(1)
+    tokens = ['12x3', '4x56', 'ab', 'q7', 'q', 'zz', 'x', '7', 'abab']
+    for _ in range(2000):
+        text = ' '.join(rng.choice(tokens) for _ in range(rng.randint(1, 5)))
+        assert _combined(text, viettat_map) == _sequential(text, viettat_map), text
+
+
+def test_chuan_hoa_uses_viettat_expansion():
+    assert chuan_hoa('TP.HCM') == chuan_hoa('Thành phố Hồ Chí Minh')
+    assert chuan_hoa('BR-VT') == chuan_hoa('Bà Rịa Vũng Tàu')
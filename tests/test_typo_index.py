@@ -0,0 +1,84 @@
+"""
+Kiểm tra DeletionIndex.lookup trả về đúng các tên cách query không quá max_distance phép sửa
+"""
+import random
+from itertools import combinations
+
+import pytest
+
+import core.typo_index as typo_index
+from core.typo_index import DeletionIndex, get_deletes
+
+SYLLABLES = ['an', 'binh', 'phu', 'long', 'thanh', 'hoa', 'tan', 'my', 'tay', 'dong', 'nam', 'bac', 'son', 'xuan', 'vinh']
+
+
+def _levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def _brute_force(names, query, max_distance):
+    return {name for name in names
+            if abs(len(name) - len(query)) <= max_distance and _levenshtein(query, name) <= max_distance}
+
+
+def _typo(rng, text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        k = rng.randrange(len(chars) + 1)
+        operation = rng.randrange(3)
+        if operation == 0 or not chars:
+            chars.insert(k, rng.choice('abcdghilmnoprtuy '))
+        elif operation == 1:
+            del chars[min(k, len(chars) - 1)]
+        else:
+            chars[min(k, len(chars) - 1)] = rng.choice('abcdghilmnoprtuy ')
+    return ''.join(chars)
+
+
+@pytest.fixture(scope='module')
+def names():
+    rng = random.Random(22)
+    return list(dict.fromkeys(' '.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) for _ in range(400)))
+
+
+@pytest.fixture(scope='module')
+def queries(names):
+    rng = random.Random(2)
+    return [_typo(rng, rng.choice(names), rng.randint(0, 4)) for _ in range(400)] + ['', 'a', 'xyz']
+
+
+def test_get_deletes_matches_combinations():
+    for text in ['', 'a', 'ab', 'binh', 'tan phu', 'aab']:
+        for max_distance in range(4):
+            expected = {''.join(text[k] for k in range(len(text)) if k not in removed)
+                        for count in range(min(max_distance, len(text)) + 1)
+                        for removed in combinations(range(len(text)), count)}
+            assert get_deletes(text, max_distance) == expected
+
+
+@pytest.mark.parametrize('max_distance', [1, 2])
+def test_lookup_matches_brute_force(names, queries, max_distance):
+    if not typo_index.LEVENSHTEIN_AVAILABLE:
+        pytest.skip('Cần rapidfuzz để lọc đúng khoảng cách')
+    index = DeletionIndex(names, max_distance)
+    for query in queries:
+        found = index.lookup(query)
+        assert len(found) == len(set(found))
+        assert set(found) == _brute_force(names, query, max_distance), query
+        if query in names:
+            assert found[0] == query
+
+
+def test_lookup_without_rapidfuzz_is_superset(names, queries, monkeypatch):
+    monkeypatch.setattr(typo_index, 'LEVENSHTEIN_AVAILABLE', False)
+    index = DeletionIndex(names, 2)
+    for query in queries:
+        found = set(index.lookup(query))
+        assert found >= _brute_force(names, query, 2), query
+        assert all(_levenshtein(query, name) <= 4 for name in found), query
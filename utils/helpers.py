@@ -149,6 +149,26 @@ def get_mapping_file_path_old():
     return fallback_path
 
 
+def get_file_hash(file_path, block_size=1024 * 1024):
+    """
+    Tính SHA-1 nội dung file (đọc theo khối để không tốn bộ nhớ)
+    
+    Args:
+        file_path: Đường dẫn file
+        block_size: Kích thước mỗi khối đọc
+        
+    Returns:
+        str: Chuỗi hex SHA-1
+    """
+    import hashlib
+    
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def ensure_directory_exists(file_path):
     """
     Đảm bảo thư mục chứa file tồn tại
@@ -0,0 +1,235 @@
+"""
+Đo thời gian theo từng bước xử lý (đọc file, chuẩn hóa, match, gộp kết quả, lưu file)
+Khi tắt (mặc định), stage() trả về context manager rỗng dùng chung - gần như không tốn gì.
+Khi bật, thời gian/bộ đếm được cộng dồn theo lần chạy và theo từng sheet, có thể in ra log
+và ghi thành báo cáo JSON.
+
+Ví dụ:
+    with profiler.stage('read_file'):
+        df = read_file(path)
+"""
+import json
+import threading
+import time
+from config import PROFILING
+
+
+class _NullStage:
+    """Context manager không làm gì - dùng khi profiler tắt"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Context manager đo thời gian một bước và cộng vào profiler"""
+    __slots__ = ('profiler', 'name', 'start')
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class RunProfiler:
+    """Bộ đo thời gian/bộ đếm theo tên bước, cộng dồn theo lần chạy và theo scope (sheet)"""
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self, label=None):
+        """
+        Xóa số liệu và bắt đầu lần chạy mới
+        
+        Args:
+            label: Tên lần chạy (vd. đường dẫn file đầu vào)
+        """
+        with self.lock:
+            self.label = label
+            self.run_start = time.perf_counter()
+            self.created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            self.scope = None
+            self.timers = {}    # Tên bước -> [số lần, tổng giây, lâu nhất]
+            self.counters = {}  # Tên bộ đếm -> giá trị
+            self.scopes = {}    # Scope -> {'timers': {...}, 'counters': {...}, 'start': ..., 'end': ...}
+    
+    def enable(self, enabled=True):
+        """Bật/tắt đo thời gian"""
+        self.enabled = enabled
+    
+    def set_scope(self, scope):
+        """
+        Chọn scope hiện tại (vd. tên sheet) - số liệu sau đó được cộng vào cả lần chạy và scope
+        
+        Args:
+            scope: Tên scope (None = chỉ cộng vào lần chạy)
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            now = time.perf_counter()
+            if self.scope is not None:
+                self.scopes[self.scope]['end'] = now
+            self.scope = scope
+            if scope is not None and scope not in self.scopes:
+                self.scopes[scope] = {'timers': {}, 'counters': {}, 'start': now, 'end': None}
+    
+    def stage(self, name):
+        """
+        Context manager đo thời gian một bước
+        
+        Args:
+            name: Tên bước (vd. 'read_file', 'match')
+        
+        Returns:
+            Context manager (dùng chung một đối tượng rỗng khi profiler tắt)
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+    
+    def add_time(self, name, seconds, count=1):
+        """Cộng thời gian cho bước name (an toàn khi nhiều luồng cùng ghi)"""
+        if not self.enabled:
+            return
+        with self.lock:
+            targets = [self.timers]
+            if self.scope is not None:
+                targets.append(self.scopes[self.scope]['timers'])
+            for timers in targets:
+                timer = timers.get(name)
+                if timer is None:
+                    timers[name] = [count, seconds, seconds]
+                else:
+                    timer[0] += count
+                    timer[1] += seconds
+                    if seconds > timer[2]:
+                        timer[2] = seconds
+    
+    def count(self, name, value=1):
+        """Tăng bộ đếm name"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if self.scope is not None:
+                counters = self.scopes[self.scope]['counters']
+                counters[name] = counters.get(name, 0) + value
+    
+    @staticmethod
+    def _format_timers(timers):
+        """Chuyển timers thành dict có thể ghi JSON, sắp theo thời gian giảm dần"""
+        return {
+            name: {'count': count, 'seconds': round(total, 6), 'max_seconds': round(longest, 6)}
+            for name, (count, total, longest) in sorted(timers.items(), key=lambda item: -item[1][1])
+        }
+    
+    def get_summary(self, scope=None):
+        """
+        Lấy số liệu của lần chạy hoặc một scope
+        
+        Args:
+            scope: Tên scope (None = cả lần chạy)
+        
+        Returns:
+            dict: {'seconds', 'stages', 'counters'} - 'seconds' là thời gian thực đã trôi qua;
+                  thời gian các bước chạy song song được cộng dồn qua mọi luồng
+        """
+        with self.lock:
+            now = time.perf_counter()
+            if scope is None:
+                timers, counters, elapsed = self.timers, self.counters, now - self.run_start
+            else:
+                data = self.scopes.get(scope, {'timers': {}, 'counters': {}, 'start': now, 'end': now})
+                timers, counters = data['timers'], data['counters']
+                elapsed = (data['end'] or now) - data['start']
+            return {
+                'seconds': round(elapsed, 6),
+                'stages': self._format_timers(timers),
+                'counters': dict(sorted(counters.items())),
+            }
+    
+    def format_summary(self, scope=None, top=6):
+        """
+        Chuỗi tóm tắt một dòng cho log, vd. "match 5.10s (82%) | read_file 0.80s (13%)"
+        
+        Args:
+            scope: Tên scope (None = cả lần chạy)
+            top: Số bước tốn thời gian nhất được hiển thị
+        """
+        summary = self.get_summary(scope)
+        total = summary['seconds']
+        parts = []
+        for name, stage in list(summary['stages'].items())[:top]:
+            percent = f" ({stage['seconds'] / total:.0%})" if total > 0 else ""
+            parts.append(f"{name} {stage['seconds']:.2f}s{percent}")
+        return ' | '.join(parts) if parts else 'không có số liệu'
+    
+    def get_report(self, extra=None):
+        """
+        Báo cáo đầy đủ của lần chạy (cả lần chạy và từng scope)
+        
+        Args:
+            extra: Dict thông tin bổ sung (vd. thống kê cache) (optional)
+        
+        Returns:
+            dict: Báo cáo có thể ghi JSON
+        """
+        report = {
+            'label': self.label,
+            'created_at': self.created_at,
+            'run': self.get_summary(),
+            'scopes': {str(scope): self.get_summary(scope) for scope in list(self.scopes)},
+        }
+        if extra:
+            report.update(extra)
+        return report
+    
+    def write_report(self, file_path, extra=None):
+        """
+        Ghi báo cáo JSON
+        
+        Args:
+            file_path: Đường dẫn file .json
+            extra: Như get_report
+        
+        Returns:
+            str: file_path
+        """
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_report(extra), f, ensure_ascii=False, indent=2, default=str)
+        return file_path
+
+
+# Global instance - bật bằng PROFILING['enabled'] trong config hoặc profiler.enable()
+profiler = RunProfiler(PROFILING['enabled'])
+
+
+def get_report_path(output_path):
+    """
+    Đường dẫn báo cáo JSON đi kèm file kết quả: <file kết quả><PROFILING['report_suffix']>
+    
+    Args:
+        output_path: Đường dẫn file kết quả
+    
+    Returns:
+        str: Đường dẫn file báo cáo
+    """
+    return output_path.rsplit('.', 1)[0] + PROFILING['report_suffix']